@@ -1,108 +1,98 @@
-import asyncio
+import importlib
+import inspect
 
 import streamlit as st
 import streamlit_authenticator as stauth
-import yaml
-from yaml.loader import SafeLoader
 from streamlit_authenticator import Authenticate
 import base64
 from streamlit_option_menu import option_menu
 import time
 
-
-from pgs.home import showHome
-from pgs.cliente_criar import showCliente
-from pgs.dashboard import showDashboard
-from pgs.financeiro import showFinanceiro
-from pgs.pedido import showPedido
-from pgs.link_pagamento import showLinks
-from pgs.subcontas_criar import showParceiro
-from pgs.webhooks import shoWebhooks
+from utils.event_loop import executar_na_sessao
+from utils.user_directory import get_user_directory
 
 
 st.set_page_config(page_title='ORACULO MODAS', page_icon="👗", layout="wide")
 
 
 # --- LOAD CONFIGURATION ---
-with open("config.yaml") as file:
-    config = yaml.safe_load(file)
-
-# --- AUTHENTICATION SETUP ---
-credentials = {
-    'usernames': {user['username']: {
-        'name': user['name'],
-        'password': user['password'],
-        'email': user['email'],
-    } for user in config['credentials']['users']}
-}
+# O diretório é compartilhado pelo processo e só relê o banco de usuários quando ele muda
+user_directory = get_user_directory()
+cookie_config = user_directory.cookie
 
 authenticator = Authenticate(
-    credentials=credentials,
-    cookie_name=config['cookie']['name'],
-    key=config['cookie']['key'],
-    cookie_expiry_days=config['cookie']['expiry_days']
+    credentials=user_directory.credentials,
+    cookie_name=cookie_config['name'],
+    key=cookie_config['key'],
+    cookie_expiry_days=cookie_config['expiry_days'],
+    auto_hash=False  # As senhas já são gravadas em hash (UserStore); sem refazer o bcrypt de todos a cada revisão
 )
 
 # --- PAGE SETUP ---
 authenticator.login(key='login_form')
 
 
-class MultiPage:
-    def __init__(self):  # Corrigido de __int__ para __init__
-        self.pages = []
-
-    def add_page(self, title, func):
-        self.pages.append({
-            "title": title,
-            "function": func
-        })
-
-    def run(self):
-        with st.sidebar:
-           pag = option_menu(
-                menu_title="MENU",
-                options=['Início', 'Fazer Pedido', 'Criar Cliente', 'Dashboard', 'Financeiro', 'Link de Pagamento',
-                         'Parceiro', 'Webhook'],
-                icons=['house-fill', 'cart-fill', 'person-fill', 'cash-stack', 'link', 'people-fill', 'code-slash', 'grid'],
-                menu_icon='list',
-                default_index=0,  # Ajustado para o índice correto
-                styles={
-                    "container": {"padding": "5!important","background-color":'black'},
-        "icon": {"color": "white", "font-size": "15px"},
-        "nav-link": {"color":"white","font-size": "20px", "text-align": "left", "margin":"0px", "--hover-color": "blue"},
-        "nav-link-selected": {"background-color": "#02ab21"},}
-            )
-
-        for page in self.pages:
-            if page["title"] == pag:
-                page["function"]()  # Chame a função da página selecionada
-
-                if pag == "Início":
-                    asyncio.run(showHome())
-
-                elif pag == "Fazer Pedido":
-                    asyncio.run(showPedido())
+# --- REGISTRO DE PÁGINAS ---
+# Cada página é importada apenas na primeira vez em que é aberta; assim um processo novo não carrega
+# transformers/langchain/stripe/pygwalker enquanto ninguém abrir as páginas que dependem deles.
+PAGINAS = {
+    "Início": {"modulo": "pgs.home", "funcao": "showHome", "icone": "house-fill"},
+    "Fazer Pedido": {"modulo": "pgs.pedido", "funcao": "showPedido", "icone": "cart-fill"},
+    "Criar Cliente": {"modulo": "pgs.cliente_criar", "funcao": "showCliente", "icone": "person-fill"},
+    "Dashboard": {"modulo": "pgs.dashboard", "funcao": "showDashboard", "icone": "grid"},
+    "Financeiro": {"modulo": "pgs.financeiro", "funcao": "showFinanceiro", "icone": "cash-stack"},
+    "Link de Pagamento": {"modulo": "pgs.link_pagamento", "funcao": "showLinks", "icone": "link"},
+    "Parceiro": {"modulo": "pgs.subcontas_criar", "funcao": "showParceiro", "icone": "people-fill"},
+    "Webhook": {"modulo": "pgs.webhooks", "funcao": "shoWebhooks", "icone": "code-slash"},
+}
 
-                elif pag == "Criar Cliente":
-                     asyncio.run(showCliente())
+# Defina as permissões de acesso (títulos do registro, na ordem do menu)
+PERMISSOES = {
+    "admin": ["Início", "Fazer Pedido", "Criar Cliente", "Financeiro", "Link de Pagamento", "Parceiro", "Webhook",
+              "Dashboard"],
+    "parceiro": ["Início", "Fazer Pedido", "Criar Cliente"],
+    "cliente": ["Início", "Fazer Pedido"],
+}
 
-                elif pag == "Dashboard":
-                    asyncio.run(showDashboard())
 
-                elif pag == "Financeiro":
-                    asyncio.run(showFinanceiro())
+@st.cache_resource(show_spinner=False)
+def carregar_pagina(titulo):
+    """Importa o módulo da página na primeira seleção e mantém a função em cache no processo."""
+    pagina = PAGINAS[titulo]
+    modulo = importlib.import_module(pagina["modulo"])
+    return getattr(modulo, pagina["funcao"])
 
-                elif pag == "Link de Pagamento":
-                    asyncio.run(showLinks())
 
-                elif pag == "Parceiro":
-                    asyncio.run(showParceiro())
+def executar_pagina(titulo):
+    """Executa a página selecionada, aceitando funções síncronas ou assíncronas."""
+    funcao = carregar_pagina(titulo)
+    if inspect.iscoroutinefunction(funcao):
+        executar_na_sessao(funcao())  # A rede da página roda no loop global (aguardar)
+    else:
+        funcao()
+
+
+def menu_lateral(titulos):
+    with st.sidebar:
+        return option_menu(
+            menu_title="MENU",
+            options=titulos,
+            icons=[PAGINAS[titulo]["icone"] for titulo in titulos],
+            menu_icon='list',
+            default_index=0,
+            styles={
+                "container": {"padding": "5!important", "background-color": 'black'},
+                "icon": {"color": "white", "font-size": "15px"},
+                "nav-link": {"color": "white", "font-size": "20px", "text-align": "left", "margin": "0px",
+                             "--hover-color": "blue"},
+                "nav-link-selected": {"background-color": "#02ab21"},
+            }
+        )
 
-                elif pag == "Webhook":
-                    asyncio.run(shoWebhooks())
 
 if 'authentication_status' in st.session_state and st.session_state['authentication_status']:
-    user_email = next(user['email'] for user in config['credentials']['users'] if user['username'] == st.session_state['username'])
+    current_user = user_directory.buscar_por_username(st.session_state['username'])
+    user_email = current_user['email'] if current_user else None
     authenticator.logout('SAIR', 'sidebar')
     if user_email:
         with st.spinner('Saindo...'):
@@ -158,7 +148,8 @@ if 'authentication_status' in st.session_state and st.session_state['authenticat
     st.sidebar.markdown("---")
 
     if 'username' in st.session_state:
-        user_role = next((user['role'] for user in config['credentials']['users'] if user['username'] == st.session_state['username']), None)
+        current_user = user_directory.buscar_por_username(st.session_state['username'])
+        user_role = current_user.get('role') if current_user else None
         if user_role:
             with st.spinner('Acessando...'):
                 time.sleep(0.1)  # Simula uma operação demorada
@@ -171,56 +162,8 @@ if 'authentication_status' in st.session_state and st.session_state['authenticat
         st.error("Usuário não está autenticado.")
         st.stop()
 
-    # Defina as permissões de acesso
-    permissoes = {
-        "admin": [
-            "pgs/home.py",
-            "pgs/pedido.py",
-            "pgs/cliente_criar.py",
-            "pgs/financeiro.py",
-            "pgs/link_pagamento.py",
-            "pgs/subcontas_criar.py",
-            "pgs/webhooks.py",
-            "pgs/dashboard.py"
-        ],
-        "parceiro": [
-            "pgs/home.py",
-            "pgs/pedido.py",
-            "pgs/cliente_criar.py",
-        ],
-        "cliente": [
-            "pgs/home.py",
-            "pgs/pedido.py",
-        ],
-    }
-
-    if user_role in permissoes:
-        multi_page = MultiPage()
-
-        # Crie um menu de páginas com base nas permissões do usuário
-        menu_options = []
-        for pagina in permissoes[user_role]:
-            if pagina == "pgs/home.py":
-                menu_options.append({"title": "Início", "function": showHome})
-            elif pagina == "pgs/pedido.py":
-                menu_options.append({"title": "Fazer Pedido", "function": showPedido})
-            elif pagina == "pgs/cliente_criar.py":
-                menu_options.append({"title": "Criar Cliente", "function": showCliente})
-            elif pagina == "pgs/dashboard.py":
-                menu_options.append({"title": "Dashboard", "function": showDashboard})
-            elif pagina == "pgs/financeiro.py":
-                menu_options.append({"title": "Financeiro", "function": showFinanceiro})
-            elif pagina == "pgs/link_pagamento.py":
-                menu_options.append({"title": "Link de Pagamento", "function": showLinks})
-            elif pagina == "pgs/subcontas_criar.py":
-                menu_options.append({"title": "Parceiro", "function": showParceiro})
-            elif pagina == "pgs/webhooks.py":
-                menu_options.append({"title": "Webhook", "function": shoWebhooks})
-
-        # Adicione o menu ao MultiPage
-        for option in menu_options:
-            multi_page.add_page(option["title"], option["function"])
-
-        multi_page.run()  # Executa a aplicação com as páginas permitidas
+    if user_role in PERMISSOES:
+        pag = menu_lateral(PERMISSOES[user_role])
+        executar_pagina(pag)  # Importa (na primeira vez) e executa apenas a página selecionada
     else:
         st.error("Você não tem permissão para acessar esta aplicação.")
@@ -2,21 +2,20 @@ import yaml
 from typing import Dict, Any
 from datetime import datetime
 import re
+from utils.user_store import get_user_store
 
 def load_yaml_config(file_path: str = 'config.yaml') -> Dict[Any, Any]:
-    """Carrega a configuração do YAML existente ou cria um novo se não existir."""
+    """Carrega a configuração a partir do banco de usuários (importando o YAML na primeira execução)."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return yaml.safe_load(file) or {'credentials': {'users': []}}
-    except FileNotFoundError:
-        return {'credentials': {'users': []}}
+        store = get_user_store(yaml_path=file_path)
+        return {'credentials': {'users': store.listar()}, 'cookie': store.cookie}
     except UnicodeDecodeError as e:
         raise ValueError(f"Erro ao decodificar o arquivo: {e}")
     except Exception as e:
         raise ValueError(f"Erro ao carregar o arquivo de configuração: {e}")
 
 def save_yaml_config(config: Dict[Any, Any], file_path: str = 'config.yaml') -> None:
-    """Salva a configuração no arquivo YAML, garantindo que todos os valores sejam strings."""
+    """Exporta a configuração para um arquivo YAML (backup), garantindo que todos os valores sejam strings."""
     try:
         # Converter todos os valores para strings
         for user in config.get('credentials', {}).get('users', []):
@@ -45,20 +44,17 @@ def validate_client_data(client_data: Dict[str, Any]) -> None:
     if len(client_data['cpf_cnpj']) not in [11, 14]:
         raise ValueError("CPF/CNPJ deve ter 11 ou 14 dígitos.")
 
+    # Verifica se o cliente já existe (consultas indexadas no banco de usuários)
+    store = get_user_store()
+    if store.buscar_por_email(client_data['email']) is not None:
+        raise ValueError("Um cliente com este e-mail já existe.")
+    if store.buscar_por_username(client_data['username']) is not None:
+        raise ValueError("Um cliente com este usuário já existe.")
+
 def add_client_to_config(client_data: Dict[str, Any]) -> None:
-    """Adiciona um novo cliente à configuração."""
+    """Adiciona um novo cliente ao banco de usuários."""
     validate_client_data(client_data)
 
-    config = load_yaml_config()
-
-    if 'credentials' not in config:
-        config['credentials'] = {'users': []}
-
-    # Verifica se o cliente já existe
-    existing_users = config['credentials']['users']
-    if any(user['email'] == client_data['email'] for user in existing_users):
-        raise ValueError("Um cliente com este e-mail já existe.")
-
     # Gera o timestamp atual no formato ISO
     current_timestamp = datetime.now().isoformat()
 
@@ -78,5 +74,5 @@ def add_client_to_config(client_data: Dict[str, Any]) -> None:
         'created_at': str(current_timestamp)
     }
 
-    config['credentials']['users'].append(new_user)
-    save_yaml_config(config)
+    # Inserção transacional; as restrições UNIQUE cobrem cadastros simultâneos que passaram pela validação
+    get_user_store().adicionar(new_user)
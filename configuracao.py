@@ -2,5 +2,67 @@
 from decouple import config
 
 
-BASE_URL = "https://sandbox.asaas.com/api/v3"
+BASE_URL = config('ASAAS_BASE_URL', default="https://sandbox.asaas.com/api/v3")
+STRIPE_API_BASE = config('STRIPE_API_BASE', default=None)  # Ex.: stand-in local (utils/asaas_stub.py)
 ASAAS_API_KEY = config('ASAAS_API_KEY', default=None)
+ASAAS_WEBHOOK_TOKEN = config('ASAAS_WEBHOOK_TOKEN', default=None)  # Token de autenticação dos webhooks
+ASAAS_TIMEOUT = config('ASAAS_TIMEOUT', default=30, cast=float)  # Segundos
+USER_DB_PATH = config('USER_DB_PATH', default='dados/usuarios.db')
+ASAAS_CACHE_PATH = config('ASAAS_CACHE_PATH', default='dados/asaas_cache.db')
+PAGAMENTOS_CACHE_TTL = config('PAGAMENTOS_CACHE_TTL', default=60, cast=float)  # Segundos entre sincronizações
+PAGAMENTOS_RECONCILIACAO = config('PAGAMENTOS_RECONCILIACAO', default=86400, cast=float)  # Releitura completa
+
+# Stand-in local do Asaas/Stripe (utils/asaas_stub.py)
+STUB_SEED = config('STUB_SEED', default=42, cast=int)
+STUB_PAGAMENTOS = config('STUB_PAGAMENTOS', default=100000, cast=int)
+STUB_CLIENTES = config('STUB_CLIENTES', default=20000, cast=int)
+STUB_LINKS = config('STUB_LINKS', default=2000, cast=int)
+STUB_SUBCONTAS = config('STUB_SUBCONTAS', default=500, cast=int)
+STUB_LATENCIA_MS = config('STUB_LATENCIA_MS', default=80, cast=float)
+STUB_JITTER_MS = config('STUB_JITTER_MS', default=30, cast=float)
+STUB_TAXA_ERRO = config('STUB_TAXA_ERRO', default=0.0, cast=float)  # Fração das requisições que falham
+
+# Chat KIRA
+REPLICATE_API_TOKEN = config('REPLICATE_API_TOKEN', default=None)
+KIRA_PROVEDOR = config('KIRA_PROVEDOR', default='')  # 'replicate' (padrão) ou 'local' (simulado, p/ dev)
+KIRA_TIMEOUT_PRIMEIRO_TOKEN = config('KIRA_TIMEOUT_PRIMEIRO_TOKEN', default=60, cast=float)  # Segundos
+KIRA_TIMEOUT_TOTAL = config('KIRA_TIMEOUT_TOTAL', default=300, cast=float)  # Segundos por geração
+KIRA_LOCAL_TTFT = config('KIRA_LOCAL_TTFT', default=0.6, cast=float)  # Provedor local: segundos até a 1ª parte
+KIRA_LOCAL_TOKENS_SEG = config('KIRA_LOCAL_TOKENS_SEG', default=40, cast=float)  # Provedor local: vazão
+KIRA_GERACOES_SIMULTANEAS = config('KIRA_GERACOES_SIMULTANEAS', default=8, cast=int)  # Limite do processo
+KIRA_AGENDADOR_PESO_PRIORIDADE = config('KIRA_AGENDADOR_PESO_PRIORIDADE', default=3, cast=int)  # Admin/parceiro por cliente
+KIRA_AGENDADOR_DURACAO_INICIAL = config('KIRA_AGENDADOR_DURACAO_INICIAL', default=8, cast=float)  # Segundos, p/ estimativa
+KIRA_AGRUPAR_INTERVALO_MIN_MS = config('KIRA_AGRUPAR_INTERVALO_MIN_MS', default=50, cast=float)  # Envios ao cliente
+KIRA_AGRUPAR_INTERVALO_MAX_MS = config('KIRA_AGRUPAR_INTERVALO_MAX_MS', default=250, cast=float)
+KIRA_AGRUPAR_BYTES = config('KIRA_AGRUPAR_BYTES', default=1024, cast=int)  # Envia antes da janela ao acumular isso
+KIRA_CONVERSAS_PATH = config('KIRA_CONVERSAS_PATH', default='dados/kira_conversas.db')
+KIRA_CONVERSA_JANELA = config('KIRA_CONVERSA_JANELA', default=20, cast=int)  # Mensagens exibidas/carregadas por vez
+KIRA_CONVERSA_MEMORIA = config('KIRA_CONVERSA_MEMORIA', default=120, cast=int)  # Máximo de mensagens na sessão
+KIRA_API_TOKEN = config('KIRA_API_TOKEN', default=None)  # Cabeçalho X-Kira-Token da API de chat (kira/api.py)
+KIRA_API_PING = config('KIRA_API_PING', default=15, cast=float)  # Segundos entre pings SSE em conexões ociosas
+KIRA_METRICAS_TURNOS = config('KIRA_METRICAS_TURNOS', default=2000, cast=int)  # Turnos recentes em memória
+KIRA_METRICAS_PATH = config('KIRA_METRICAS_PATH', default='dados/kira_metricas.db')  # Totais por hora; vazio: só memória
+KIRA_METRICAS_INTERVALO = config('KIRA_METRICAS_INTERVALO', default=30, cast=float)  # Segundos entre gravações
+KIRA_METRICAS_DIAS = config('KIRA_METRICAS_DIAS', default=180, cast=int)  # Retenção dos totais por hora
+KIRA_ORCAMENTO_TOKENS = config('KIRA_ORCAMENTO_TOKENS', default=3000, cast=int)  # Histórico enviado ao modelo
+KIRA_TURNOS_RECENTES = config('KIRA_TURNOS_RECENTES', default=6, cast=int)  # Trocas mantidas sem resumo
+KIRA_TOKENIZER_PATH = config('KIRA_TOKENIZER_PATH', default='src/tokenizer/tokenizer.json')  # python -m kira.tokenizer
+KIRA_MODELO_RESUMO = config('KIRA_MODELO_RESUMO', default='meta/meta-llama-3-8b-instruct')
+KIRA_CONHECIMENTO_PASTA = config('KIRA_CONHECIMENTO_PASTA', default='./conhecimento')
+KIRA_CONHECIMENTO_INTERVALO = config('KIRA_CONHECIMENTO_INTERVALO', default=30, cast=float)  # Segundos entre verificações
+KIRA_TRECHO_PALAVRAS = config('KIRA_TRECHO_PALAVRAS', default=200, cast=int)
+KIRA_TRECHO_SOBREPOSICAO = config('KIRA_TRECHO_SOBREPOSICAO', default=40, cast=int)
+KIRA_TRECHOS_CONTEXTO = config('KIRA_TRECHOS_CONTEXTO', default=4, cast=int)  # Trechos da base enviados por turno
+KIRA_VETORES_PASTA = config('KIRA_VETORES_PASTA', default='dados/vetores')
+KIRA_EMBEDDINGS_MODELO = config('KIRA_EMBEDDINGS_MODELO',  # python -m kira.vetores baixar
+                                default='src/modelos/paraphrase-multilingual-MiniLM-L12-v2')
+KIRA_INTENCOES_PATH = config('KIRA_INTENCOES_PATH', default='intencoes.yaml')  # Expressões extras por intenção
+KIRA_CACHE_RESPOSTAS_ITENS = config('KIRA_CACHE_RESPOSTAS_ITENS', default=1000, cast=int)
+KIRA_CACHE_RESPOSTAS_TTL = config('KIRA_CACHE_RESPOSTAS_TTL', default=21600, cast=float)  # Segundos
+KIRA_CACHE_RESPOSTAS_PATH = config('KIRA_CACHE_RESPOSTAS_PATH', default='dados/kira_respostas.db')  # Vazio: só memória
+KIRA_MODELO_GRANDE = config('KIRA_MODELO_GRANDE', default='meta/meta-llama-3-70b-instruct')
+KIRA_MODELO_PEQUENO = config('KIRA_MODELO_PEQUENO', default='meta/meta-llama-3-8b-instruct')
+KIRA_ROTEADOR_TOKENS_SIMPLES = config('KIRA_ROTEADOR_TOKENS_SIMPLES', default=30, cast=int)  # Turnos curtos
+KIRA_ROTEADOR_PATH = config('KIRA_ROTEADOR_PATH', default='dados/kira_roteador.db')  # Registro das decisões
+KIRA_LINK_ASSINATURA = config('KIRA_LINK_ASSINATURA', default='https://buy.stripe.com/test_fZeg2L7MBcCE9heeUY')
+KIRA_LINK_CONSULTORA = config('KIRA_LINK_CONSULTORA', default='https://wa.me/+553199302907')
@@ -4,10 +4,11 @@ from pydantic import BaseModel, EmailStr
 import pandas as pd
 from PIL import Image
 import os
-import stripe
+from utils.stripe_api import stripe
 from typing import Optional
 from datetime import datetime
 import asyncio
+from utils.event_loop import aguardar, executar_na_sessao
 from key_config import API_KEY_STRIPE, URL_BASE, STRIPE_WEBHOOK_SECRET
 from config_handler import add_client_to_config
 from decouple import config
@@ -54,7 +55,8 @@ async def create_customer(cliente: Cliente):
             raise ValueError("Todos os campos são obrigatórios.")
 
         # Criação do cliente no Stripe
-        customer = stripe.Customer.create(
+        customer = await asyncio.to_thread(
+            stripe.Customer.create,
             name=cliente.name,  # O campo 'name' é aceito pela API do Stripe
             email=cliente.email,
             metadata={
@@ -116,7 +118,7 @@ def save_profile_image(uploaded_file, email):
 async def handle_create_customer(cliente):
     resultado = None  # Inicializa resultado com None
     try:
-        resultado = await create_customer(cliente)  # Aguarda a conclusão da tarefa
+        resultado = await aguardar(create_customer(cliente))  # Executa no loop global do processo
         st.success(f"Cliente {resultado.name} criado com sucesso!")
 
         # Limpa os campos do formulário
@@ -292,11 +294,8 @@ def cadastrar_cliente():
             else:
                 st.warning("Nenhuma imagem foi carregada.")
 
-        try:
-            asyncio.create_task(handle_create_customer(cliente))
-        except Exception as e:
-            # Aqui você pode registrar o erro em um log ou apenas ignorá-lo
-            pass  # Não exibe o erro na tela
+            # Cria o cliente no Stripe pelo loop global e exibe o resultado nesta sessão
+            executar_na_sessao(handle_create_customer(cliente))
 
 
 def is_valid_email(email):
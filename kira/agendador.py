@@ -0,0 +1,232 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from configuracao import (KIRA_GERACOES_SIMULTANEAS, KIRA_AGENDADOR_PESO_PRIORIDADE,
+                          KIRA_AGENDADOR_DURACAO_INICIAL)
+
+
+logger = logging.getLogger(__name__)
+
+# Classes de atendimento: papéis pagantes passam à frente dos clientes
+PRIORITARIA = 0
+NORMAL = 1
+PAPEIS_PRIORITARIOS = ('admin', 'parceiro')
+
+# Intervalo mínimo entre recálculos das posições na fila: com milhares esperando, recalcular a cada vaga
+# liberada custaria O(n² log u)
+INTERVALO_AVISOS = 0.5
+
+# Recebe a posição na fila (1 = próximo a ser atendido) e a espera estimada em segundos;
+# posição None indica que a geração saiu da fila e começou.
+Aviso = Callable[[Optional[int], float], None]
+
+
+class _Pedido:
+    __slots__ = ('usuario', 'classe', 'futuro', 'avisar', 'ultimo_aviso')
+
+    def __init__(self, usuario: str, classe: int, futuro: asyncio.Future, avisar: Optional[Aviso]):
+        self.usuario = usuario
+        self.classe = classe
+        self.futuro = futuro
+        self.avisar = avisar
+        self.ultimo_aviso: Optional[Tuple[int, int]] = None
+
+
+class AgendadorGeracoes:
+    """Limita as gerações simultâneas do processo e decide quem é atendido quando há fila.
+
+    - no máximo `limite` gerações rodam ao mesmo tempo, somando todas as sessões;
+    - na fila, admin e parceiro (classe prioritária) passam à frente, mas a cada `peso_prioridade` atendimentos
+      prioritários seguidos um cliente é atendido, para que ninguém espere indefinidamente;
+    - dentro de cada classe é atendido primeiro quem tem menos gerações em andamento, em rodízio entre os
+      usuários: quem abre várias abas (ou manda várias perguntas seguidas) não toma as vagas dos demais.
+
+    Quem espera recebe a posição na fila e a espera estimada, recalculadas quando a fila muda (no máximo a cada
+    INTERVALO_AVISOS) e enviadas só a quem teve a posição ou a espera alterada. Todo o estado
+    vive no loop global, onde rodam as gerações; não há travas entre threads.
+    """
+
+    def __init__(self, limite: int = KIRA_GERACOES_SIMULTANEAS, peso_prioridade: int = KIRA_AGENDADOR_PESO_PRIORIDADE,
+                 duracao_inicial: float = KIRA_AGENDADOR_DURACAO_INICIAL):
+        self.limite = limite
+        self.peso_prioridade = peso_prioridade
+        self.duracao_media = duracao_inicial  # Média móvel da duração das gerações, para a estimativa de espera
+        self.em_execucao = 0
+        self._filas: Dict[int, 'OrderedDict[str, Deque[_Pedido]]'] = {PRIORITARIA: OrderedDict(),
+                                                                      NORMAL: OrderedDict()}
+        self._prioritarias_seguidas = 0
+        self._ativas: Dict[str, int] = {}  # Gerações em andamento por usuário
+        self._avisos_agendados = False
+        self._ultimos_avisos = float('-inf')
+
+    @property
+    def na_fila(self) -> int:
+        return sum(len(pedidos) for fila in self._filas.values() for pedidos in fila.values())
+
+    @asynccontextmanager
+    async def vaga(self, usuario: str, papel: Optional[str] = None, avisar: Optional[Aviso] = None):
+        """Aguarda uma vaga de geração; a vaga é liberada ao sair do bloco (inclusive por cancelamento)."""
+        if self.em_execucao < self.limite and not self.na_fila:
+            self._ocupar(usuario)
+        else:
+            classe = PRIORITARIA if papel in PAPEIS_PRIORITARIOS else NORMAL
+            pedido = _Pedido(usuario, classe, asyncio.get_running_loop().create_future(), avisar)
+            self._filas[classe].setdefault(usuario, deque()).append(pedido)
+            self._avisar_posicoes()
+            try:
+                await pedido.futuro
+            except BaseException:
+                if pedido.futuro.done() and not pedido.futuro.cancelled():
+                    # A vaga chegou junto com o cancelamento: devolve para o próximo
+                    self._liberar(usuario)
+                else:
+                    self._remover(pedido)
+                    self._avisar_posicoes()
+                raise
+            self._avisar(pedido, None, 0.0)
+
+        inicio = asyncio.get_running_loop().time()
+        try:
+            yield
+        finally:
+            self.duracao_media = 0.8 * self.duracao_media + 0.2 * (asyncio.get_running_loop().time() - inicio)
+            self._liberar(usuario)
+
+    async def transmitir(self, usuario: str, papel: Optional[str], gerar: Callable[[], AsyncIterator[str]],
+                         avisar: Optional[Aviso] = None) -> AsyncIterator[str]:
+        """Executa `gerar()` quando houver vaga, repassando as partes da resposta."""
+        async with self.vaga(usuario, papel, avisar):
+            async for parte in gerar():
+                yield parte
+
+    def _ocupar(self, usuario: str) -> None:
+        self.em_execucao += 1
+        self._ativas[usuario] = self._ativas.get(usuario, 0) + 1
+
+    def _liberar(self, usuario: str) -> None:
+        self.em_execucao -= 1
+        self._ativas[usuario] -= 1
+        if not self._ativas[usuario]:
+            del self._ativas[usuario]
+        atendidos = 0
+        while self.em_execucao < self.limite:
+            pedido = self._proximo(self._filas, self._prioritarias_seguidas, self._ativas)
+            if pedido is None:
+                break
+            self._retirar(self._filas, pedido)
+            self._prioritarias_seguidas = self._prioritarias_seguidas + 1 if pedido.classe == PRIORITARIA else 0
+            self._ocupar(pedido.usuario)
+            pedido.futuro.set_result(None)
+            atendidos += 1
+        if atendidos:
+            self._avisar_posicoes()  # Sem ninguém retirado da fila, nenhuma posição mudou
+
+    def _proximo(self, filas: Dict[int, 'OrderedDict[str, Deque[_Pedido]]'], seguidas: int,
+                 ativas: Dict[str, int]) -> Optional[_Pedido]:
+        if filas[PRIORITARIA] and (not filas[NORMAL] or seguidas < self.peso_prioridade):
+            fila = filas[PRIORITARIA]
+        elif filas[NORMAL]:
+            fila = filas[NORMAL]
+        else:
+            return None
+        # Quem tem menos gerações em andamento primeiro; em empate, a ordem do rodízio
+        usuario = min(fila, key=lambda u: ativas.get(u, 0))
+        return fila[usuario][0]
+
+    @staticmethod
+    def _retirar(filas: Dict[int, 'OrderedDict[str, Deque[_Pedido]]'], pedido: _Pedido) -> None:
+        fila = filas[pedido.classe]
+        pedidos = fila.pop(pedido.usuario)
+        pedidos.popleft()
+        if pedidos:
+            fila[pedido.usuario] = pedidos  # Volta para o fim: rodízio entre usuários
+
+    def _remover(self, pedido: _Pedido) -> None:
+        fila = self._filas[pedido.classe]
+        pedidos = fila.get(pedido.usuario)
+        if pedidos is not None and pedido in pedidos:
+            pedidos.remove(pedido)
+            if not pedidos:
+                del fila[pedido.usuario]
+
+    def _ordem(self) -> List[_Pedido]:
+        """Pedidos na ordem em que seriam atendidos, se ninguém mais chegasse.
+
+        Simula `_proximo` com um heap por classe, ordenado por (gerações em andamento, posição no rodízio): custa
+        O(n log u) para n pedidos de u usuários, em vez de procurar o mínimo entre todos os usuários a cada pedido.
+        """
+        rodizio = itertools.count()
+        heaps = {}
+        for classe, fila in self._filas.items():
+            # (ativas, rodízio, usuário, pedidos restantes, quantos restam); o rodízio desempata, sem repetir
+            heaps[classe] = [(self._ativas.get(usuario, 0), next(rodizio), usuario, iter(pedidos), len(pedidos))
+                             for usuario, pedidos in fila.items()]
+            heapq.heapify(heaps[classe])
+
+        ordem = []
+        seguidas = self._prioritarias_seguidas
+        while heaps[PRIORITARIA] or heaps[NORMAL]:
+            if heaps[PRIORITARIA] and (not heaps[NORMAL] or seguidas < self.peso_prioridade):
+                classe = PRIORITARIA
+            else:
+                classe = NORMAL
+            heap = heaps[classe]
+            ativas, _, usuario, pedidos, restantes = heap[0]
+            ordem.append(next(pedidos))
+            if restantes > 1:
+                # Atendido, o usuário vai para o fim do rodízio com uma geração a mais
+                heapq.heapreplace(heap, (ativas + 1, next(rodizio), usuario, pedidos, restantes - 1))
+            else:
+                heapq.heappop(heap)
+            seguidas = seguidas + 1 if classe == PRIORITARIA else 0
+        return ordem
+
+    def _avisar_posicoes(self) -> None:
+        if self._avisos_agendados:
+            return
+        loop = asyncio.get_running_loop()
+        self._avisos_agendados = True
+        loop.call_later(max(0.0, self._ultimos_avisos + INTERVALO_AVISOS - loop.time()), self._enviar_avisos)
+
+    def _enviar_avisos(self) -> None:
+        self._avisos_agendados = False
+        self._ultimos_avisos = asyncio.get_running_loop().time()
+        for posicao, pedido in enumerate(self._ordem(), start=1):
+            self._avisar(pedido, posicao, posicao * self.duracao_media / self.limite)
+
+    @staticmethod
+    def _avisar(pedido: _Pedido, posicao: Optional[int], espera: float) -> None:
+        if pedido.avisar is None:
+            return
+        aviso = (posicao, round(espera)) if posicao is not None else None
+        if aviso == pedido.ultimo_aviso:
+            return
+        pedido.ultimo_aviso = aviso
+        try:
+            pedido.avisar(posicao, espera)
+        except Exception:
+            logger.exception("Erro ao avisar posição na fila de geração")
+
+    def situacao(self) -> Dict[str, float]:
+        return {'em_execucao': self.em_execucao, 'na_fila': self.na_fila, 'limite': self.limite,
+                'duracao_media': self.duracao_media}
+
+
+_agendador: Optional[AgendadorGeracoes] = None
+_lock = threading.Lock()
+
+
+def get_agendador() -> AgendadorGeracoes:
+    """Retorna o agendador de gerações compartilhado pelo processo."""
+    global _agendador
+    if _agendador is None:
+        with _lock:
+            if _agendador is None:
+                _agendador = AgendadorGeracoes()
+    return _agendador
@@ -0,0 +1,107 @@
+import time
+from typing import AsyncIterator, Iterator, List, Optional
+
+from configuracao import KIRA_AGRUPAR_INTERVALO_MIN_MS, KIRA_AGRUPAR_INTERVALO_MAX_MS, KIRA_AGRUPAR_BYTES
+from kira.transmissao import Transmissao
+
+
+# Envios até a janela de agrupamento chegar ao intervalo máximo
+ENVIOS_ATE_INTERVALO_MAXIMO = 20
+
+
+class Lote:
+    """Partes acumuladas entre dois envios ao cliente, com a regra de quando enviar.
+
+    O primeiro envio sai assim que chega a primeira parte (o tempo até a primeira resposta não muda);
+    os seguintes esperam uma janela que cresce do intervalo mínimo ao máximo conforme a resposta se alonga,
+    ou até acumular `tamanho` bytes. Não depende de como se espera pelas partes: serve para leitores
+    síncronos (Streamlit) e assíncronos.
+    """
+
+    def __init__(self, intervalo_min: float, intervalo_max: float, tamanho: int):
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = intervalo_max
+        self.tamanho = tamanho
+        self.partes: List[str] = []
+        self.bytes = 0
+        self.envios = 0
+        self.prazo: Optional[float] = None
+
+    def janela(self) -> float:
+        if not self.envios:
+            return 0.0
+        progresso = min(1.0, self.envios / ENVIOS_ATE_INTERVALO_MAXIMO)
+        return self.intervalo_min + (self.intervalo_max - self.intervalo_min) * progresso
+
+    def adicionar(self, partes: List[str], agora: float) -> None:
+        if not partes:
+            return
+        if not self.partes:
+            self.prazo = agora + self.janela()
+        self.partes.extend(partes)
+        self.bytes += sum(len(parte.encode('utf-8')) for parte in partes)
+
+    def espera(self, agora: float) -> Optional[float]:
+        """Quanto esperar por novas partes antes de enviar o que já está acumulado (None: sem limite)."""
+        return None if self.prazo is None else max(0.0, self.prazo - agora)
+
+    def pronto(self, agora: float, terminou: bool = False) -> bool:
+        return bool(self.partes) and (terminou or self.bytes >= self.tamanho or agora >= self.prazo)
+
+    def esvaziar(self) -> str:
+        texto = ''.join(self.partes)
+        self.partes, self.bytes, self.prazo = [], 0, None
+        self.envios += 1
+        return texto
+
+
+class Agrupador:
+    """Junta as partes de uma Transmissao em envios maiores e menos frequentes.
+
+    Cada parte do modelo (um token, em geral) enviada isoladamente vira uma atualização da interface;
+    agrupadas por janela de tempo ou tamanho, uma resposta longa chega em dezenas de envios em vez de
+    milhares, com o mesmo tempo até a primeira parte.
+    """
+
+    def __init__(self, intervalo_min: float = KIRA_AGRUPAR_INTERVALO_MIN_MS / 1000,
+                 intervalo_max: float = KIRA_AGRUPAR_INTERVALO_MAX_MS / 1000, tamanho: int = KIRA_AGRUPAR_BYTES):
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = intervalo_max
+        self.tamanho = tamanho
+
+    def novo_lote(self) -> Lote:
+        return Lote(self.intervalo_min, self.intervalo_max, self.tamanho)
+
+    def agrupar(self, transmissao: Transmissao, desde: int = 0) -> Iterator[str]:
+        """Texto da transmissão a partir da posição `desde`, em envios agrupados; levanta o erro do produtor."""
+        lote = self.novo_lote()
+        posicao = desde
+        while True:
+            novas, terminou = transmissao.ler(posicao, lote.espera(time.monotonic()))
+            posicao += len(novas)
+            agora = time.monotonic()
+            lote.adicionar(novas, agora)
+            if lote.pronto(agora, terminou):
+                yield lote.esvaziar()
+            if terminou:
+                if transmissao.erro is not None:
+                    raise transmissao.erro
+                return
+
+    async def agrupar_async(self, transmissao: Transmissao, desde: int = 0) -> AsyncIterator[str]:
+        """Versão assíncrona de `agrupar`, para canais servidos por um event loop (ex.: a API de chat)."""
+        lote = self.novo_lote()
+        posicao = desde
+        while True:
+            versao = transmissao.versao
+            novas, terminou = transmissao.ler(posicao, 0)
+            posicao += len(novas)
+            agora = time.monotonic()
+            lote.adicionar(novas, agora)
+            if lote.pronto(agora, terminou):
+                yield lote.esvaziar()
+            if terminou:
+                if transmissao.erro is not None:
+                    raise transmissao.erro
+                return
+            await transmissao.aguardar(versao, lote.espera(agora))
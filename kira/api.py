@@ -0,0 +1,166 @@
+"""API de chat da KIRA para canais fora do Streamlit (WhatsApp, widget do site).
+
+    uvicorn kira.api:app --port 8020
+
+POST /chat com o cabeçalho X-Kira-Token (KIRA_API_TOKEN) e o corpo
+
+    {"usuario": "whatsapp:+5531999999999", "mensagem": "Quero vender mais", "conversa": "<id, opcional>"}
+
+O histórico fica no servidor (kira.conversas): o cliente envia só a mensagem nova e, se quiser continuar
+uma conversa específica, o id dela; sem id, continua a conversa mais recente do usuário. Os usuários da API
+têm um espaço de nomes próprio (prefixo "api:"), separado dos usuários do Streamlit, e entram na fila de
+geração como clientes: o id vem do canal e não comprova quem é a pessoa. A resposta é transmitida em
+Server-Sent Events:
+
+    conversa   {"conversa": id}                      sempre o primeiro evento
+    intencao   {"intencao": nome, "trecho": texto}   ex.: cadastro, agendamento (o canal decide o que fazer)
+    fila       {"posicao": n, "espera": segundos}    enquanto a geração aguarda vaga
+    token      {"texto": parte}                      partes da resposta, já agrupadas
+    fim        {"conversa": id}                      resposta completa e gravada no histórico
+    erro       {"mensagem": texto}                   a pergunta não fica no histórico; o canal pode reenviá-la
+
+Cada conexão ociosa é só uma corrotina esperando um asyncio.Event, então um único worker atende milhares
+delas; se o cliente desconecta, a geração é cancelada (quando ninguém mais a acompanha).
+"""
+import asyncio
+import hmac
+import json
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from configuracao import KIRA_API_TOKEN, KIRA_API_PING
+from kira.agrupamento import Agrupador
+from kira.atendimento import Atendimento, Resposta, get_atendimento
+from kira.contexto import JanelaContexto
+from kira.tokenizer import tokens_mensagem
+
+
+logger = logging.getLogger(__name__)
+
+PREFIXO_USUARIO = 'api:'  # Conversas, fila e métricas dos usuários da API não se misturam às do Streamlit
+PAPEL_API = 'cliente'  # Prioridade na fila de geração
+
+app = FastAPI()
+
+
+class PedidoChat(BaseModel):
+    usuario: str
+    mensagem: str
+    conversa: Optional[str] = None
+
+
+def _evento(nome: str, dados: Dict[str, Any]) -> str:
+    return f"event: {nome}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+def _iniciar_turno(atendimento: Atendimento, conversa: str, usuario: str,
+                   pedido: PedidoChat) -> Tuple[Resposta, Dict[str, Any], int]:
+    """Grava a mensagem do usuário e inicia a resposta (acessa SQLite e a recuperação; roda fora do loop).
+
+    Retorna também a posição da mensagem gravada, para desfazê-la se a resposta não for concluída.
+    """
+    armazem = atendimento.armazem
+    contexto = {**JanelaContexto.novo_estado(), **armazem.contexto(conversa)}
+    mensagens, base = armazem.carregar(conversa, contexto['resumidas'])
+    mensagem = {'role': 'user', 'content': pedido.mensagem}
+    tokens_mensagem(mensagem)
+    posicao = armazem.adicionar(conversa, mensagem)
+    mensagens.append(mensagem)
+    resposta = atendimento.responder(mensagens, contexto, base, usuario, PAPEL_API, canal='api')
+    return resposta, contexto, posicao
+
+
+def _registrar_resposta(atendimento: Atendimento, conversa: str, texto: str, contexto: Dict[str, Any]) -> None:
+    mensagem = {'role': 'assistant', 'content': texto}
+    tokens_mensagem(mensagem)
+    atendimento.armazem.adicionar(conversa, mensagem)
+    atendimento.salvar_contexto(conversa, contexto)
+
+
+async def _eventos(atendimento: Atendimento, conversa: str, resposta: Resposta, contexto: Dict[str, Any],
+                   posicao_pergunta: int) -> AsyncIterator[str]:
+    concluida = False
+    try:
+        yield _evento('conversa', {'conversa': conversa})
+        if resposta.intencao is not None:
+            yield _evento('intencao', {'intencao': resposta.intencao.nome, 'trecho': resposta.intencao.trecho})
+        async for posicao, espera in resposta.transmissao.acompanhar_fila_async():
+            yield _evento('fila', {'posicao': posicao, 'espera': round(espera)})
+        try:
+            async for texto in Agrupador().agrupar_async(resposta.transmissao):
+                yield _evento('token', {'texto': texto})
+        except Exception:
+            logger.exception("Erro ao gerar resposta da conversa %s", conversa)
+            concluida = True
+            # Sem resposta, a pergunta sai do histórico: não ficam dois turnos do usuário seguidos
+            await asyncio.to_thread(atendimento.armazem.desfazer, conversa, posicao_pergunta)
+            yield _evento('erro', {'mensagem': "Não foi possível gerar a resposta. Tente novamente."})
+            return
+        concluida = True
+        await asyncio.to_thread(_registrar_resposta, atendimento, conversa, resposta.transmissao.texto, contexto)
+        yield _evento('fim', {'conversa': conversa})
+    finally:
+        if not concluida:
+            # Cliente desconectou no meio da resposta, que não será gravada; a pergunta também sai do histórico
+            # (sem aguardar: a tarefa pode estar sendo cancelada)
+            atendimento.desistir(resposta)
+            asyncio.get_running_loop().run_in_executor(None, atendimento.armazem.desfazer, conversa,
+                                                     posicao_pergunta)
+
+
+async def _com_pings(eventos: AsyncGenerator[str, None], intervalo: float = KIRA_API_PING) -> AsyncIterator[str]:
+    """Repassa os eventos, intercalando comentários SSE enquanto não há nada a enviar.
+
+    Mantém a conexão viva em proxies e balanceadores durante a fila e o tempo até a primeira parte.
+    """
+    proximo = asyncio.ensure_future(anext(eventos))
+    try:
+        while True:
+            feitos, _ = await asyncio.wait({proximo}, timeout=intervalo)
+            if not feitos:
+                yield ": ping\n\n"
+                continue
+            try:
+                yield proximo.result()
+            except StopAsyncIteration:
+                return
+            proximo = asyncio.ensure_future(anext(eventos))
+    finally:
+        # Desconexão: cancela o evento pendente e fecha `eventos` já, e não só quando for coletado: se ele estava
+        # parado em um yield, é o aclose que roda o seu finally (`desistir` e a remoção da pergunta)
+        proximo.cancel()
+        try:
+            await proximo
+        except BaseException:
+            pass
+        await eventos.aclose()
+
+
+@app.post("/chat")
+async def chat(pedido: PedidoChat, x_kira_token: Optional[str] = Header(None)):
+    if not KIRA_API_TOKEN or not x_kira_token or \
+            not hmac.compare_digest(x_kira_token.encode(), KIRA_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Token inválido")
+    if not pedido.usuario.strip() or not pedido.mensagem.strip():
+        raise HTTPException(status_code=400, detail="Usuário e mensagem são obrigatórios")
+
+    atendimento = get_atendimento()
+    armazem = atendimento.armazem
+    usuario = PREFIXO_USUARIO + pedido.usuario
+    if pedido.conversa is None:
+        conversa = await asyncio.to_thread(armazem.conversa_atual, usuario)
+    elif await asyncio.to_thread(armazem.dono, pedido.conversa) == usuario:
+        conversa = pedido.conversa
+    else:
+        raise HTTPException(status_code=404, detail="Conversa não encontrada")
+
+    resposta, contexto, posicao = await asyncio.to_thread(_iniciar_turno, atendimento, conversa, usuario, pedido)
+    return StreamingResponse(
+        _com_pings(_eventos(atendimento, conversa, resposta, contexto, posicao)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
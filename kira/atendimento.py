@@ -0,0 +1,153 @@
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from kira.agendador import get_agendador
+from kira.cache_respostas import chave_resposta, get_cache_respostas
+from kira.contexto import JanelaContexto, incluir_conhecimento
+from kira.conversas import get_armazem_conversas
+from kira.intencoes import Intencao, get_detector_intencoes
+from kira.metricas import get_metricas
+from kira.provedores import RequisicaoGeracao, get_provedor
+from kira.recuperacao import buscar_trechos
+from kira.roteador import TEMPLATE, Decisao, get_roteador
+from kira.tokenizer import tokens_mensagem
+from kira.transmissao import Transmissao
+from utils.user_directory import get_user_directory
+
+
+def montar_system_prompt(is_in_registration: bool = False, is_in_scheduling: bool = False) -> str:
+    return f'''
+    Você é uma atendente virtual chamada "KIRA", que atuará como atendente virtual da plataforma FAM, facilitando a 
+    interação entre fabricantes de moda e lojistas no Brasil. 
+
+    **Cadastro e Agendamento:**
+       - Se o usuário estiver com o status de cadastro {is_in_registration} ou agendamento {is_in_scheduling}, 
+       informe que não enviará mais informações até que finalize o cadastro. Use uma resposta padrão que diga: 
+       "Aguardo a finalização do seu cadastro para continuar."
+
+    **Opção de Cadastro e Agendamento:**
+       - Se o usuário enviar um pedido de cadastro ou de agendamento de reunião, responda que está aguardando o preenchimento completo do formulário. 
+       - Mantenha a mesma resposta enquanto ele não finalizar o cadastro.
+       - Se o status do cadastro estiver {is_in_scheduling} ou {is_in_registration} mantenha a mesma resposta enquanto
+       ele não finalizar o cadastro.
+    
+    1. **Definição Clara**: Você deve ser uma assistente que não apenas responde perguntas, mas também oferece conselhos sobre como maximizar as vendas, sugere estratégias de marketing e conecta os fabricantes aos lojistas de forma eficaz. Isso ajudará a IA a entender melhor as expectativas dos usuários.
+    
+    2. **Estrutura da Resposta**: Ao interagir com os usuários, KIRA deve organizar suas respostas em partes lógicas. Por exemplo:
+    - **Saudação**: "Olá! Sou a KIRA, sua assistente virtual."
+    - **Identificação de Necessidades**: "Como posso ajudar você hoje? Está buscando conectar-se a um lojista ou precisa de dicas para aumentar suas vendas?"
+    - **Solução**: Após a identificação, KIRA pode fornecer informações específicas ou direcionar o usuário para as funcionalidades da plataforma.
+    
+    3. **Tom de Comunicação**: O tom de seu deve ser amigável e acessível. Em conversas mais formais, ela pode usar uma linguagem técnica e objetiva, mas em interações cotidianas, ela deve adotar um tom mais descontraído e motivacional. Por exemplo: "Vamos juntos fazer seu negócio brilhar no mercado!".
+    
+    4. **Personalização e Precisão**:Você deve ser capaz de personalizar suas respostas com base nas informações fornecidas pelos usuários. Por exemplo, se o fabricante mencionar que está lançando uma nova linha de produtos, FAMOSA pode oferecer dicas específicas sobre como promovê-los para os lojistas, aumentando assim a relevância da interação.
+    5. Se o cliente quiser fazer uma assinatura para ter acessoa plataforma envie este link: https://buy.stripe.com/test_fZeg2L7MBcCE9heeUY
+    6. Se o cliente desejar conversar com uma consultora envie este link de WhatsApp da Consultora Mari: https://wa.me/+553199302907
+    '''
+
+
+class Resposta(NamedTuple):
+    transmissao: Transmissao
+    chave: Optional[str]  # Chave no cache de respostas; None nas respostas fixas
+    intencao: Optional[Intencao]
+    decisao: Decisao
+
+
+def papel_do_usuario(usuario: str) -> str:
+    """Papel do usuário cadastrado (admin, parceiro, cliente); quem não tem cadastro é tratado como cliente."""
+    return (get_user_directory().buscar_por_username(usuario) or {}).get('role', 'cliente')
+
+
+class Atendimento:
+    """Motor do chat da KIRA, comum à página do Streamlit e à API de chat.
+
+    A cada pergunta: detecta a intenção na mensagem mais recente, escolhe o nível de atendimento (resposta
+    fixa, modelo pequeno ou grande), monta o prompt dentro do orçamento de tokens com os trechos relevantes
+    da base de conhecimento e inicia a geração (cache, fila de gerações e provedor) em segundo plano.
+    O que fazer com a intenção (abrir um formulário, enviar um link) fica com cada canal. Cada turno é
+    medido (latência, tokens, cache, usuário) em kira.metricas.
+    """
+
+    def __init__(self):
+        self.janela = JanelaContexto()
+        self.detector_intencoes = get_detector_intencoes()
+        self.cache_respostas = get_cache_respostas()
+        self.roteador = get_roteador()
+        self.provedor = get_provedor()
+        self.agendador = get_agendador()
+        self.armazem = get_armazem_conversas()
+        self.metricas = get_metricas()
+
+    def responder(self, mensagens: List[Dict[str, Any]], contexto: Dict[str, Any], base: int, usuario: str,
+                  papel: str, system_prompt: Optional[str] = None, canal: str = 'streamlit') -> Resposta:
+        """Inicia a resposta à última mensagem de `mensagens` (o final da conversa, a partir da posição `base`)."""
+        inicio = time.time(), time.monotonic()
+        pergunta = mensagens[-1]
+
+        # Intenções só da mensagem mais recente do usuário, não do histórico inteiro
+        intencao = self.detector_intencoes.detectar(pergunta["content"])
+
+        # Respostas fixas saem na hora; turnos simples vão para o modelo pequeno e só os demais para o grande
+        decisao = self.roteador.decidir(pergunta["content"], tokens_mensagem(pergunta), intencao)
+        if decisao.nivel == TEMPLATE:
+            transmissao = Transmissao.pronta(decisao.resposta)
+            self.metricas.acompanhar(transmissao, inicio, usuario, papel, canal, decisao.nivel, None, TEMPLATE, 0)
+            return Resposta(transmissao, None, intencao, decisao)
+
+        # Últimas trocas literais dentro do orçamento de tokens; as antigas entram pelo resumo
+        prompt_str = self.janela.montar_prompt(mensagens, contexto, base)
+        # Só os trechos da base e do catálogo relevantes para a última pergunta entram no system prompt
+        trechos = buscar_trechos(pergunta["content"])
+        prompt_sistema = incluir_conhecimento(system_prompt or montar_system_prompt(), trechos)
+
+        # Perguntas repetidas no mesmo contexto saem do cache, e pedidos iguais simultâneos compartilham a mesma
+        # geração. O provedor entra na chave: respostas simuladas pelo provedor local nunca saem do cache
+        # em produção
+        chave = chave_resposta(pergunta["content"], prompt_sistema, trechos,
+                               f"{self.provedor.nome}:{decisao.modelo}",
+                               self.janela.contexto_da_pergunta(mensagens, contexto, base))
+        requisicao = RequisicaoGeracao(decisao.modelo, prompt_str, prompt_sistema, decisao.max_tokens)
+        transmissao, origem = self.cache_respostas.transmitir(chave, lambda t: self.agendador.transmitir(
+            usuario, papel, lambda: self.provedor.transmitir(requisicao), t.informar_fila))
+        tokens_prompt = self.janela.contar_tokens(prompt_str) + self.janela.contar_tokens(prompt_sistema)
+        self.metricas.acompanhar(transmissao, inicio, usuario, papel, canal, decisao.nivel, decisao.modelo, origem,
+                                 tokens_prompt)
+        return Resposta(transmissao, chave, intencao, decisao)
+
+    def desistir(self, resposta: Resposta) -> None:
+        """O canal não vai mais exibir a resposta; a geração para se ninguém mais a acompanha."""
+        if resposta.chave is not None:
+            self.cache_respostas.desistir(resposta.chave, resposta.transmissao)
+
+    def salvar_contexto(self, conversa: str, contexto: Dict[str, Any]) -> None:
+        """Grava o estado do resumo da conversa; um resumo ainda em andamento é gravado quando ficar pronto."""
+        self.armazem.salvar_contexto(conversa, contexto)
+        pendente = contexto.get('pendente')
+        if pendente is None:
+            return
+        future, ate = pendente
+
+        def resumo_pronto(future):
+            # Sem isso, canais sem estado entre turnos (a API) perderiam todo resumo feito em segundo plano
+            if future.cancelled() or future.exception() is not None:
+                return
+            resumo = future.result()
+            self.armazem.salvar_contexto(conversa, {'resumo': resumo, 'resumidas': ate,
+                                                    'tokens_resumo': self.janela.contar_tokens(resumo)})
+
+        future.add_done_callback(resumo_pronto)
+
+
+_atendimento: Optional[Atendimento] = None
+_lock = threading.Lock()
+
+
+def get_atendimento() -> Atendimento:
+    """Retorna o motor de atendimento compartilhado pelo processo."""
+    global _atendimento
+    if _atendimento is None:
+        with _lock:
+            if _atendimento is None:
+                _atendimento = Atendimento()
+    return _atendimento
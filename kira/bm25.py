@@ -0,0 +1,170 @@
+import re
+import threading
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from configuracao import KIRA_TRECHOS_CONTEXTO
+from kira.conhecimento import BaseConhecimento, Trecho, get_base_conhecimento
+
+
+STOPWORDS = frozenset("""
+a ao aos as ate com como da das de do dos e ela elas ele eles em entre era essa esse esta este eu foi ha isso
+isto ja la lhe mais mas me meu minha muito na nas nao no nos o os ou para pela pelas pelo pelos por qual quando
+que quem se sem ser seu sua suas seus so sobre tambem te tem ter um uma umas uns voce voces vou
+""".split())
+
+_PALAVRA = re.compile(r"[a-z0-9]+")
+
+# (sufixo, substituição, tamanho mínimo do radical), do mais longo para o mais curto
+_PLURAIS = (('oes', 'ao', 1), ('aes', 'ao', 1), ('ais', 'al', 1), ('eis', 'el', 2), ('ois', 'ol', 1),
+            ('res', 'r', 2), ('zes', 'z', 2), ('les', 'l', 2), ('ns', 'm', 1), ('s', '', 2))
+_DERIVACOES = ('amentos', 'imentos', 'issimo', 'issima', 'amento', 'imento', 'mente', 'acao', 'icao', 'idade',
+               'ancia', 'encia', 'zinho', 'zinha', 'inho', 'inha', 'ismo', 'ista', 'avel', 'ivel', 'ador', 'edor',
+               'idor', 'ando', 'endo', 'indo', 'ado', 'ido', 'ada', 'ida', 'ar', 'er', 'ir')
+
+
+def dobrar_acentos(texto: str) -> str:
+    """Minúsculas sem acentos ("Reunião" -> "reuniao")."""
+    decomposto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=100_000)
+def radical(palavra: str) -> str:
+    """Stemmer leve para português (plural, derivações comuns e vogal temática), sobre texto sem acentos.
+
+    Não pretende ser linguisticamente exato; basta reduzir variações ao mesmo radical de forma
+    consistente entre consulta e documentos ("vestidos", "vestido" e "vestida" -> "vest").
+    """
+    for sufixo, troca, minimo in _PLURAIS:
+        if palavra.endswith(sufixo) and len(palavra) - len(sufixo) >= minimo + 2:
+            palavra = palavra[:-len(sufixo)] + troca
+            break
+    for sufixo in _DERIVACOES:
+        if palavra.endswith(sufixo) and len(palavra) - len(sufixo) >= 3:
+            palavra = palavra[:-len(sufixo)]
+            break
+    if len(palavra) > 3 and palavra[-1] in 'aeo':
+        palavra = palavra[:-1]
+    return palavra
+
+
+def termos(texto: str) -> List[str]:
+    """Termos indexáveis: sem acentos, sem stopwords e reduzidos ao radical."""
+    return [radical(p) for p in _PALAVRA.findall(dobrar_acentos(texto)) if p not in STOPWORDS]
+
+
+class IndiceBM25:
+    """Índice BM25 em matriz esparsa (CSC, termo por coluna) com os pesos já calculados.
+
+    Uma consulta soma as colunas dos seus termos; o custo depende só do tamanho das listas de
+    ocorrência desses termos, não do número de trechos.
+    """
+
+    def __init__(self, trechos: Sequence[Trecho], k1: float = 1.5, b: float = 0.75):
+        self.trechos = tuple(trechos)
+        self.vocabulario: Dict[str, int] = {}
+        linhas: List[int] = []
+        colunas: List[int] = []
+        frequencias: List[int] = []
+        tamanhos = np.zeros(len(self.trechos), dtype=np.float32)
+
+        for linha, trecho in enumerate(self.trechos):
+            contagem = Counter(termos(trecho.texto))
+            tamanhos[linha] = sum(contagem.values())
+            for termo, frequencia in contagem.items():
+                linhas.append(linha)
+                colunas.append(self.vocabulario.setdefault(termo, len(self.vocabulario)))
+                frequencias.append(frequencia)
+
+        tf = np.asarray(frequencias, dtype=np.float32)
+        linhas_arr = np.asarray(linhas, dtype=np.int32)
+        colunas_arr = np.asarray(colunas, dtype=np.int32)
+        n = max(len(self.trechos), 1)
+        df = np.bincount(colunas_arr, minlength=len(self.vocabulario)).astype(np.float32)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        normalizacao = k1 * (1 - b + b * tamanhos / max(float(tamanhos.mean()) if len(tamanhos) else 0.0, 1.0))
+        pesos = idf[colunas_arr] * tf * (k1 + 1) / (tf + normalizacao[linhas_arr])
+
+        self.matriz = sparse.csc_matrix((pesos, (linhas_arr, colunas_arr)),
+                                        shape=(len(self.trechos), len(self.vocabulario)), dtype=np.float32)
+
+    def buscar(self, consulta: str, k: int = KIRA_TRECHOS_CONTEXTO) -> List[Tuple[Trecho, float]]:
+        """Os `k` trechos mais relevantes para a consulta, com a pontuação BM25."""
+        colunas = sorted({self.vocabulario[t] for t in termos(consulta) if t in self.vocabulario})
+        if not colunas or k <= 0:
+            return []
+        inicio, fim = self.matriz.indptr[colunas], self.matriz.indptr[np.asarray(colunas) + 1]
+        fatias = [np.arange(i, f) for i, f in zip(inicio, fim)]
+        posicoes = np.concatenate(fatias)
+        documentos, inverso = np.unique(self.matriz.indices[posicoes], return_inverse=True)
+        pontuacoes = np.bincount(inverso, weights=self.matriz.data[posicoes])
+
+        if len(documentos) > k:
+            melhores = np.argpartition(pontuacoes, -k)[-k:]
+        else:
+            melhores = np.arange(len(documentos))
+        melhores = melhores[np.argsort(-pontuacoes[melhores])]
+        return [(self.trechos[documentos[i]], float(pontuacoes[i])) for i in melhores]
+
+
+class RecuperadorBM25:
+    """Mantém um IndiceBM25 sincronizado com a base de conhecimento.
+
+    O primeiro índice é construído na hora; depois, quando a base muda, o novo índice é construído em uma
+    thread e o anterior continua atendendo as consultas até a troca.
+    """
+
+    def __init__(self, base: BaseConhecimento):
+        self.base = base
+        self._lock = threading.Lock()
+        self._indice: Optional[IndiceBM25] = None
+        self._versao = -1
+        self._reconstruindo = False
+
+    def _reconstruir(self) -> None:
+        try:
+            # A versão é lida antes dos trechos: se a base mudar no meio, o índice só é reconstruído de novo
+            versao = self.base.versao
+            indice = IndiceBM25(self.base.trechos())
+            with self._lock:
+                self._indice, self._versao = indice, versao
+        finally:
+            self._reconstruindo = False
+
+    def indice(self) -> IndiceBM25:
+        self.base.atualizar()
+        if self._indice is None:
+            with self._lock:
+                if self._indice is None:
+                    versao = self.base.versao
+                    self._indice, self._versao = IndiceBM25(self.base.trechos()), versao
+        elif self._versao != self.base.versao and not self._reconstruindo:
+            with self._lock:
+                if self._reconstruindo:
+                    return self._indice
+                self._reconstruindo = True
+            threading.Thread(target=self._reconstruir, name="kira-bm25", daemon=True).start()
+        return self._indice
+
+    def buscar(self, consulta: str, k: int = KIRA_TRECHOS_CONTEXTO) -> List[Tuple[Trecho, float]]:
+        return self.indice().buscar(consulta, k)
+
+
+_recuperador: Optional[RecuperadorBM25] = None
+_recuperador_lock = threading.Lock()
+
+
+def get_recuperador_bm25() -> RecuperadorBM25:
+    """Retorna o recuperador BM25 da base de conhecimento compartilhado pelo processo."""
+    global _recuperador
+    if _recuperador is None:
+        with _recuperador_lock:
+            if _recuperador is None:
+                _recuperador = RecuperadorBM25(get_base_conhecimento())
+    return _recuperador
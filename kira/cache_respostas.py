@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, Iterable, Optional, Tuple
+
+from configuracao import KIRA_CACHE_RESPOSTAS_ITENS, KIRA_CACHE_RESPOSTAS_TTL, KIRA_CACHE_RESPOSTAS_PATH
+from kira.conhecimento import Trecho
+from kira.intencoes import normalizar
+from kira.transmissao import Transmissao
+from utils.banco import BancoSQLite
+from utils.event_loop import disparar
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS respostas (
+    chave TEXT PRIMARY KEY,
+    resposta TEXT NOT NULL,
+    criado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_respostas_criado_em ON respostas (criado_em);
+"""
+
+# De onde veio a transmissão retornada por `CacheRespostas.transmitir`
+ORIGEM_CACHE = 'cache'  # Resposta já guardada
+ORIGEM_COMPARTILHADA = 'compartilhada'  # Geração igual já em andamento
+ORIGEM_GERADA = 'gerada'  # Geração nova
+
+
+class _ArquivoRespostas(BancoSQLite):
+    SCHEMA = SCHEMA
+
+
+def chave_resposta(pergunta: str, system_prompt: str, trechos: Iterable[Trecho] = (), modelo: str = '',
+                   contexto: str = '') -> str:
+    """Chave do cache: modelo + pergunta normalizada + hashes do system prompt, dos trechos recuperados e do contexto.
+
+    O contexto (resumo + trocas anteriores, sem a pergunta) entra na chave porque a mesma pergunta depende do que
+    veio antes ("pode me explicar melhor?"); a pergunta entra só normalizada, então "Como me cadastrar?" e
+    "como me cadastrar" no mesmo contexto compartilham a resposta.
+    """
+    partes = [
+        modelo,
+        normalizar(pergunta)[0].strip(),
+        hashlib.sha256(system_prompt.encode('utf-8')).hexdigest(),
+        hashlib.sha256('|'.join(t.hash for t in trechos).encode('utf-8')).hexdigest(),
+        hashlib.sha256(contexto.encode('utf-8')).hexdigest(),
+    ]
+    return hashlib.sha256('\n'.join(partes).encode('utf-8')).hexdigest()
+
+
+class CacheRespostas:
+    """Cache de respostas do modelo (LRU com expiração), com persistência opcional em SQLite.
+
+    Pedidos idênticos feitos enquanto a primeira geração ainda está em andamento não chamam o modelo
+    de novo: todos acompanham a mesma Transmissao. Só respostas concluídas sem erro são guardadas.
+    """
+
+    def __init__(self, capacidade: int = KIRA_CACHE_RESPOSTAS_ITENS, ttl: float = KIRA_CACHE_RESPOSTAS_TTL,
+                 caminho: Optional[str] = KIRA_CACHE_RESPOSTAS_PATH):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self.arquivo = _ArquivoRespostas(caminho) if caminho else None
+        self._lock = threading.Lock()
+        self._itens: 'OrderedDict[str, Tuple[str, float]]' = OrderedDict()
+        self._em_andamento: Dict[str, Transmissao] = {}
+
+    def obter(self, chave: str) -> Optional[str]:
+        agora = time.time()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                if agora - item[1] < self.ttl:
+                    self._itens.move_to_end(chave)
+                    return item[0]
+                del self._itens[chave]
+
+        if self.arquivo is not None:
+            linha = self.arquivo.conexao().execute(
+                "SELECT resposta, criado_em FROM respostas WHERE chave = ? AND criado_em > ?",
+                (chave, agora - self.ttl),
+            ).fetchone()
+            if linha is not None:
+                self._guardar_memoria(chave, linha['resposta'], linha['criado_em'])
+                return linha['resposta']
+        return None
+
+    def _guardar_memoria(self, chave: str, resposta: str, criado_em: float) -> None:
+        with self._lock:
+            self._itens[chave] = (resposta, criado_em)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+
+    def guardar(self, chave: str, resposta: str) -> None:
+        criado_em = time.time()
+        self._guardar_memoria(chave, resposta, criado_em)
+        if self.arquivo is not None:
+            with self.arquivo.transacao() as conn:
+                conn.execute("INSERT OR REPLACE INTO respostas (chave, resposta, criado_em) VALUES (?, ?, ?)",
+                             (chave, resposta, criado_em))
+                conn.execute("DELETE FROM respostas WHERE criado_em <= ?", (criado_em - self.ttl,))
+
+    def transmitir(self, chave: str, gerar: Callable[[Transmissao], AsyncIterator[str]]) -> Tuple[Transmissao, str]:
+        """Retorna a transmissão da resposta e a sua origem (ORIGEM_CACHE, ORIGEM_COMPARTILHADA ou ORIGEM_GERADA).
+
+        Se a resposta estiver em cache, a transmissão já vem concluída; se uma geração igual estiver em
+        andamento, a mesma transmissão é compartilhada; senão `gerar(transmissao)` é iniciada no loop global
+        (recebe a transmissão para informar, por exemplo, a posição na fila).
+        """
+        resposta = self.obter(chave)
+        if resposta is not None:
+            return Transmissao.pronta(resposta), ORIGEM_CACHE
+
+        with self._lock:
+            transmissao = self._em_andamento.get(chave)
+            if transmissao is not None:
+                transmissao.assinantes += 1
+                return transmissao, ORIGEM_COMPARTILHADA
+            transmissao = Transmissao()
+            transmissao.assinantes = 1
+            self._em_andamento[chave] = transmissao
+            transmissao.tarefa = disparar(self._produzir(chave, transmissao, gerar))
+        return transmissao, ORIGEM_GERADA
+
+    def desistir(self, chave: str, transmissao: Transmissao) -> None:
+        """Deixa de acompanhar a transmissão; sem ninguém mais acompanhando, a geração é cancelada no provedor."""
+        with self._lock:
+            if transmissao.concluida or transmissao.assinantes <= 0:
+                return
+            transmissao.assinantes -= 1
+            if transmissao.assinantes:
+                return
+            # Pedidos iguais que chegarem depois começam uma geração nova, em vez de receber a cancelada
+            if self._em_andamento.get(chave) is transmissao:
+                del self._em_andamento[chave]
+        if transmissao.tarefa is not None:
+            transmissao.tarefa.cancel()
+
+    async def _produzir(self, chave: str, transmissao: Transmissao,
+                        gerar: Callable[[Transmissao], AsyncIterator[str]]) -> None:
+        erro = None
+        try:
+            async for parte in gerar(transmissao):
+                transmissao.publicar(parte)
+        except BaseException as e:
+            erro = e
+            raise
+        finally:
+            with self._lock:
+                if self._em_andamento.get(chave) is transmissao:
+                    del self._em_andamento[chave]
+            try:
+                if erro is None and transmissao.texto.strip():
+                    await asyncio.to_thread(self.guardar, chave, transmissao.texto)
+            finally:
+                transmissao.concluir(erro)
+
+
+_cache: Optional[CacheRespostas] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache_respostas() -> CacheRespostas:
+    """Retorna o cache de respostas compartilhado pelo processo."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheRespostas()
+    return _cache
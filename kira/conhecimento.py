@@ -0,0 +1,160 @@
+import csv
+import hashlib
+import io
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from configuracao import (KIRA_CONHECIMENTO_PASTA, KIRA_CONHECIMENTO_INTERVALO, KIRA_TRECHO_PALAVRAS,
+                          KIRA_TRECHO_SOBREPOSICAO)
+
+
+class Trecho(NamedTuple):
+    id: str  # "<arquivo relativo>#<índice>"
+    arquivo: str
+    texto: str
+    hash: str  # sha1 do texto, usado para reaproveitar embeddings de trechos inalterados
+
+
+class _Arquivo(NamedTuple):
+    mtime_ns: int
+    tamanho: int
+    hash: str
+    trechos: Tuple[Trecho, ...]
+
+
+def dividir_em_trechos(texto: str, palavras: int = KIRA_TRECHO_PALAVRAS,
+                       sobreposicao: int = KIRA_TRECHO_SOBREPOSICAO) -> List[str]:
+    """Divide o texto em trechos de até `palavras` palavras, respeitando parágrafos quando possível.
+
+    Parágrafos maiores que o limite são cortados em janelas com `sobreposicao` palavras repetidas
+    entre trechos consecutivos, para não separar uma informação da frase que a explica.
+    """
+    trechos: List[str] = []
+    atual: List[str] = []
+    for paragrafo in texto.split('\n\n'):
+        termos = paragrafo.split()
+        if not termos:
+            continue
+        if atual and len(atual) + len(termos) > palavras:
+            trechos.append(' '.join(atual))
+            atual = []
+        while len(termos) > palavras:
+            trechos.append(' '.join(termos[:palavras]))
+            termos = termos[palavras - sobreposicao:]
+        atual.extend(termos)
+    if atual:
+        trechos.append(' '.join(atual))
+    return trechos
+
+
+def linhas_catalogo(conteudo: str) -> List[str]:
+    """Um trecho por produto de um catálogo CSV, no formato "coluna: valor | coluna: valor"."""
+    try:
+        dialeto = csv.Sniffer().sniff(conteudo[:4096], ';,\t')
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(io.StringIO(conteudo), dialect=dialeto)
+    return [' | '.join(f"{coluna}: {valor}" for coluna, valor in linha.items() if coluna and valor)
+            for linha in leitor]
+
+
+class BaseConhecimento:
+    """Arquivos .txt de ./conhecimento carregados e divididos em trechos uma única vez por processo.
+
+    Arquivos .csv (catálogo de produtos) geram um trecho por linha.
+
+    A pasta é reverificada no máximo a cada `intervalo` segundos, e só os arquivos com mtime ou tamanho
+    alterados são relidos; se o conteúdo (sha1) não mudou, os trechos existentes são mantidos. Cada
+    alteração efetiva incrementa `versao`, que os índices de busca usam para saber quando se atualizar.
+    """
+
+    def __init__(self, pasta: str = KIRA_CONHECIMENTO_PASTA, intervalo: float = KIRA_CONHECIMENTO_INTERVALO):
+        self.pasta = pasta
+        self.intervalo = intervalo
+        self.versao = 0
+        self._lock = threading.Lock()
+        self._arquivos: Dict[str, _Arquivo] = {}
+        self._trechos: Tuple[Trecho, ...] = ()
+        self._verificado_em: Optional[float] = None
+
+    def _listar_arquivos(self) -> Dict[str, os.stat_result]:
+        encontrados = {}
+        pendentes = [self.pasta]
+        while pendentes:
+            try:
+                entradas = os.scandir(pendentes.pop())
+            except FileNotFoundError:
+                continue
+            with entradas:
+                for entrada in entradas:
+                    if entrada.is_dir():
+                        pendentes.append(entrada.path)
+                    elif entrada.name.lower().endswith(('.txt', '.csv')):
+                        encontrados[os.path.relpath(entrada.path, self.pasta)] = entrada.stat()
+        return encontrados
+
+    def _carregar_arquivo(self, relativo: str, estatistica: os.stat_result) -> _Arquivo:
+        with open(os.path.join(self.pasta, relativo), 'rb') as f:
+            conteudo = f.read()
+        hash_arquivo = hashlib.sha1(conteudo).hexdigest()
+        anterior = self._arquivos.get(relativo)
+        if anterior is not None and anterior.hash == hash_arquivo:
+            return anterior._replace(mtime_ns=estatistica.st_mtime_ns, tamanho=estatistica.st_size)
+
+        texto = conteudo.decode('utf-8', errors='replace')
+        textos = linhas_catalogo(texto) if relativo.lower().endswith('.csv') else dividir_em_trechos(texto)
+        trechos = tuple(
+            Trecho(f"{relativo}#{indice}", relativo, texto, hashlib.sha1(texto.encode('utf-8')).hexdigest())
+            for indice, texto in enumerate(textos)
+        )
+        return _Arquivo(estatistica.st_mtime_ns, estatistica.st_size, hash_arquivo, trechos)
+
+    def atualizar(self, forcar: bool = False) -> bool:
+        """Reverifica a pasta se o intervalo tiver passado; retorna True se algum trecho mudou."""
+        agora = time.monotonic()
+        if not forcar and self._verificado_em is not None and agora - self._verificado_em < self.intervalo:
+            return False
+
+        with self._lock:
+            if not forcar and self._verificado_em is not None and agora - self._verificado_em < self.intervalo:
+                return False
+            encontrados = self._listar_arquivos()
+            arquivos: Dict[str, _Arquivo] = {}
+            mudou = set(encontrados) != set(self._arquivos)
+            for relativo, estatistica in encontrados.items():
+                anterior = self._arquivos.get(relativo)
+                if (anterior is not None and anterior.mtime_ns == estatistica.st_mtime_ns
+                        and anterior.tamanho == estatistica.st_size):
+                    arquivos[relativo] = anterior
+                    continue
+                atual = self._carregar_arquivo(relativo, estatistica)
+                mudou = mudou or anterior is None or atual.trechos is not anterior.trechos
+                arquivos[relativo] = atual
+
+            self._arquivos = arquivos
+            if mudou:
+                self._trechos = tuple(t for relativo in sorted(arquivos) for t in arquivos[relativo].trechos)
+                self.versao += 1
+            self._verificado_em = time.monotonic()
+            return mudou
+
+    def trechos(self) -> Tuple[Trecho, ...]:
+        """Todos os trechos atuais (reverifica a pasta apenas se o intervalo tiver passado)."""
+        self.atualizar()
+        return self._trechos
+
+
+_base: Optional[BaseConhecimento] = None
+_base_lock = threading.Lock()
+
+
+def get_base_conhecimento() -> BaseConhecimento:
+    """Retorna a base de conhecimento compartilhada pelo processo."""
+    global _base
+    if _base is None:
+        with _base_lock:
+            if _base is None:
+                _base = BaseConhecimento()
+    return _base
@@ -0,0 +1,143 @@
+import concurrent.futures
+from typing import Any, Callable, Coroutine, Dict, Iterable, List, Sequence
+
+from configuracao import KIRA_ORCAMENTO_TOKENS, KIRA_TURNOS_RECENTES, KIRA_MODELO_RESUMO
+from kira.conhecimento import Trecho
+from kira.provedores import RequisicaoGeracao, get_provedor
+from kira.tokenizer import contar_tokens, tokens_mensagem
+from utils.event_loop import disparar
+
+
+Mensagem = Dict[str, Any]
+
+
+def formatar_mensagem(mensagem: Mensagem) -> str:
+    """Formata uma mensagem no template de chat usado pelo modelo."""
+    return f"<|im_start|>{mensagem['role']}\n{mensagem['content']}<|im_end|>"
+
+
+def incluir_conhecimento(system_prompt: str, trechos: Iterable[Trecho]) -> str:
+    """Acrescenta ao system prompt os trechos da base de conhecimento recuperados para o turno."""
+    textos = [trecho.texto for trecho in trechos]
+    if not textos:
+        return system_prompt
+    return (f"{system_prompt}\n\nInformações da base de conhecimento da FAM (use apenas o que for relevante "
+            f"para a pergunta):\n" + "\n---\n".join(textos))
+
+
+async def resumir_conversa(resumo_anterior: str, mensagens: Sequence[Mensagem]) -> str:
+    """Incorpora as mensagens ao resumo anterior usando um modelo pequeno."""
+    trechos = "\n".join(f"{m['role']}: {m['content']}" for m in mensagens)
+    return await get_provedor().completar(RequisicaoGeracao(
+        modelo=KIRA_MODELO_RESUMO,
+        prompt=f"Resumo atual:\n{resumo_anterior or '(vazio)'}\n\nNovas mensagens:\n{trechos}\n\n"
+               f"Escreva o resumo atualizado em no máximo 200 palavras.",
+        system_prompt="Você resume conversas de atendimento em português, de forma objetiva, preservando "
+                      "nomes, pedidos, produtos, valores, prazos e decisões já tomadas.",
+        max_tokens=400,
+    ))
+
+
+class JanelaContexto:
+    """Monta o prompt do chat dentro de um orçamento de tokens.
+
+    As últimas `turnos_recentes` trocas entram literalmente (enquanto couberem no orçamento); as mais antigas
+    são incorporadas a um resumo atualizado em segundo plano, no loop global. O tamanho do prompt fica
+    limitado, e o tempo até o primeiro token não cresce com a duração da conversa.
+
+    O estado (resumo e quantas mensagens ele cobre) é guardado por conversa em um dicionário criado por
+    `novo_estado()`, normalmente em st.session_state. As posições são da conversa inteira: quando só o final
+    dela está em memória, `base` indica a posição da primeira mensagem recebida.
+    """
+
+    def __init__(self, contar_tokens: Callable[[str], int] = contar_tokens,
+                 resumir: Callable[[str, Sequence[Mensagem]], Coroutine[Any, Any, str]] = resumir_conversa,
+                 orcamento_tokens: int = KIRA_ORCAMENTO_TOKENS, turnos_recentes: int = KIRA_TURNOS_RECENTES):
+        self.contar_tokens = contar_tokens
+        self.resumir = resumir
+        self.orcamento_tokens = orcamento_tokens
+        self.turnos_recentes = turnos_recentes
+
+    @staticmethod
+    def novo_estado() -> Dict[str, Any]:
+        return {'resumo': '', 'tokens_resumo': 0, 'resumidas': 0, 'pendente': None}
+
+    def tokens_mensagem(self, mensagem: Mensagem) -> int:
+        return tokens_mensagem(mensagem, self.contar_tokens)
+
+    def _aplicar_resumo_pronto(self, estado: Dict[str, Any]) -> None:
+        pendente = estado['pendente']
+        if pendente is None:
+            return
+        future, ate = pendente
+        if not future.done():
+            return
+        estado['pendente'] = None
+        # Em caso de erro (já registrado no log por `disparar`) o resumo será tentado de novo no próximo turno
+        if not future.cancelled() and future.exception() is None:
+            estado['resumo'] = future.result()
+            estado['tokens_resumo'] = self.contar_tokens(estado['resumo'])
+            estado['resumidas'] = ate
+
+    def _inicio_janela(self, mensagens: List[Mensagem], estado: Dict[str, Any], base: int = 0) -> int:
+        """Índice (em `mensagens`) da primeira mensagem mantida literalmente no prompt."""
+        # Cada mensagem é tokenizada uma única vez (o total fica guardado nela), então o custo por turno
+        # depende só do tamanho da janela, não do histórico
+        orcamento = self.orcamento_tokens - estado['tokens_resumo']
+        usados, turnos, inicio = 0, 0, len(mensagens)
+        for indice in range(len(mensagens) - 1, estado['resumidas'] - base - 1, -1):
+            mensagem = mensagens[indice]
+            usados += self.tokens_mensagem(mensagem)
+            if mensagem['role'] == 'user':
+                turnos += 1
+            # A mensagem mais recente sempre entra, mesmo que sozinha estoure o orçamento
+            if inicio < len(mensagens) and (usados > orcamento or turnos > self.turnos_recentes):
+                break
+            inicio = indice
+        return inicio
+
+    def _resumir_em_segundo_plano(self, mensagens: List[Mensagem], ate: int, estado: Dict[str, Any],
+                                  base: int = 0) -> None:
+        novas = [dict(m) for m in mensagens[estado['resumidas'] - base:ate]]
+        future: concurrent.futures.Future = disparar(self.resumir(estado['resumo'], novas))
+        estado['pendente'] = (future, base + ate)
+
+    def montar_prompt(self, mensagens: List[Mensagem], estado: Dict[str, Any], base: int = 0) -> str:
+        """Retorna o prompt com o resumo (se houver) e a janela de mensagens recentes."""
+        if base + len(mensagens) < estado['resumidas']:
+            # A conversa foi reiniciada sem trocar o estado
+            estado.update(self.novo_estado())
+        self._aplicar_resumo_pronto(estado)
+        if estado['resumidas'] < base:
+            # Mensagens descartadas da memória antes de entrarem no resumo ficam fora do contexto
+            estado['resumidas'] = base
+
+        # Enquanto o resumo está sendo atualizado, as mensagens que saíram da janela ficam de fora do prompt
+        inicio = self._inicio_janela(mensagens, estado, base)
+        if base + inicio > estado['resumidas'] and estado['pendente'] is None:
+            self._resumir_em_segundo_plano(mensagens, inicio, estado, base)
+
+        partes = self._partes_resumo(estado)
+        partes.extend(formatar_mensagem(m) for m in mensagens[inicio:])
+        partes.append("<|im_start|>assistant")
+        partes.append("")
+        return "\n".join(partes)
+
+    def contexto_da_pergunta(self, mensagens: List[Mensagem], estado: Dict[str, Any], base: int = 0) -> str:
+        """O que antecede a última mensagem no prompt de `montar_prompt` (chamado logo antes, com o mesmo estado).
+
+        Identifica a conversa na chave do cache de respostas: o resumo e as trocas anteriores da janela, sem a
+        saudação que abre a conversa, que é texto de interface (cada canal tem a sua) e não muda a resposta.
+        """
+        inicio = self._inicio_janela(mensagens, estado, base)
+        if base + inicio == 0 and len(mensagens) > 1 and mensagens[0]['role'] == 'assistant':
+            inicio = 1
+        partes = self._partes_resumo(estado)
+        partes.extend(formatar_mensagem(m) for m in mensagens[inicio:-1])
+        return "\n".join(partes)
+
+    @staticmethod
+    def _partes_resumo(estado: Dict[str, Any]) -> List[str]:
+        if not estado['resumo']:
+            return []
+        return [formatar_mensagem({'role': 'system', 'content': f"Resumo da conversa até aqui:\n{estado['resumo']}"})]
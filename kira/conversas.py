@@ -0,0 +1,162 @@
+import json
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from configuracao import KIRA_CONVERSAS_PATH, KIRA_CONVERSA_JANELA, KIRA_CONVERSA_MEMORIA
+from utils.banco import BancoSQLite
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversas (
+    id TEXT PRIMARY KEY,
+    usuario TEXT NOT NULL,
+    criada_em REAL NOT NULL,
+    atualizada_em REAL NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    contexto TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_conversas_usuario ON conversas (usuario, atualizada_em);
+
+CREATE TABLE IF NOT EXISTS mensagens (
+    conversa TEXT NOT NULL,
+    posicao INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    tokens INTEGER,
+    criada_em REAL NOT NULL,
+    PRIMARY KEY (conversa, posicao)
+) WITHOUT ROWID;
+"""
+
+# Estado da JanelaContexto que sobrevive a reconexões (o resumo pendente é só da sessão)
+CAMPOS_CONTEXTO = ('resumo', 'tokens_resumo', 'resumidas')
+
+
+class ArmazemConversas(BancoSQLite):
+    """Conversas do chat por usuário, em SQLite.
+
+    Cada mensagem guarda sua posição na conversa, então a sessão pode manter em memória só o final dela
+    (`carregar`) e buscar trechos anteriores sob demanda (`anteriores`), sem ler a conversa inteira.
+    """
+
+    SCHEMA = SCHEMA
+
+    def nova_conversa(self, usuario: str, saudacao: Optional[str] = None) -> str:
+        conversa = uuid.uuid4().hex
+        agora = time.time()
+        with self.transacao() as conn:
+            conn.execute("INSERT INTO conversas (id, usuario, criada_em, atualizada_em) VALUES (?, ?, ?, ?)",
+                         (conversa, usuario, agora, agora))
+        if saudacao:
+            self.adicionar(conversa, {'role': 'assistant', 'content': saudacao})
+        return conversa
+
+    def conversa_atual(self, usuario: str, saudacao: Optional[str] = None) -> str:
+        """A conversa mais recente do usuário; cria uma nova se ele ainda não tiver nenhuma."""
+        linha = self.conexao().execute(
+            "SELECT id FROM conversas WHERE usuario = ? ORDER BY atualizada_em DESC LIMIT 1", (usuario,)
+        ).fetchone()
+        return linha['id'] if linha is not None else self.nova_conversa(usuario, saudacao)
+
+    def dono(self, conversa: str) -> Optional[str]:
+        linha = self.conexao().execute("SELECT usuario FROM conversas WHERE id = ?", (conversa,)).fetchone()
+        return linha['usuario'] if linha is not None else None
+
+    def total(self, conversa: str) -> int:
+        linha = self.conexao().execute("SELECT total FROM conversas WHERE id = ?", (conversa,)).fetchone()
+        return linha['total'] if linha is not None else 0
+
+    def adicionar(self, conversa: str, mensagem: Dict[str, Any]) -> int:
+        """Acrescenta a mensagem ao fim da conversa e retorna a sua posição."""
+        agora = time.time()
+        with self.transacao() as conn:
+            posicao = conn.execute("SELECT total FROM conversas WHERE id = ?", (conversa,)).fetchone()['total']
+            conn.execute(
+                "INSERT INTO mensagens (conversa, posicao, role, content, tokens, criada_em) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (conversa, posicao, mensagem['role'], mensagem['content'], mensagem.get('tokens'), agora),
+            )
+            conn.execute("UPDATE conversas SET total = total + 1, atualizada_em = ? WHERE id = ?", (agora, conversa))
+        return posicao
+
+    def desfazer(self, conversa: str, posicao: int) -> bool:
+        """Remove a mensagem em `posicao` se ela ainda for a última da conversa (ex.: pergunta sem resposta)."""
+        with self.transacao() as conn:
+            total = conn.execute("SELECT total FROM conversas WHERE id = ?", (conversa,)).fetchone()
+            if total is None or total['total'] != posicao + 1:
+                return False
+            conn.execute("DELETE FROM mensagens WHERE conversa = ? AND posicao = ?", (conversa, posicao))
+            conn.execute("UPDATE conversas SET total = total - 1 WHERE id = ?", (conversa,))
+        return True
+
+    def _mensagens(self, sql: str, parametros: Tuple) -> List[Dict[str, Any]]:
+        mensagens = []
+        for linha in self.conexao().execute(sql, parametros):
+            mensagem = {'role': linha['role'], 'content': linha['content']}
+            if linha['tokens'] is not None:
+                mensagem['tokens'] = linha['tokens']
+            mensagens.append(mensagem)
+        return mensagens
+
+    def mensagens(self, conversa: str, desde: int = 0) -> List[Dict[str, Any]]:
+        return self._mensagens(
+            "SELECT role, content, tokens FROM mensagens WHERE conversa = ? AND posicao >= ? ORDER BY posicao",
+            (conversa, desde),
+        )
+
+    def anteriores(self, conversa: str, antes_de: int, limite: int) -> List[Dict[str, Any]]:
+        """Até `limite` mensagens imediatamente antes da posição `antes_de`, em ordem cronológica."""
+        inicio = max(0, antes_de - limite)
+        return self._mensagens(
+            "SELECT role, content, tokens FROM mensagens WHERE conversa = ? AND posicao >= ? AND posicao < ? "
+            "ORDER BY posicao",
+            (conversa, inicio, antes_de),
+        )
+
+    def contexto(self, conversa: str) -> Dict[str, Any]:
+        linha = self.conexao().execute("SELECT contexto FROM conversas WHERE id = ?", (conversa,)).fetchone()
+        return json.loads(linha['contexto']) if linha is not None else {}
+
+    def salvar_contexto(self, conversa: str, estado: Dict[str, Any]) -> None:
+        contexto = json.dumps({campo: estado[campo] for campo in CAMPOS_CONTEXTO}, ensure_ascii=False)
+        with self.transacao() as conn:
+            conn.execute("UPDATE conversas SET contexto = ? WHERE id = ?", (contexto, conversa))
+
+    def carregar(self, conversa: str, resumidas: int = 0, janela: int = KIRA_CONVERSA_JANELA,
+                 memoria: int = KIRA_CONVERSA_MEMORIA) -> Tuple[List[Dict[str, Any]], int]:
+        """Final da conversa para manter em memória e a posição da primeira mensagem retornada.
+
+        Inclui as mensagens ainda não resumidas (necessárias ao prompt) e as `janela` últimas (exibidas),
+        limitado a `memoria` mensagens.
+        """
+        total = self.total(conversa)
+        base = max(0, min(resumidas, total - janela), total - memoria)
+        return self.mensagens(conversa, base), base
+
+
+def aparar(mensagens: List[Dict[str, Any]], base: int, resumidas: int, janela: int = KIRA_CONVERSA_JANELA,
+           memoria: int = KIRA_CONVERSA_MEMORIA) -> int:
+    """Descarta da memória o início da conversa que não é mais necessário e retorna a nova base.
+
+    Saem as mensagens já resumidas que estão fora da janela exibida; acima de `memoria` mensagens, saem as mais
+    antigas mesmo sem resumo (continuam no banco).
+    """
+    cortar = max(0, min(resumidas - base, len(mensagens) - janela), len(mensagens) - memoria)
+    del mensagens[:cortar]
+    return base + cortar
+
+
+_armazem: Optional[ArmazemConversas] = None
+_lock = threading.Lock()
+
+
+def get_armazem_conversas() -> ArmazemConversas:
+    """Retorna o armazém de conversas compartilhado pelo processo."""
+    global _armazem
+    if _armazem is None:
+        with _lock:
+            if _armazem is None:
+                _armazem = ArmazemConversas(KIRA_CONVERSAS_PATH)
+    return _armazem
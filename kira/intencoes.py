@@ -0,0 +1,168 @@
+import os
+import threading
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import yaml
+
+from configuracao import KIRA_INTENCOES_PATH
+
+
+CADASTRO = 'cadastro'
+AGENDAMENTO = 'agendamento'
+ASSINATURA = 'assinatura'
+CONSULTORA = 'consultora'
+SAUDACAO = 'saudacao'
+
+# Expressões padrão: frases de pedido, não substantivos soltos ("já fiz meu cadastro" não pede cadastro).
+# O arquivo KIRA_INTENCOES_PATH (YAML: intenção -> lista de expressões) acrescenta expressões ou intenções novas
+# sem alterar o código.
+INTENCOES_PADRAO: Dict[str, List[str]] = {
+    CADASTRO: [
+        "cadastrar", "inscrição", "quero me cadastrar", "desejo me cadastrar", "quero fazer o cadastro",
+        "quero me registrar", "desejo me registrar", "gostaria de me registrar", "quero me inscrever",
+        "desejo me inscrever", "quero me increver",
+    ],
+    AGENDAMENTO: [
+        "agendar reunião", "agendar uma reunião", "marcar reunião", "marcar uma reunião", "quero agendar",
+        "quero reunião",
+    ],
+    ASSINATURA: [
+        "link de pagamento", "link para pagamento", "link de assinatura", "fazer a assinatura", "fazer uma assinatura",
+        "quero assinar", "como assino", "como faço para assinar", "quero pagar", "finalizar a compra",
+    ],
+    CONSULTORA: [
+        "falar com a consultora", "falar com uma consultora", "conversar com a consultora",
+        "conversar com uma consultora", "falar com a mari", "conversar com a mari", "falar com uma pessoa",
+        "atendente humano", "atendimento humano", "whatsapp da consultora",
+    ],
+    SAUDACAO: [
+        "oi", "ola", "oie", "bom dia", "boa tarde", "boa noite", "tudo bem", "e ai",
+    ],
+}
+
+
+class Intencao(NamedTuple):
+    nome: str
+    expressao: str  # expressão normalizada que casou
+    inicio: int  # posição no texto original
+    fim: int
+    trecho: str  # texto original entre inicio e fim
+
+
+def normalizar(texto: str) -> Tuple[str, List[int]]:
+    """Minúsculas, sem acentos e com pontuação/espaços reduzidos a um espaço.
+
+    Retorna também, para cada caractere normalizado, a posição correspondente no texto original, para
+    que o trecho encontrado possa ser apontado na mensagem do usuário.
+    """
+    saida: List[str] = []
+    posicoes: List[int] = []
+    for posicao, caractere in enumerate(texto):
+        for c in unicodedata.normalize('NFKD', caractere.lower()):
+            if unicodedata.combining(c):
+                continue
+            if not c.isalnum():
+                if not saida or saida[-1] == ' ':
+                    continue
+                c = ' '
+            saida.append(c)
+            posicoes.append(posicao)
+    return ''.join(saida), posicoes
+
+
+class DetectorIntencoes:
+    """Casamento de várias expressões de uma vez (autômato de Aho-Corasick).
+
+    O texto é percorrido uma única vez, qualquer que seja o número de intenções e expressões; só
+    ocorrências de palavras inteiras contam ("cadastrar" não casa em "recadastrar").
+    """
+
+    def __init__(self, intencoes: Dict[str, Iterable[str]]):
+        self._transicoes: List[Dict[str, int]] = [{}]
+        self._falhas: List[int] = [0]
+        self._saidas: List[List[Tuple[str, str]]] = [[]]
+        for nome, expressoes in intencoes.items():
+            for expressao in expressoes:
+                self._adicionar(nome, normalizar(expressao)[0].strip())
+        self._construir_falhas()
+
+    def _adicionar(self, nome: str, expressao: str) -> None:
+        if not expressao:
+            return
+        estado = 0
+        for c in expressao:
+            proximo = self._transicoes[estado].get(c)
+            if proximo is None:
+                proximo = len(self._transicoes)
+                self._transicoes[estado][c] = proximo
+                self._transicoes.append({})
+                self._falhas.append(0)
+                self._saidas.append([])
+            estado = proximo
+        self._saidas[estado].append((nome, expressao))
+
+    def _construir_falhas(self) -> None:
+        fila = deque(self._transicoes[0].values())
+        while fila:
+            estado = fila.popleft()
+            for c, proximo in self._transicoes[estado].items():
+                fila.append(proximo)
+                falha = self._falhas[estado]
+                while falha and c not in self._transicoes[falha]:
+                    falha = self._falhas[falha]
+                destino = self._transicoes[falha].get(c, 0)
+                # Filhos da raiz voltam para a raiz
+                self._falhas[proximo] = destino if destino != proximo else 0
+                self._saidas[proximo] = self._saidas[proximo] + self._saidas[self._falhas[proximo]]
+
+    def encontrar(self, texto: str) -> List[Intencao]:
+        """Todas as ocorrências de expressões no texto, na ordem em que terminam."""
+        normalizado, posicoes = normalizar(texto)
+        encontradas = []
+        estado = 0
+        for fim, c in enumerate(normalizado):
+            while estado and c not in self._transicoes[estado]:
+                estado = self._falhas[estado]
+            estado = self._transicoes[estado].get(c, 0)
+            for nome, expressao in self._saidas[estado]:
+                inicio = fim - len(expressao) + 1
+                if (inicio > 0 and normalizado[inicio - 1].isalnum()) or \
+                        (fim + 1 < len(normalizado) and normalizado[fim + 1].isalnum()):
+                    continue
+                inicio_original, fim_original = posicoes[inicio], posicoes[fim] + 1
+                encontradas.append(Intencao(nome, expressao, inicio_original, fim_original,
+                                            texto[inicio_original:fim_original]))
+        return encontradas
+
+    def detectar(self, texto: str) -> Optional[Intencao]:
+        """A intenção da expressão mais longa (mais específica) encontrada; em empate, a primeira."""
+        encontradas = self.encontrar(texto)
+        if not encontradas:
+            return None
+        return min(encontradas, key=lambda i: (-len(i.expressao), i.inicio))
+
+
+def carregar_intencoes(caminho: str = KIRA_INTENCOES_PATH) -> Dict[str, List[str]]:
+    """Intenções padrão acrescidas das definidas no arquivo YAML, se ele existir."""
+    intencoes = {nome: list(expressoes) for nome, expressoes in INTENCOES_PADRAO.items()}
+    if os.path.exists(caminho):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            for nome, expressoes in (yaml.safe_load(f) or {}).items():
+                intencoes.setdefault(nome, []).extend(expressoes or [])
+    return intencoes
+
+
+_detector: Optional[DetectorIntencoes] = None
+_lock = threading.Lock()
+
+
+def get_detector_intencoes() -> DetectorIntencoes:
+    """Retorna o detector de intenções compartilhado pelo processo."""
+    global _detector
+    if _detector is None:
+        with _lock:
+            if _detector is None:
+                _detector = DetectorIntencoes(carregar_intencoes())
+    return _detector
@@ -0,0 +1,273 @@
+import asyncio
+import atexit
+import json
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from configuracao import KIRA_METRICAS_TURNOS, KIRA_METRICAS_PATH, KIRA_METRICAS_INTERVALO, KIRA_METRICAS_DIAS
+from kira.cache_respostas import ORIGEM_CACHE, ORIGEM_COMPARTILHADA, ORIGEM_GERADA
+from kira.tokenizer import contar_tokens
+from kira.transmissao import Transmissao
+from utils.banco import BancoSQLite
+
+
+logger = logging.getLogger(__name__)
+
+# Totais somados por hora, usuário, canal, nível e modelo
+CAMPOS_TOTAIS = (
+    'turnos', 'erros', 'canceladas', 'do_cache', 'respondidos', 'tokens_prompt', 'tokens_resposta', 'ttft_soma',
+    'ttft_max', 'espera_fila_soma', 'duracao_soma', 'tokens_gerados', 'geracao_segundos',
+)
+CHAVE_TOTAIS = ('hora', 'usuario', 'canal', 'nivel', 'modelo')
+CAMPOS_SEGUNDOS = ('ttft_soma', 'ttft_max', 'espera_fila_soma', 'duracao_soma', 'geracao_segundos')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS turnos_hora (
+    hora INTEGER NOT NULL,
+    usuario TEXT NOT NULL,
+    canal TEXT NOT NULL,
+    nivel TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    {', '.join(f"{campo} {'REAL' if campo in CAMPOS_SEGUNDOS else 'INTEGER'} NOT NULL DEFAULT 0"
+               for campo in CAMPOS_TOTAIS)},
+    PRIMARY KEY ({', '.join(CHAVE_TOTAIS)})
+) WITHOUT ROWID;
+"""
+
+SQL_SOMAR = (
+    f"INSERT INTO turnos_hora ({', '.join(CHAVE_TOTAIS + CAMPOS_TOTAIS)}) "
+    f"VALUES ({', '.join('?' * len(CHAVE_TOTAIS + CAMPOS_TOTAIS))}) "
+    f"ON CONFLICT ({', '.join(CHAVE_TOTAIS)}) DO UPDATE SET "
+    + ', '.join(f"{campo} = MAX({campo}, excluded.{campo})" if campo == 'ttft_max' else
+                f"{campo} = {campo} + excluded.{campo}" for campo in CAMPOS_TOTAIS)
+)
+
+OK = 'ok'
+ERRO = 'erro'
+CANCELADA = 'cancelada'
+
+
+class MedicaoTurno(NamedTuple):
+    inicio: float  # time.time() da pergunta
+    usuario: str
+    papel: str
+    canal: str  # streamlit, api
+    nivel: str  # Nível do roteador: template, pequeno, grande
+    modelo: str  # Vazio nas respostas fixas
+    origem: str  # template, cache, compartilhada ou gerada
+    status: str  # ok, erro, cancelada
+    tokens_prompt: int  # Histórico + system prompt (com os trechos da base) enviados ao modelo
+    tokens_resposta: int
+    espera_fila: float  # Segundos aguardando vaga de geração
+    ttft: Optional[float]  # Segundos da pergunta até a primeira parte da resposta; None se nada chegou
+    duracao: float  # Segundos da pergunta até o fim da resposta
+    geracao: float  # Segundos entre a primeira parte e o fim; só nas respostas geradas para este turno
+
+    @property
+    def tokens_seg(self) -> Optional[float]:
+        """Vazão do modelo na resposta; None quando ela não foi gerada (ou foi curta demais para medir)."""
+        if self.geracao <= 0 or self.tokens_resposta < 2:
+            return None
+        return self.tokens_resposta / self.geracao
+
+    def exportar(self) -> Dict[str, Any]:
+        return {**self._asdict(), 'tokens_seg': self.tokens_seg}
+
+
+def percentil(valores: Sequence[float], fracao: float) -> Optional[float]:
+    """Percentil por interpolação linear (fracao entre 0 e 1); None sem valores."""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    posicao = (len(ordenados) - 1) * fracao
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+def _novos_totais() -> Dict[str, float]:
+    return dict.fromkeys(CAMPOS_TOTAIS, 0)
+
+
+def _acumular(totais: Dict[str, float], medicao: MedicaoTurno) -> None:
+    totais['turnos'] += 1
+    totais['erros'] += medicao.status == ERRO
+    totais['canceladas'] += medicao.status == CANCELADA
+    totais['do_cache'] += medicao.origem in (ORIGEM_CACHE, ORIGEM_COMPARTILHADA)
+    totais['tokens_prompt'] += medicao.tokens_prompt
+    totais['tokens_resposta'] += medicao.tokens_resposta
+    totais['espera_fila_soma'] += medicao.espera_fila
+    totais['duracao_soma'] += medicao.duracao
+    if medicao.ttft is not None:
+        totais['respondidos'] += 1
+        totais['ttft_soma'] += medicao.ttft
+        totais['ttft_max'] = max(totais['ttft_max'], medicao.ttft)
+    if medicao.tokens_seg is not None:
+        totais['tokens_gerados'] += medicao.tokens_resposta
+        totais['geracao_segundos'] += medicao.geracao
+
+
+def _somar(destino: Dict[str, float], origem: Dict[str, float]) -> None:
+    for campo in CAMPOS_TOTAIS:
+        destino[campo] = max(destino[campo], origem[campo]) if campo == 'ttft_max' else destino[campo] + origem[campo]
+
+
+class _ArquivoMetricas(BancoSQLite):
+    SCHEMA = SCHEMA
+
+
+class MetricasChat:
+    """Medições de cada turno do chat: latência, tamanho do prompt e da resposta, cache e consumo por usuário.
+
+    Os últimos `capacidade` turnos ficam em memória (anel de tamanho fixo, para percentis e inspeção); os totais
+    por hora, usuário, canal, nível e modelo são acumulados em memória e somados ao banco a cada `intervalo`
+    segundos, em segundo plano. O banco é compartilhado pelos processos (Streamlit e API); o anel é de cada um.
+    """
+
+    def __init__(self, capacidade: int = KIRA_METRICAS_TURNOS, caminho: Optional[str] = KIRA_METRICAS_PATH,
+                 intervalo: float = KIRA_METRICAS_INTERVALO, dias: int = KIRA_METRICAS_DIAS):
+        self.intervalo = intervalo
+        self.dias = dias
+        self.arquivo = _ArquivoMetricas(caminho) if caminho else None
+        self._lock = threading.Lock()
+        self._recentes: Deque[MedicaoTurno] = deque(maxlen=capacidade)
+        self._pendentes: Dict[Tuple, Dict[str, float]] = {}  # Totais ainda não gravados
+        self._gravado_em = time.monotonic()
+        self._gravando = False
+
+    def acompanhar(self, transmissao: Transmissao, inicio: Tuple[float, float], usuario: str, papel: str,
+                   canal: str, nivel: str, modelo: Optional[str], origem: str, tokens_prompt: int) -> None:
+        """Registra o turno quando a sua transmissão terminar.
+
+        `inicio` é o (time.time(), time.monotonic()) da chegada da pergunta; a resposta só pode ser exibida a
+        partir de agora, então uma geração compartilhada que começou antes conta a partir daqui.
+        """
+        epoca, comeco = inicio
+        pronto_em = time.monotonic()
+
+        def concluida(transmissao: Transmissao) -> None:
+            primeira = transmissao.primeira_parte_em
+            # Quem só acompanha uma geração compartilhada não soma os seus segundos nem tokens: ela já conta
+            # para a sessão que a iniciou
+            gerada = origem == ORIGEM_GERADA and primeira is not None
+            if transmissao.erro is None:
+                status = OK
+            elif isinstance(transmissao.erro, asyncio.CancelledError):
+                status = CANCELADA
+            else:
+                status = ERRO
+            self.registrar(MedicaoTurno(
+                inicio=epoca, usuario=usuario, papel=papel, canal=canal, nivel=nivel, modelo=modelo or '',
+                origem=origem, status=status, tokens_prompt=tokens_prompt,
+                tokens_resposta=contar_tokens(transmissao.texto), espera_fila=transmissao.espera_fila,
+                ttft=max(primeira, pronto_em) - comeco if primeira is not None else None,
+                duracao=max(transmissao.concluida_em, pronto_em) - comeco,
+                geracao=transmissao.concluida_em - primeira if gerada else 0.0,
+            ))
+
+        transmissao.ao_concluir(concluida)
+
+    def registrar(self, medicao: MedicaoTurno) -> None:
+        chave = (int(medicao.inicio // 3600 * 3600), medicao.usuario, medicao.canal, medicao.nivel, medicao.modelo)
+        with self._lock:
+            self._recentes.append(medicao)
+            if self.arquivo is None:
+                return
+            _acumular(self._pendentes.setdefault(chave, _novos_totais()), medicao)
+            gravar = not self._gravando and time.monotonic() - self._gravado_em >= self.intervalo
+            if gravar:
+                self._gravando = True
+        if gravar:
+            # Chamado na conclusão da transmissão, em geral no loop global: o SQLite fica para outra thread
+            threading.Thread(target=self._gravar_em_segundo_plano, name="kira-metricas", daemon=True).start()
+
+    def _gravar_em_segundo_plano(self) -> None:
+        try:
+            self.gravar()
+        finally:
+            self._gravando = False
+
+    def gravar(self) -> None:
+        """Soma ao banco os totais acumulados desde a última gravação."""
+        if self.arquivo is None:
+            return
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, {}
+            self._gravado_em = time.monotonic()
+        if not pendentes:
+            return
+        try:
+            with self.arquivo.transacao() as conn:
+                conn.executemany(SQL_SOMAR, [chave + tuple(totais[campo] for campo in CAMPOS_TOTAIS)
+                                             for chave, totais in pendentes.items()])
+                conn.execute("DELETE FROM turnos_hora WHERE hora < ?", (time.time() - self.dias * 86400,))
+        except Exception:
+            # As métricas nunca devem atrapalhar o chat: os totais voltam para a próxima tentativa
+            logger.exception("Erro ao gravar métricas do chat")
+            with self._lock:
+                for chave, totais in pendentes.items():
+                    _somar(self._pendentes.setdefault(chave, _novos_totais()), totais)
+
+    def recentes(self, desde: float = 0) -> List[MedicaoTurno]:
+        """Turnos em memória iniciados a partir de `desde` (time.time()), do mais antigo ao mais recente."""
+        with self._lock:
+            return [medicao for medicao in self._recentes if medicao.inicio >= desde]
+
+    def totais_por_hora(self, desde: float, ate: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Totais por hora, usuário, canal, nível e modelo no período, incluindo o que ainda não foi gravado.
+
+        Sem banco, os totais saem apenas dos turnos em memória.
+        """
+        ate = time.time() if ate is None else ate
+        inicio = int(desde // 3600 * 3600)
+        if self.arquivo is None:
+            totais: Dict[Tuple, Dict[str, float]] = {}
+            for medicao in self.recentes(inicio):
+                if medicao.inicio <= ate:
+                    chave = (int(medicao.inicio // 3600 * 3600), medicao.usuario, medicao.canal, medicao.nivel,
+                             medicao.modelo)
+                    _acumular(totais.setdefault(chave, _novos_totais()), medicao)
+            return [{**dict(zip(CHAVE_TOTAIS, chave)), **valores} for chave, valores in sorted(totais.items())]
+
+        self.gravar()
+        linhas = self.arquivo.conexao().execute(
+            "SELECT * FROM turnos_hora WHERE hora >= ? AND hora <= ? ORDER BY hora", (inicio, ate)
+        ).fetchall()
+        return [dict(linha) for linha in linhas]
+
+    def exportar(self, desde: float, ate: Optional[float] = None) -> Dict[str, Any]:
+        """Turnos em memória e totais por hora do período, prontos para json.dumps."""
+        ate = time.time() if ate is None else ate
+        return {
+            'gerado_em': time.time(),
+            'desde': desde,
+            'ate': ate,
+            'turnos': [medicao.exportar() for medicao in self.recentes(desde) if medicao.inicio <= ate],
+            'por_hora': self.totais_por_hora(desde, ate),
+        }
+
+
+_metricas: Optional[MetricasChat] = None
+_lock = threading.Lock()
+
+
+def get_metricas() -> MetricasChat:
+    """Retorna as métricas do chat compartilhadas pelo processo."""
+    global _metricas
+    if _metricas is None:
+        with _lock:
+            if _metricas is None:
+                _metricas = MetricasChat()
+                atexit.register(_metricas.gravar)  # Não perde os totais acumulados desde a última gravação
+    return _metricas
+
+
+if __name__ == "__main__":
+    # Exporta em JSON os totais gravados das últimas horas (padrão: 24): python -m kira.metricas [horas]
+    horas = float(sys.argv[1]) if len(sys.argv) > 1 else 24
+    json.dump(get_metricas().exportar(time.time() - horas * 3600), sys.stdout, ensure_ascii=False, indent=2)
+    print()
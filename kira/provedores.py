@@ -0,0 +1,205 @@
+import abc
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+from typing import AsyncIterator, Dict, NamedTuple, Optional, Tuple
+
+from configuracao import (REPLICATE_API_TOKEN, KIRA_PROVEDOR, KIRA_MODELO_GRANDE, KIRA_MODELO_PEQUENO,
+                          KIRA_TIMEOUT_PRIMEIRO_TOKEN, KIRA_TIMEOUT_TOTAL, KIRA_LOCAL_TTFT, KIRA_LOCAL_TOKENS_SEG)
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequisicaoGeracao(NamedTuple):
+    modelo: str
+    prompt: str
+    system_prompt: str = ''
+    max_tokens: int = 3500
+    temperatura: float = 0.1
+
+
+class Provedor(abc.ABC):
+    """Interface dos provedores de modelo: `transmitir` entrega a resposta parte a parte.
+
+    Aplica os limites de tempo (até a primeira parte e total) sobre `_gerar`, implementado por cada provedor.
+    Cancelar a tarefa que consome a transmissão (ou interromper a iteração) fecha o gerador do provedor, que
+    deve liberar o que estiver usando no serviço remoto.
+    """
+
+    nome = ''
+
+    def __init__(self, timeout_primeiro_token: float = KIRA_TIMEOUT_PRIMEIRO_TOKEN,
+                 timeout_total: float = KIRA_TIMEOUT_TOTAL):
+        self.timeout_primeiro_token = timeout_primeiro_token
+        self.timeout_total = timeout_total
+
+    @abc.abstractmethod
+    def _gerar(self, requisicao: RequisicaoGeracao) -> AsyncIterator[str]:
+        """Partes da resposta do modelo, sem limites de tempo (aplicados por `transmitir`)."""
+
+    async def transmitir(self, requisicao: RequisicaoGeracao) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        prazo_total = loop.time() + self.timeout_total
+        partes = self._gerar(requisicao)
+        primeira = True
+        try:
+            while True:
+                prazo = prazo_total
+                if primeira:
+                    prazo = min(prazo, loop.time() + self.timeout_primeiro_token)
+                try:
+                    async with asyncio.timeout_at(prazo):
+                        parte = await anext(partes)
+                except StopAsyncIteration:
+                    return
+                except TimeoutError:
+                    etapa = "a primeira parte" if primeira else "o fim"
+                    raise TimeoutError(f"{self.nome}: tempo esgotado aguardando {etapa} da resposta de "
+                                       f"{requisicao.modelo}.") from None
+                primeira = False
+                yield parte
+        finally:
+            await partes.aclose()
+
+    async def completar(self, requisicao: RequisicaoGeracao) -> str:
+        """Resposta completa, para usos que não precisam de streaming (ex.: resumos)."""
+        return ''.join([parte async for parte in self.transmitir(requisicao)]).strip()
+
+
+class ProvedorReplicate(Provedor):
+    """Modelos hospedados no Replicate; ao cancelar, a predição também é cancelada no Replicate."""
+
+    nome = 'replicate'
+
+    def __init__(self, api_token: Optional[str] = REPLICATE_API_TOKEN, **kwargs):
+        super().__init__(**kwargs)
+        self.api_token = api_token
+        self._cliente = None
+
+    def _cliente_replicate(self):
+        if self._cliente is None:
+            import replicate
+
+            self._cliente = replicate.Client(api_token=self.api_token)
+        return self._cliente
+
+    async def _gerar(self, requisicao: RequisicaoGeracao) -> AsyncIterator[str]:
+        predicao = await self._cliente_replicate().predictions.async_create(
+            model=requisicao.modelo,
+            input={
+                "top_k": 0,
+                "top_p": 1,
+                "prompt": requisicao.prompt,
+                "temperature": requisicao.temperatura,
+                "system_prompt": requisicao.system_prompt,
+                "length_penalty": 1,
+                "max_new_tokens": requisicao.max_tokens,
+            },
+            stream=True,
+        )
+        from replicate.stream import ServerSentEvent
+
+        concluida = False
+        try:
+            async for evento in predicao.async_stream():
+                # str(evento) é vazio nos eventos de erro: sem checar o tipo, uma falha terminaria como resposta
+                # completa (e truncada), guardada no cache
+                if evento.event == ServerSentEvent.EventType.ERROR:
+                    concluida = True  # A predição já terminou no Replicate; não há o que cancelar
+                    raise RuntimeError(f"{self.nome}: a predição {predicao.id} falhou: {evento.data}")
+                if evento.event == ServerSentEvent.EventType.DONE:
+                    break
+                if evento.event == ServerSentEvent.EventType.OUTPUT and evento.data:
+                    yield evento.data
+            concluida = True
+        finally:
+            if not concluida:
+                # A geração foi interrompida aqui: não deixa a predição consumindo capacidade no Replicate
+                try:
+                    await predicao.async_cancel()
+                except Exception:
+                    logger.warning("Não foi possível cancelar a predição %s no Replicate", predicao.id, exc_info=True)
+
+
+FRASES_LOCAIS = (
+    "Olá! Sou a KIRA, sua assistente virtual da FAM.",
+    "A plataforma conecta fabricantes de moda a lojistas de todo o Brasil.",
+    "Você pode explorar as coleções disponíveis e falar diretamente com os fornecedores.",
+    "Para aumentar suas vendas, vale destacar os lançamentos da estação e manter o catálogo atualizado.",
+    "Fotos bem iluminadas e descrições com tecido, modelagem e tamanhos ajudam o lojista a decidir.",
+    "Pedidos em grade costumam ter condições melhores para quem compra no atacado.",
+    "Se quiser, posso indicar as próximas etapas para o seu cadastro.",
+    "A nossa consultora também pode ajudar com dúvidas específicas sobre a sua marca.",
+    "Os prazos de produção e entrega variam conforme o fabricante e o volume do pedido.",
+    "Tendências como alfaiataria leve, tons terrosos e peças versáteis seguem em alta.",
+    "Vamos juntos fazer seu negócio brilhar no mercado!",
+)
+
+# Perfil simulado por modelo: (segundos até a primeira parte, partes por segundo)
+PERFIS_LOCAIS: Dict[str, Tuple[float, float]] = {
+    KIRA_MODELO_GRANDE: (KIRA_LOCAL_TTFT, KIRA_LOCAL_TOKENS_SEG),
+    KIRA_MODELO_PEQUENO: (KIRA_LOCAL_TTFT / 3, KIRA_LOCAL_TOKENS_SEG * 2.5),
+}
+
+
+class ProvedorLocal(Provedor):
+    """Substituto local e determinístico dos modelos, para desenvolvimento, testes e benchmarks sem rede.
+
+    A mesma requisição produz sempre o mesmo texto, com tempo até a primeira parte e vazão de partes por
+    segundo simulados conforme o perfil do modelo.
+    """
+
+    nome = 'local'
+
+    async def _gerar(self, requisicao: RequisicaoGeracao) -> AsyncIterator[str]:
+        semente = hashlib.sha256(
+            f"{requisicao.modelo}\n{requisicao.system_prompt}\n{requisicao.prompt}".encode('utf-8')).digest()
+        rng = random.Random(semente)
+        ttft, por_segundo = PERFIS_LOCAIS.get(requisicao.modelo, (KIRA_LOCAL_TTFT, KIRA_LOCAL_TOKENS_SEG))
+
+        await asyncio.sleep(ttft * rng.uniform(0.8, 1.2))
+        total = min(requisicao.max_tokens, rng.randint(40, 220))
+        frases = list(FRASES_LOCAIS[1:])
+        rng.shuffle(frases)
+        palavras = ' '.join([FRASES_LOCAIS[0]] + frases * (total // 100 + 1)).split(' ')
+        for indice in range(total):
+            if indice:
+                await asyncio.sleep(rng.uniform(0.5, 1.5) / por_segundo)
+            yield palavras[indice] if indice == 0 else f" {palavras[indice]}"
+
+
+_provedor: Optional[Provedor] = None
+_lock = threading.Lock()
+
+
+def criar_provedor(nome: str = KIRA_PROVEDOR) -> Provedor:
+    """Cria o provedor configurado; sem configuração, usa o Replicate.
+
+    O provedor local só é usado quando pedido explicitamente (KIRA_PROVEDOR=local): um deploy sem token
+    do Replicate falha aqui, em vez de entregar respostas simuladas a clientes reais.
+    """
+    nome = nome or ProvedorReplicate.nome
+    if nome == ProvedorReplicate.nome and not REPLICATE_API_TOKEN:
+        raise ValueError("REPLICATE_API_TOKEN não configurado. Configure o token ou, fora de produção, "
+                         "use KIRA_PROVEDOR=local (respostas simuladas).")
+    provedores = {ProvedorReplicate.nome: ProvedorReplicate, ProvedorLocal.nome: ProvedorLocal}
+    if nome not in provedores:
+        raise ValueError(f"Provedor de modelo desconhecido: {nome}")
+    return provedores[nome]()
+
+
+def get_provedor() -> Provedor:
+    """Retorna o provedor de modelo compartilhado pelo processo."""
+    global _provedor
+    if _provedor is None:
+        with _lock:
+            if _provedor is None:
+                _provedor = criar_provedor()
+                if _provedor.nome == ProvedorLocal.nome:
+                    logger.warning("Provedor de modelo LOCAL: respostas da KIRA simuladas, não use em produção")
+                else:
+                    logger.info("Provedor de modelo: %s", _provedor.nome)
+    return _provedor
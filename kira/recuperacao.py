@@ -0,0 +1,29 @@
+from typing import Dict, List, Sequence, Tuple
+
+from configuracao import KIRA_TRECHOS_CONTEXTO
+from kira.bm25 import get_recuperador_bm25
+from kira.conhecimento import Trecho
+from kira.vetores import get_recuperador_vetorial
+
+
+def fundir_resultados(listas: Sequence[Sequence[Tuple[Trecho, float]]], k: int, constante: int = 60) -> List[Trecho]:
+    """Combina rankings de buscadores diferentes por reciprocal rank fusion (as pontuações não são comparáveis)."""
+    pontuacoes: Dict[str, float] = {}
+    trechos: Dict[str, Trecho] = {}
+    for resultados in listas:
+        for posicao, (trecho, _) in enumerate(resultados):
+            pontuacoes[trecho.id] = pontuacoes.get(trecho.id, 0.0) + 1.0 / (constante + posicao + 1)
+            trechos[trecho.id] = trecho
+    return [trechos[i] for i in sorted(pontuacoes, key=pontuacoes.get, reverse=True)[:k]]
+
+
+def buscar_trechos(consulta: str, k: int = KIRA_TRECHOS_CONTEXTO) -> List[Trecho]:
+    """Trechos da base de conhecimento e do catálogo para a consulta: BM25 combinado com busca semântica.
+
+    Sem o modelo local de embeddings, usa só o BM25.
+    """
+    listas = [get_recuperador_bm25().buscar(consulta, k)]
+    vetorial = get_recuperador_vetorial()
+    if vetorial is not None:
+        listas.append(vetorial.buscar(consulta, k))
+    return fundir_resultados(listas, k)
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from configuracao import (KIRA_MODELO_GRANDE, KIRA_MODELO_PEQUENO, KIRA_ROTEADOR_TOKENS_SIMPLES, KIRA_ROTEADOR_PATH,
+                          KIRA_LINK_ASSINATURA, KIRA_LINK_CONSULTORA)
+from kira.intencoes import (AGENDAMENTO, ASSINATURA, CADASTRO, CONSULTORA, SAUDACAO, DetectorIntencoes, Intencao,
+                            normalizar)
+from utils.banco import BancoSQLite
+
+
+logger = logging.getLogger(__name__)
+
+# Níveis de atendimento, do mais barato para o mais caro
+TEMPLATE = 'template'
+PEQUENO = 'pequeno'
+GRANDE = 'grande'
+
+RESPOSTAS_PADRAO = {
+    ASSINATURA: f"Para assinar a plataforma FAM e ter acesso completo, é só usar este link: {KIRA_LINK_ASSINATURA}",
+    CONSULTORA: f"Claro! Você pode conversar com a nossa consultora Mari pelo WhatsApp: {KIRA_LINK_CONSULTORA}",
+    CADASTRO: "Perfeito! Preencha o formulário abaixo para fazer o seu cadastro. "
+              "Aguardo a finalização do seu cadastro para continuar.",
+    AGENDAMENTO: "Ótimo! Preencha o formulário abaixo para agendarmos a sua reunião. "
+                 "Aguardo a finalização do agendamento para continuar.",
+    SAUDACAO: "Olá! Sou a KIRA, sua assistente virtual. Como posso ajudar você hoje? Está buscando conectar-se a "
+              "um lojista ou precisa de dicas para aumentar suas vendas?",
+}
+
+# Assuntos de consultoria, que pedem o modelo grande mesmo em mensagens curtas
+ASSUNTOS_COMPLEXOS = [
+    "estrategia", "estrategias", "marketing", "aumentar", "vender mais", "vendas", "divulgar", "divulgacao",
+    "promover", "campanha", "plano", "planejamento", "tendencia", "tendencias", "comparar", "analise", "por que",
+    "dica", "dicas", "sugestao", "sugestoes", "lancamento", "colecao", "precificacao", "preco ideal", "margem",
+]
+
+PALAVRAS_ALEM_DA_SAUDACAO = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisoes (
+    id INTEGER PRIMARY KEY,
+    criado_em REAL NOT NULL,
+    nivel TEXT NOT NULL,
+    modelo TEXT,
+    motivo TEXT NOT NULL,
+    intencao TEXT,
+    tokens INTEGER NOT NULL,
+    pergunta TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_decisoes_criado_em ON decisoes (criado_em);
+"""
+
+
+class Decisao(NamedTuple):
+    nivel: str
+    modelo: Optional[str]
+    max_tokens: int
+    motivo: str
+    resposta: Optional[str] = None  # Preenchida no nível TEMPLATE
+
+
+class _RegistroDecisoes(BancoSQLite):
+    SCHEMA = SCHEMA
+
+
+class Roteador:
+    """Escolhe, a cada turno, a forma mais barata de responder.
+
+    - TEMPLATE: intenções determinísticas (link de assinatura, consultora, cadastro, agendamento, saudação)
+      em mensagens curtas recebem a resposta fixa, sem chamar modelo;
+    - PEQUENO: mensagens curtas sem assunto de consultoria vão para o modelo pequeno;
+    - GRANDE: o restante vai para o modelo grande.
+
+    Cada decisão é registrada (nível, motivo, intenção, tokens e o início da pergunta) para ajuste dos limites.
+    """
+
+    def __init__(self, tokens_simples: int = KIRA_ROTEADOR_TOKENS_SIMPLES, caminho: Optional[str] = KIRA_ROTEADOR_PATH):
+        self.tokens_simples = tokens_simples
+        self.assuntos_complexos = DetectorIntencoes({'complexo': ASSUNTOS_COMPLEXOS})
+        self.registro = _RegistroDecisoes(caminho) if caminho else None
+
+    def decidir(self, pergunta: str, tokens: int, intencao: Optional[Intencao] = None) -> Decisao:
+        curta = tokens <= self.tokens_simples
+        if intencao is not None and intencao.nome in RESPOSTAS_PADRAO and curta:
+            restante = len(normalizar(pergunta)[0].split()) - len(intencao.expressao.split())
+            if intencao.nome != SAUDACAO or restante <= PALAVRAS_ALEM_DA_SAUDACAO:
+                return self._registrar(Decisao(TEMPLATE, None, 0, f"intencao:{intencao.nome}",
+                                               RESPOSTAS_PADRAO[intencao.nome]), pergunta, tokens, intencao)
+
+        assunto = self.assuntos_complexos.detectar(pergunta)
+        if curta and assunto is None and pergunta.count('?') <= 1:
+            decisao = Decisao(PEQUENO, KIRA_MODELO_PEQUENO, 512, "curta")
+        elif assunto is not None:
+            decisao = Decisao(GRANDE, KIRA_MODELO_GRANDE, 3500, f"assunto:{assunto.expressao}")
+        else:
+            decisao = Decisao(GRANDE, KIRA_MODELO_GRANDE, 3500, "longa" if not curta else "varias_perguntas")
+        return self._registrar(decisao, pergunta, tokens, intencao)
+
+    def _registrar(self, decisao: Decisao, pergunta: str, tokens: int, intencao: Optional[Intencao]) -> Decisao:
+        logger.info("Roteador: %s (%s), %d tokens", decisao.nivel, decisao.motivo, tokens)
+        if self.registro is not None:
+            try:
+                with self.registro.transacao() as conn:
+                    conn.execute(
+                        "INSERT INTO decisoes (criado_em, nivel, modelo, motivo, intencao, tokens, pergunta) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (time.time(), decisao.nivel, decisao.modelo, decisao.motivo,
+                         intencao.nome if intencao else None, tokens, pergunta[:200]),
+                    )
+            except Exception:
+                # O registro serve só para ajuste; nunca deve impedir a resposta
+                logger.exception("Erro ao registrar decisão do roteador")
+        return decisao
+
+
+_roteador: Optional[Roteador] = None
+_lock = threading.Lock()
+
+
+def get_roteador() -> Roteador:
+    """Retorna o roteador compartilhado pelo processo."""
+    global _roteador
+    if _roteador is None:
+        with _lock:
+            if _roteador is None:
+                _roteador = Roteador()
+    return _roteador
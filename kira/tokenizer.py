@@ -0,0 +1,135 @@
+import logging
+import math
+import os
+import re
+import sys
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from configuracao import KIRA_TOKENIZER_PATH
+
+
+logger = logging.getLogger(__name__)
+
+TOKENS_POR_MENSAGEM = 5  # Template de chat do Llama 3: <|start_header_id|>, papel, <|end_header_id|>, \n\n, <|eot_id|>
+_PALAVRAS = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+_tokenizer: Any = None
+_carregado = False
+_lock = threading.Lock()
+
+
+def get_tokenizer() -> Optional[Any]:
+    """Carrega uma única vez o tokenizer local (tokenizers.Tokenizer), sem acesso à rede.
+
+    Retorna None se o arquivo não existir; nesse caso a contagem usa uma estimativa.
+    """
+    global _tokenizer, _carregado
+    if not _carregado:
+        with _lock:
+            if not _carregado:
+                if os.path.exists(KIRA_TOKENIZER_PATH):
+                    from tokenizers import Tokenizer
+
+                    _tokenizer = Tokenizer.from_file(KIRA_TOKENIZER_PATH)
+                else:
+                    logger.warning("Tokenizer não encontrado em %s; usando estimativa de tokens.", KIRA_TOKENIZER_PATH)
+                _carregado = True
+    return _tokenizer
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa para tokenizers BPE em português: cerca de 4 caracteres por token em cada palavra."""
+    return sum(max(1, math.ceil(len(parte) / 4)) for parte in _PALAVRAS.findall(texto))
+
+
+def contar_tokens(texto: str) -> int:
+    """Número de tokens do texto."""
+    if not texto:
+        return 0
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return estimar_tokens(texto)
+    return len(tokenizer.encode(texto, add_special_tokens=False).ids)
+
+
+def tokens_mensagem(mensagem: Dict[str, Any], contar: Callable[[str], int] = contar_tokens) -> int:
+    """Tokens de uma mensagem do chat, calculados uma única vez e guardados na própria mensagem."""
+    tokens = mensagem.get('tokens')
+    if tokens is None:
+        tokens = contar(mensagem['content']) + TOKENS_POR_MENSAGEM
+        mensagem['tokens'] = tokens
+    return tokens
+
+
+# Pré-tokenização e tokens especiais do Llama 3 (llama_models/llama3/tokenizer.py, da Meta)
+PADRAO_LLAMA3 = (r"(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]+[\r\n]*|"
+                 r"\s*[\r\n]+|\s+(?!\S)|\s+")
+ESPECIAIS_LLAMA3 = [
+    "<|begin_of_text|>", "<|end_of_text|>", "<|reserved_special_token_0|>", "<|reserved_special_token_1|>",
+    "<|finetune_right_pad_id|>", "<|step_id|>", "<|start_header_id|>", "<|end_header_id|>", "<|eom_id|>",
+    "<|eot_id|>", "<|python_tag|>", "<|image|>",
+]
+ESPECIAIS_LLAMA3 += [f"<|reserved_special_token_{2 + i}|>" for i in range(256 - len(ESPECIAIS_LLAMA3))]
+
+
+def converter_tiktoken(caminho: str) -> Any:
+    """Converte o tokenizer.model do Llama 3 (BPE no formato do tiktoken) em um tokenizers.Tokenizer equivalente.
+
+    As fusões do BPE são reconstruídas a partir dos ranks, como no conversor do transformers.
+    """
+    import base64
+    from tokenizers import Regex, Tokenizer, decoders, models, pre_tokenizers
+
+    with open(caminho, 'rb') as arquivo:
+        ranks = {base64.b64decode(token): int(rank) for token, rank in
+                 (linha.split() for linha in arquivo.read().splitlines() if linha)}
+
+    # Bytes -> caracteres imprimíveis, como no ByteLevel do GPT-2
+    imprimiveis = list(range(ord('!'), ord('~') + 1)) + list(range(ord('¡'), ord('¬') + 1)) + \
+        list(range(ord('®'), ord('ÿ') + 1))
+    codigos, extra = {}, 0
+    for byte in range(256):
+        if byte in imprimiveis:
+            codigos[byte] = chr(byte)
+        else:
+            codigos[byte] = chr(256 + extra)
+            extra += 1
+
+    def texto(token: bytes) -> str:
+        return ''.join(codigos[byte] for byte in token)
+
+    vocabulario, fusoes = {}, []
+    for token, rank in ranks.items():
+        vocabulario[texto(token)] = rank
+        locais = [(token[:i], token[i:], rank) for i in range(1, len(token))
+                  if token[:i] in ranks and token[i:] in ranks]
+        fusoes.extend(sorted(locais, key=lambda fusao: (ranks[fusao[0]], ranks[fusao[1]])))
+    fusoes.sort(key=lambda fusao: fusao[2])
+
+    tokenizer = Tokenizer(models.BPE(vocabulario, [(texto(a), texto(b)) for a, b, _ in fusoes],
+                                     fuse_unk=False, byte_fallback=False, ignore_merges=True))
+    tokenizer.pre_tokenizer = pre_tokenizers.Sequence([
+        pre_tokenizers.Split(Regex(PADRAO_LLAMA3), behavior='isolated', invert=False),
+        pre_tokenizers.ByteLevel(add_prefix_space=False, use_regex=False),
+    ])
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.add_special_tokens(ESPECIAIS_LLAMA3)
+    return tokenizer
+
+
+if __name__ == "__main__":
+    # Gera o arquivo local a partir do tokenizer.model do Llama 3, o mesmo dos modelos usados pelo roteador
+    # (distribuído pela Meta com os pesos e no pacote llama-models: llama_models/llama3/tokenizer.model):
+    # python -m kira.tokenizer caminho/para/tokenizer.model
+    # Um tokenizer do Hugging Face também serve (requer rede apenas nesta etapa): python -m kira.tokenizer <repo>
+    from tokenizers import Tokenizer
+
+    origem = sys.argv[1] if len(sys.argv) > 1 else 'tokenizer.model'
+    if os.path.isfile(origem):
+        tokenizer = converter_tiktoken(origem)
+    else:
+        tokenizer = Tokenizer.from_pretrained(origem)
+    os.makedirs(os.path.dirname(KIRA_TOKENIZER_PATH) or '.', exist_ok=True)
+    tokenizer.save(KIRA_TOKENIZER_PATH)
+    print(f"Tokenizer de {origem} salvo em {KIRA_TOKENIZER_PATH}.")
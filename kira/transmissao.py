@@ -0,0 +1,173 @@
+import asyncio
+import concurrent.futures
+import logging
+import re
+import threading
+import time
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Set, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class Transmissao:
+    """Saída de uma geração em andamento, compartilhada entre quem a produz e quem a lê.
+
+    O produtor (uma tarefa no loop global) publica as partes; qualquer número de leitores, em qualquer
+    thread, acompanha a geração a partir do início ou de uma posição já lida, sem gerar de novo.
+    Leitores assíncronos (`aguardar`) esperam em um asyncio.Event do próprio loop, sem ocupar uma thread
+    cada, o que permite milhares de conexões ociosas acompanhando gerações.
+    """
+
+    def __init__(self):
+        self.partes: List[str] = []
+        self.concluida = False
+        self.erro: Optional[BaseException] = None
+        self.fila: Optional[Tuple[int, float]] = None  # (posição, espera estimada) enquanto aguarda vaga
+        self.assinantes = 0  # Sessões acompanhando a geração; ela só é cancelada quando todas desistem
+        self.tarefa: Optional[concurrent.futures.Future] = None  # Produtor no loop global
+        self.versao = 0  # Incrementada a cada mudança (parte, fila ou conclusão)
+        # Instantes (time.monotonic) para as métricas de latência
+        self.criada_em = time.monotonic()
+        self.primeira_parte_em: Optional[float] = None
+        self.concluida_em: Optional[float] = None
+        self.espera_fila = 0.0  # Segundos aguardando vaga de geração
+        self._ao_concluir: List[Callable[['Transmissao'], None]] = []
+        self._condicao = threading.Condition()
+        self._eventos: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @classmethod
+    def pronta(cls, texto: str) -> 'Transmissao':
+        """Transmissão já concluída com um texto conhecido (ex.: resposta em cache)."""
+        transmissao = cls()
+        # Dividida palavra a palavra, como chegaria de uma geração
+        transmissao.partes = re.findall(r'\s*\S+\s*?', texto) + re.findall(r'\s+$', texto)
+        transmissao.concluida = True
+        transmissao.primeira_parte_em = transmissao.concluida_em = transmissao.criada_em
+        return transmissao
+
+    def _notificar(self) -> None:
+        # Chamado com a condição adquirida
+        self.versao += 1
+        self._condicao.notify_all()
+        for loop, evento in self._eventos:
+            try:
+                loop.call_soon_threadsafe(evento.set)
+            except RuntimeError:
+                pass  # Loop do leitor já encerrado
+
+    def publicar(self, parte: str) -> None:
+        with self._condicao:
+            if self.primeira_parte_em is None:
+                self.primeira_parte_em = time.monotonic()
+            self.partes.append(parte)
+            self._notificar()
+
+    def concluir(self, erro: Optional[BaseException] = None) -> None:
+        with self._condicao:
+            self.erro = erro
+            self.concluida = True
+            self.concluida_em = time.monotonic()
+            self._notificar()
+            callbacks, self._ao_concluir = self._ao_concluir, []
+        for callback in callbacks:
+            self._chamar(callback)
+
+    def ao_concluir(self, callback: Callable[['Transmissao'], None]) -> None:
+        """Chama `callback(transmissao)` quando a geração terminar (na hora, se já terminou).
+
+        Roda na thread de quem conclui (em geral, o loop global): deve ser rápido e não bloquear.
+        """
+        with self._condicao:
+            if not self.concluida:
+                self._ao_concluir.append(callback)
+                return
+        self._chamar(callback)
+
+    def _chamar(self, callback: Callable[['Transmissao'], None]) -> None:
+        try:
+            callback(self)
+        except Exception:
+            logger.exception("Erro ao notificar a conclusão de uma transmissão")
+
+    def informar_fila(self, posicao: Optional[int], espera: float) -> None:
+        """Atualiza a posição na fila de geração; posição None indica que a geração começou."""
+        with self._condicao:
+            if posicao is None and self.fila is not None:
+                self.espera_fila = time.monotonic() - self.criada_em
+            self.fila = (posicao, espera) if posicao is not None else None
+            self._notificar()
+
+    def acompanhar_fila(self) -> Iterator[Tuple[int, float]]:
+        """Posição na fila e espera estimada a cada mudança, até a geração começar."""
+        ultima = None
+        while True:
+            with self._condicao:
+                self._condicao.wait_for(lambda: self.fila != ultima or self.partes or self.concluida)
+                if self.fila is None or self.partes or self.concluida:
+                    return
+                ultima = self.fila
+            yield ultima
+
+    async def acompanhar_fila_async(self) -> AsyncIterator[Tuple[int, float]]:
+        """Versão assíncrona de `acompanhar_fila`."""
+        ultima = None
+        while True:
+            versao = self.versao
+            with self._condicao:
+                if (self.fila is None and ultima is not None) or self.partes or self.concluida:
+                    return
+                fila = self.fila
+            if fila is not None and fila != ultima:
+                ultima = fila
+                yield ultima
+            await self.aguardar(versao)
+
+    async def aguardar(self, versao: int, timeout: Optional[float] = None) -> bool:
+        """Espera, sem bloquear o loop, até a transmissão mudar depois de `versao`; False se o tempo esgotar."""
+        evento = asyncio.Event()
+        chave = (asyncio.get_running_loop(), evento)
+        with self._condicao:
+            if self.versao != versao:
+                return True
+            self._eventos.add(chave)
+        try:
+            await asyncio.wait_for(evento.wait(), timeout)
+            return True
+        except TimeoutError:
+            return False
+        finally:
+            with self._condicao:
+                self._eventos.discard(chave)
+
+    @property
+    def texto(self) -> str:
+        return ''.join(self.partes)
+
+    def ler(self, desde: int = 0, timeout: Optional[float] = None) -> Tuple[List[str], bool]:
+        """Partes publicadas a partir de `desde`, esperando até `timeout` se ainda não houver nenhuma.
+
+        Retorna também se a transmissão terminou (não haverá mais partes depois das retornadas); nesse caso
+        o erro do produtor, se houver, fica em `erro`.
+        """
+        with self._condicao:
+            self._condicao.wait_for(lambda: len(self.partes) > desde or self.concluida, timeout)
+            return self.partes[desde:], self.concluida
+
+    def iterar(self, desde: int = 0, timeout: Optional[float] = None) -> Iterator[str]:
+        """Partes a partir da posição `desde`, esperando as próximas até a geração terminar.
+
+        Levanta o erro do produtor, se houver, depois de entregar o que já foi publicado; `timeout` limita
+        a espera por cada nova parte (TimeoutError).
+        """
+        posicao = desde
+        while True:
+            novas, terminou = self.ler(posicao, timeout)
+            if not novas and not terminou:
+                raise TimeoutError("Tempo esgotado aguardando a resposta do modelo.")
+            yield from novas
+            posicao += len(novas)
+            if terminou:
+                if self.erro is not None:
+                    raise self.erro
+                return
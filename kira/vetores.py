@@ -0,0 +1,328 @@
+import logging
+import os
+import re
+import sys
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from configuracao import KIRA_VETORES_PASTA, KIRA_EMBEDDINGS_MODELO, KIRA_TRECHOS_CONTEXTO
+from kira.conhecimento import BaseConhecimento, Trecho, get_base_conhecimento
+from utils.banco import BancoSQLite
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vetores (
+    hash TEXT PRIMARY KEY,
+    linha INTEGER NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+"""
+
+
+class ModeloEmbeddings:
+    """Modelo de embeddings (sentence-transformers) carregado de uma pasta local, em CPU, uma vez por processo."""
+
+    def __init__(self, caminho: str = KIRA_EMBEDDINGS_MODELO):
+        self.caminho = caminho
+        self._modelo = None
+        self._lock = threading.Lock()
+
+    def disponivel(self) -> bool:
+        return os.path.isdir(self.caminho)
+
+    def _carregar(self):
+        if self._modelo is None:
+            with self._lock:
+                if self._modelo is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._modelo = SentenceTransformer(self.caminho, device='cpu')
+        return self._modelo
+
+    def codificar(self, textos: Sequence[str]) -> np.ndarray:
+        """Vetores float32 normalizados (produto interno = similaridade de cosseno)."""
+        vetores = self._carregar().encode(list(textos), batch_size=64, normalize_embeddings=True,
+                                          convert_to_numpy=True, show_progress_bar=False)
+        return np.ascontiguousarray(vetores, dtype=np.float32)
+
+
+class _Mapa(NamedTuple):
+    geracao: int
+    linhas: int
+    vetores: Optional[np.memmap]
+    hashes: np.ndarray  # hash do trecho de cada linha da matriz
+
+
+class IndiceVetorial(BancoSQLite):
+    """Embeddings persistidos em disco: uma matriz float32 e um SQLite que liga hash do trecho -> linha.
+
+    A matriz é lida por memória mapeada, então vários processos (workers do Streamlit) compartilham a mesma
+    cópia pelo cache de páginas do sistema. Só trechos com hash ainda desconhecido são codificados, e as
+    novas linhas são acrescentadas ao fim do arquivo dentro da transação de escrita do SQLite, que serve de
+    trava entre processos. Linhas de trechos removidos são descartadas por `compactar`, que grava a matriz
+    de uma nova geração em outro arquivo (vetores.<geracao>.f32): nenhum arquivo mapeado é substituído, e as
+    gerações antigas são apagadas depois, quando ninguém mais as mantém abertas.
+    """
+
+    SCHEMA = SCHEMA
+
+    def __init__(self, pasta: str = KIRA_VETORES_PASTA, modelo: Optional[ModeloEmbeddings] = None):
+        super().__init__(os.path.join(pasta, 'indice.db'))
+        self.pasta = pasta
+        self.modelo = modelo or get_modelo_embeddings()
+        self._mapa: Optional[_Mapa] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _definir_meta(conn, chave: str, valor: int) -> None:
+        conn.execute("INSERT INTO meta (chave, valor) VALUES (?, ?) "
+                     "ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor", (chave, str(valor)))
+
+    @staticmethod
+    def _estado(conn) -> Tuple[int, int, int]:
+        """(geracao, linhas, dimensao) lidos em uma única consulta, então sempre da mesma geração."""
+        valores = {r['chave']: int(r['valor']) for r in conn.execute(
+            "SELECT chave, valor FROM meta WHERE chave IN ('geracao', 'linhas', 'dimensao')")}
+        return valores.get('geracao', 0), valores.get('linhas', 0), valores.get('dimensao', 0)
+
+    def _arquivo(self, geracao: int) -> str:
+        # A geração 0 mantém o nome dos índices gravados antes das gerações
+        return os.path.join(self.pasta, 'vetores.f32' if geracao == 0 else f'vetores.{geracao}.f32')
+
+    def _remover_geracoes_antigas(self, geracao: int) -> None:
+        """Apaga as matrizes de gerações anteriores a `geracao`.
+
+        No Windows, um arquivo ainda mapeado por algum leitor não pode ser apagado; ele fica para a próxima
+        limpeza. Nos demais sistemas, quem ainda o mantém mapeado continua lendo até reabrir a matriz.
+        """
+        for nome in os.listdir(self.pasta):
+            encontrado = re.fullmatch(r'vetores(?:\.(\d+))?\.f32', nome)
+            if encontrado and int(encontrado.group(1) or 0) < geracao:
+                try:
+                    os.remove(os.path.join(self.pasta, nome))
+                except OSError:
+                    pass
+
+    def mapa(self) -> _Mapa:
+        """Matriz mapeada atual; reaberta só quando outro processo acrescentou linhas ou compactou."""
+        conn = self.conexao()
+        geracao, linhas, _ = self._estado(conn)
+        atual = self._mapa
+        if atual is not None and atual.geracao == geracao and atual.linhas == linhas:
+            return atual
+
+        with self._lock:
+            while True:
+                # Meta e linhas lidas na mesma transação de leitura: uma compactação concluída no meio não mistura
+                # as linhas de duas gerações
+                conn.execute('BEGIN')
+                try:
+                    geracao, linhas, dimensao = self._estado(conn)
+                    hashes = np.empty(linhas, dtype=object)
+                    for registro in conn.execute("SELECT hash, linha FROM vetores WHERE linha < ?", (linhas,)):
+                        hashes[registro['linha']] = registro['hash']
+                finally:
+                    conn.execute('COMMIT')
+                vetores = None
+                if linhas:
+                    try:
+                        vetores = np.memmap(self._arquivo(geracao), dtype=np.float32, mode='r',
+                                            shape=(linhas, dimensao))
+                    except FileNotFoundError:
+                        if self._estado(conn)[0] == geracao:
+                            raise
+                        continue  # Outro processo compactou e já apagou esta geração; lê a nova
+                self._mapa = _Mapa(geracao, linhas, vetores, hashes)
+                return self._mapa
+
+    def indexar(self, trechos: Sequence[Trecho]) -> int:
+        """Codifica e grava os trechos ainda não indexados; retorna quantos foram acrescentados."""
+        conhecidos = {r['hash'] for r in self.conexao().execute("SELECT hash FROM vetores")}
+        textos: Dict[str, str] = {}
+        for trecho in trechos:
+            if trecho.hash not in conhecidos:
+                textos.setdefault(trecho.hash, trecho.texto)
+        if not textos:
+            return 0
+
+        # A codificação (lenta) fica fora da transação; outro processo pode ter indexado os mesmos trechos
+        # nesse meio tempo, então a lista é refiltrada antes de gravar.
+        hashes = list(textos)
+        vetores = self.modelo.codificar([textos[h] for h in hashes])
+        with self.transacao() as conn:
+            conhecidos = {r['hash'] for r in conn.execute("SELECT hash FROM vetores")}
+            novos = [i for i, h in enumerate(hashes) if h not in conhecidos]
+            if not novos:
+                return 0
+            vetores = vetores[novos]
+            geracao, linhas, dimensao = self._estado(conn)
+            if linhas and dimensao != vetores.shape[1]:
+                raise ValueError(f"O modelo de embeddings mudou de dimensão ({dimensao} -> {vetores.shape[1]}); "
+                                 f"apague {self.pasta} para reindexar.")
+
+            arquivo = self._arquivo(geracao)
+            with open(arquivo, 'r+b' if os.path.exists(arquivo) else 'wb') as f:
+                # Grava a partir da última linha confirmada, descartando restos de uma escrita interrompida
+                f.seek(linhas * vetores.shape[1] * 4)
+                f.write(vetores.tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+            conn.executemany("INSERT INTO vetores (hash, linha) VALUES (?, ?)",
+                             ((hashes[i], linhas + j) for j, i in enumerate(novos)))
+            self._definir_meta(conn, 'linhas', linhas + len(novos))
+            self._definir_meta(conn, 'dimensao', vetores.shape[1])
+            return len(novos)
+
+    def compactar(self, hashes_ativos: set, proporcao_minima: float = 0.5) -> bool:
+        """Reescreve a matriz só com os trechos ativos quando as linhas órfãs passam de `proporcao_minima`."""
+        mapa = self.mapa()
+        self._remover_geracoes_antigas(mapa.geracao)
+        ativos = np.fromiter((h in hashes_ativos for h in mapa.hashes), dtype=bool, count=mapa.linhas)
+        if not mapa.linhas or ativos.mean() > 1 - proporcao_minima:
+            return False
+
+        with self.transacao() as conn:
+            if self._estado(conn)[:2] != (mapa.geracao, mapa.linhas):
+                return False  # Outro processo alterou o índice; fica para a próxima verificação
+            # A nova geração vai para um arquivo próprio, que os leitores só abrem depois do commit; quem tem a
+            # matriz antiga mapeada continua lendo o arquivo anterior até reabrir
+            with open(self._arquivo(mapa.geracao + 1), 'wb') as f:
+                f.write(np.ascontiguousarray(mapa.vetores[ativos]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            conn.execute("DELETE FROM vetores")
+            conn.executemany("INSERT INTO vetores (hash, linha) VALUES (?, ?)",
+                             ((h, i) for i, h in enumerate(mapa.hashes[ativos])))
+            self._definir_meta(conn, 'linhas', int(ativos.sum()))
+            self._definir_meta(conn, 'geracao', mapa.geracao + 1)
+        return True
+
+
+class RecuperadorVetorial:
+    """Busca semântica nos trechos da base de conhecimento e do catálogo.
+
+    Quando a base muda, os trechos novos são indexados em uma thread; enquanto isso, as consultas usam os
+    vetores já gravados. Nada é recodificado na inicialização se o índice em disco já cobre a base.
+    """
+
+    def __init__(self, base: BaseConhecimento, indice: IndiceVetorial):
+        self.base = base
+        self.indice = indice
+        self._lock = threading.Lock()
+        self._versao_indexada = -1
+        self._indexando = False
+        self._por_hash: Tuple[int, Dict[str, Trecho]] = (-1, {})
+        self._mascara: Tuple[Tuple[int, int, int], Optional[np.ndarray]] = ((-1, -1, -1), None)
+
+    def _indexar(self, versao: int) -> None:
+        try:
+            trechos = self.base.trechos()
+            novos = self.indice.indexar(trechos)
+            self.indice.compactar({t.hash for t in trechos})
+            if novos:
+                logger.info("%d trecho(s) novos indexados para busca semântica.", novos)
+        except Exception:
+            # Só tenta de novo quando a base mudar, para não recodificar tudo a cada consulta
+            logger.exception("Erro ao indexar a base de conhecimento para busca semântica")
+        finally:
+            self._versao_indexada = versao
+            self._indexando = False
+
+    def _sincronizar(self) -> None:
+        versao = self.base.versao
+        if versao != self._versao_indexada and not self._indexando:
+            with self._lock:
+                if self._indexando:
+                    return
+                self._indexando = True
+            threading.Thread(target=self._indexar, args=(versao,), name="kira-vetores", daemon=True).start()
+
+    def _trechos_por_hash(self) -> Dict[str, Trecho]:
+        versao, por_hash = self._por_hash
+        if versao != self.base.versao:
+            versao = self.base.versao
+            por_hash = {}
+            for trecho in self.base.trechos():
+                por_hash.setdefault(trecho.hash, trecho)
+            self._por_hash = (versao, por_hash)
+        return por_hash
+
+    def buscar(self, consulta: str, k: int = KIRA_TRECHOS_CONTEXTO) -> List[Tuple[Trecho, float]]:
+        """Os `k` trechos mais próximos da consulta, com a similaridade de cosseno."""
+        self.base.atualizar()
+        self._sincronizar()
+        mapa = self.indice.mapa()
+        if not mapa.linhas or k <= 0:
+            return []
+
+        por_hash = self._trechos_por_hash()
+        chave = (mapa.geracao, mapa.linhas, self.base.versao)
+        chave_mascara, mascara = self._mascara
+        if chave_mascara != chave:
+            # Linhas de trechos que não existem mais na base (ainda não compactadas) ficam fora da busca
+            mascara = np.fromiter((h in por_hash for h in mapa.hashes), dtype=bool, count=mapa.linhas)
+            self._mascara = (chave, mascara)
+
+        consulta_vetor = self.indice.modelo.codificar([consulta])[0]
+        pontuacoes = mapa.vetores @ consulta_vetor
+        pontuacoes[~mascara] = -np.inf
+        k = min(k, int(mascara.sum()))
+        if k == 0:
+            return []
+        melhores = np.argpartition(pontuacoes, -k)[-k:]
+        melhores = melhores[np.argsort(-pontuacoes[melhores])]
+        return [(por_hash[mapa.hashes[i]], float(pontuacoes[i])) for i in melhores]
+
+
+_modelo: Optional[ModeloEmbeddings] = None
+_recuperador: Optional[RecuperadorVetorial] = None
+_lock = threading.Lock()
+
+
+def get_modelo_embeddings() -> ModeloEmbeddings:
+    """Retorna o modelo de embeddings compartilhado pelo processo."""
+    global _modelo
+    if _modelo is None:
+        with _lock:
+            if _modelo is None:
+                _modelo = ModeloEmbeddings()
+    return _modelo
+
+
+def get_recuperador_vetorial() -> Optional[RecuperadorVetorial]:
+    """Retorna o recuperador vetorial do processo, ou None se o modelo local de embeddings não estiver instalado."""
+    global _recuperador
+    if _recuperador is None:
+        modelo = get_modelo_embeddings()
+        if not modelo.disponivel():
+            return None
+        with _lock:
+            if _recuperador is None:
+                _recuperador = RecuperadorVetorial(get_base_conhecimento(), IndiceVetorial(modelo=modelo))
+    return _recuperador
+
+
+if __name__ == "__main__":
+    # python -m kira.vetores baixar [modelo]  -> salva o modelo em KIRA_EMBEDDINGS_MODELO (requer rede)
+    # python -m kira.vetores                  -> indexa a base de conhecimento (só os trechos novos)
+    if len(sys.argv) > 1 and sys.argv[1] == 'baixar':
+        from sentence_transformers import SentenceTransformer
+
+        origem = sys.argv[2] if len(sys.argv) > 2 else 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+        SentenceTransformer(origem, device='cpu').save(KIRA_EMBEDDINGS_MODELO)
+        print(f"Modelo {origem} salvo em {KIRA_EMBEDDINGS_MODELO}.")
+    else:
+        base = get_base_conhecimento()
+        indice = IndiceVetorial()
+        trechos = base.trechos()
+        print(f"{indice.indexar(trechos)} trecho(s) indexado(s) de {len(trechos)}.")
+        indice.compactar({t.hash for t in trechos})
@@ -3,12 +3,14 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, EmailStr
 import pandas as pd
 import os
-import stripe
+from utils.stripe_api import stripe
 from typing import Optional
 from datetime import datetime
 import asyncio
+from utils.event_loop import aguardar, executar_na_sessao
 from key_config import API_KEY_STRIPE, URL_BASE, STRIPE_WEBHOOK_SECRET
 from config_handler import add_client_to_config
+from utils.importacao_clientes import importar_clientes, IMPORTADO
 
 
 app = FastAPI()
@@ -50,7 +52,8 @@ async def create_customer(cliente: Cliente):
             raise ValueError("Todos os campos são obrigatórios.")
 
         # Criação do cliente no Stripe
-        customer = stripe.Customer.create(
+        customer = await asyncio.to_thread(
+            stripe.Customer.create,
             name=cliente.name,  # O campo 'name' é aceito pela API do Stripe
             email=cliente.email,
             metadata={
@@ -91,7 +94,7 @@ async def create_customer(cliente: Cliente):
 async def fetch_customers(offset: int = 0, limit: int = 100, name: Optional[str] = None, email: Optional[str] = None, starting_after: Optional[str] = None):
     try:
         # Buscando a lista de clientes com limite e starting_after
-        customers = stripe.Customer.list(limit=limit, starting_after=starting_after)
+        customers = await asyncio.to_thread(stripe.Customer.list, limit=limit, starting_after=starting_after)
 
         # Verifica se os dados de clientes estão disponíveis
         if not customers['data']:
@@ -143,7 +146,7 @@ def save_uploaded_file(uploaded_file, type_username):
 async def handle_create_customer(cliente):
     resultado = None  # Inicializa resultado com None
     try:
-        resultado = await create_customer(cliente)  # Aguarda a conclusão da tarefa
+        resultado = await aguardar(create_customer(cliente))  # Executa no loop global do processo
         st.success(f"Cliente {resultado.name} criado com sucesso!")
 
         # Limpa os campos do formulário
@@ -163,7 +166,7 @@ async def handle_create_customer(cliente):
 
 async def handle_fetch_customers(offset, limit, name, email):
     try:
-        clientes = await fetch_customers(offset=offset, limit=limit, name=name, email=email, starting_after=None)
+        clientes = await aguardar(fetch_customers(offset=offset, limit=limit, name=name, email=email, starting_after=None))
         if clientes:
             data = []
             for cliente in clientes:
@@ -321,13 +324,35 @@ def showCliente():
             else:
                 st.warning("Nenhuma imagem foi carregada.")
 
+            # Cria o cliente no Stripe pelo loop global e exibe o resultado nesta sessão
+            executar_na_sessao(handle_create_customer(cliente))
+
+    # Seção para importar clientes em lote
+    st.header("Importar Clientes em Lote")
+    st.caption("Planilha .csv ou .xlsx com as colunas: username, name, email, password, role, whatsapp, "
+               "endereco, cep, bairro, cidade, cpf_cnpj.")
+    arquivo_lote = st.file_uploader("Planilha de clientes", type=["csv", "xlsx"], key="importacao_lote")
+
+    if arquivo_lote is not None and st.button("IMPORTAR CLIENTES"):
+        aviso = st.empty()
+        aviso.info("Importando clientes...")
+
+        def ao_progredir(processadas, importadas):
+            aviso.info(f"{processadas} linha(s) processada(s), {importadas} cliente(s) criado(s) no Stripe...")
+
         try:
-            asyncio.create_task(handle_create_customer(cliente))
-        except Exception as e:
-            # Aqui você pode registrar o erro em um log ou apenas ignorá-lo
-            pass  # Não exibe o erro na tela
+            relatorio = executar_na_sessao(
+                importar_clientes(arquivo_lote, arquivo_lote.name, ao_progredir=ao_progredir))
+        except ValueError as ve:
+            st.error(str(ve))
+        else:
+            aviso.empty()
+            importados = int((relatorio['status'] == IMPORTADO).sum())
+            st.success(f"{importados} de {len(relatorio)} cliente(s) importado(s).")
+            st.dataframe(relatorio[relatorio['status'] != IMPORTADO])  # Exibe apenas as linhas com problema
+            st.download_button("Baixar relatório", relatorio.to_csv(index=False).encode('utf-8'),
+                               file_name="relatorio_importacao.csv", mime="text/csv")
 
-    # Seção para listar clientes
     st.header("Listar Clientes")
     offset = st.number_input("Offset", min_value=0, value=0)
     limit = st.number_input("Limite", min_value=1, max_value=100, value=10)
@@ -335,20 +360,4 @@ def showCliente():
     email_filter = st.text_input("Filtrar por E-mail (opcional)")
 
     if st.button("Carregar Lista de Clientes"):
-        try:
-            asyncio.create_task(handle_fetch_customers(offset, limit, name_filter, email_filter))
-            if clientes:
-                data = []
-                for cliente in clientes:
-                    data.append({
-                        'ID': cliente.id,
-                        'name': cliente.name,
-                        'E-mail': cliente.email,
-                    })
-                df = pd.DataFrame(data)
-                st.dataframe(df)  # Exibe a tabela de clientes no Streamlit
-            else:
-                st.warning("Nenhum cliente encontrado.")
-        except Exception as e:
-            # Aqui também você pode registrar o erro ou ignorá-lo
-            pass
+        executar_na_sessao(handle_fetch_customers(offset, limit, name_filter, email_filter))
@@ -2,7 +2,7 @@ import streamlit as st
 import asyncio
 import httpx
 from pydantic import BaseModel
-from configuracao import ASAAS_API_KEY, BASE_URL
+from utils.asaas import get_asaas_client
 from fastapi import FastAPI, HTTPException
 from acesso_autent import login
 
@@ -23,24 +23,11 @@ class Cliente(BaseModel):
 
 
 async def fetch_customer(customer_id: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f'{BASE_URL}/customers/{customer_id}',
-            headers={'access_token': ASAAS_API_KEY}
-        )
-        response.raise_for_status()
-        return response.json()
+    return await get_asaas_client().obter_cliente(customer_id)
 
 
 async def update_customer(customer: Cliente):
-    async with httpx.AsyncClient() as client:
-        response = await client.put(
-            f'{BASE_URL}/customers/{customer.id}',
-            json=customer.dict(),
-            headers={'access_token': ASAAS_API_KEY}
-        )
-        response.raise_for_status()
-        return response.json()
+    return await get_asaas_client().atualizar_cliente(customer.id, customer.dict())
 
 
 async def show_edit_customer():
@@ -3,7 +3,7 @@ from fastapi import FastAPI, HTTPException
 import asyncio
 import httpx
 from pydantic import BaseModel
-from configuracao import ASAAS_API_KEY, BASE_URL  # Importando da configuração
+from utils.asaas import get_asaas_client
 from acesso_autent import login
 
 
@@ -25,23 +25,11 @@ class Cliente(BaseModel):
 
 
 async def fetch_customer(customer_id: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f'{BASE_URL}/customers/{customer_id}',
-            headers={'access_token': ASAAS_API_KEY}
-        )
-        response.raise_for_status()
-        return response.json()
+    return await get_asaas_client().obter_cliente(customer_id)
 
 
 async def delete_customer(customer_id: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(
-            f'{BASE_URL}/customers/{customer_id}',
-            headers={'access_token': ASAAS_API_KEY}
-        )
-        response.raise_for_status()
-        return response.json()
+    return await get_asaas_client().excluir_cliente(customer_id)
 
 
 async def show_delete_customer():
@@ -1,24 +1,22 @@
 import streamlit as st
 from fastapi import FastAPI, HTTPException
 import asyncio
-import httpx
-import pandas as pd
 import time
 from fastapi import FastAPI, HTTPException
-from configuracao import ASAAS_API_KEY, BASE_URL  # Importando da configuração
+from utils.asaas import get_asaas_client
 
 
 app = FastAPI()
 
 
 async def fetch_customers():
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f'{BASE_URL}/customers',
-            headers={'access_token': ASAAS_API_KEY}
-        )
-        response.raise_for_status()  # Levanta um erro se a resposta não for bem-sucedida
-        return response.json()["data"]  # Retorna apenas os dados dos clientes
+    return await get_asaas_client().listar_clientes()  # Retorna todos os clientes, percorrendo todas as páginas
+
+
+async def fetch_customers_df():
+    # Já seleciona e renomeia as colunas para melhor visualização (adapte conforme os campos da API)
+    return await get_asaas_client().coletar_dataframe('/customers', colunas={
+        'id': 'ID', 'name': 'Nome', 'email': 'E-mail', 'cpfCnpj': 'CPF/CNPJ', 'phone': 'WhatsApp'})
 
 
 async def show_list_customers():
@@ -32,14 +30,9 @@ async def show_list_customers():
 
     try:
         # Executa a função assíncrona para buscar clientes
-        clientes = await fetch_customers()
-
-        if clientes:
-            # Cria um DataFrame para organizar os dados
-            df = pd.DataFrame(clientes)
-            # Seleciona e renomeia as colunas para melhor visualização
-            df = df[['id', 'name', 'email', 'cpfCnpj', 'phone']]  # Adapte conforme os campos da API
-            df.columns = ['ID', 'Nome', 'E-mail', 'CPF/CNPJ', 'WhatsApp']
+        df = await fetch_customers_df()
+
+        if not df.empty:
             st.write(df)
         else:
             st.write("Nenhum cliente encontrado.")
@@ -1,50 +1,160 @@
+import json
+import time
+from datetime import datetime
+
 import pandas as pd
 import streamlit.components.v1 as components
 import streamlit as st
 from pygwalker.api.streamlit import init_streamlit_comm, get_streamlit_html
 import streamlit_shadcn_ui as ui
 
+from kira.metricas import get_metricas, percentil
 
-st.set_page_config(page_title='DASHBOARD DE VENDAS', page_icon="📊", layout="wide")
 
+PERIODOS_KIRA = {"Última hora": 1, "Últimas 24 horas": 24, "Últimos 7 dias": 24 * 7, "Últimos 30 dias": 24 * 30}
 
-async def showDashboard():
 
-    st.title("Sistema Flash Pagamentos")
+def _numero(valor, casas=0):
+    return f"{valor:,.{casas}f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _dividir(numerador, denominador):
+    return numerador / denominador if denominador else None
 
-    st.header("Dashboard Flash")
-    ui.badges(badge_list=[("Dataframe", "default"), ("to", "secondary"), ("Interactive Data App", "destructive")], class_name="flex gap-2", key="viz_badges1")
-    st.caption("Dashboard interativo para controle de vendas e análise para tomadas de decisão.")
-    ui.badges(badge_list=[("pip install pygwalker", "secondary")], class_name="flex gap-2", key="viz_badges2")
 
-    cols = st.columns(3)
+def mostrar_metricas_kira():
+    """Desempenho e consumo do chat KIRA: totais por hora gravados (Streamlit e API) e turnos recentes do processo."""
+    st.header("Desempenho da KIRA")
+    st.caption("Latência, tamanho dos prompts, uso do cache e consumo por usuário, para planejar capacidade e "
+               "perceber regressões.")
 
+    periodo = st.selectbox("Período", list(PERIODOS_KIRA), index=1, key="kira_metricas_periodo")
+    desde = time.time() - PERIODOS_KIRA[periodo] * 3600
+    metricas = get_metricas()
+    totais = pd.DataFrame(metricas.totais_por_hora(desde))
+    recentes = metricas.recentes(desde)
+
+    st.download_button("Exportar JSON", data=json.dumps(metricas.exportar(desde), ensure_ascii=False, indent=2),
+                       file_name=f"kira_metricas_{datetime.now():%Y%m%d_%H%M}.json", mime="application/json",
+                       key="kira_metricas_exportar")
+    if totais.empty:
+        st.info("Nenhum turno do chat registrado no período.")
+        return
+
+    soma = totais.sum(numeric_only=True)
+    ttft_medio = _dividir(soma.ttft_soma, soma.respondidos)
+    tokens_seg = _dividir(soma.tokens_gerados, soma.geracao_segundos)
+    ttfts = [medicao.ttft for medicao in recentes if medicao.ttft is not None]
+    p95 = percentil(ttfts, 0.95)
+
+    cols = st.columns(5)
     with cols[0]:
-        ui.metric_card(title="Github Stars", content="7,984", description="1k stars in 12 hours.", key="card1")
+        ui.metric_card(title="Turnos", content=_numero(soma.turnos),
+                       description=f"{_numero(soma.erros)} erros, {_numero(soma.canceladas)} cancelados",
+                       key="kira_card_turnos")
     with cols[1]:
-        ui.metric_card(title="Total Install", content="234,300", description="Since launched in 2023/02", key="card2")
+        ui.metric_card(title="1ª parte (média)", content=f"{_numero(ttft_medio, 2)} s" if ttft_medio else "-",
+                       description=f"p95 recente: {_numero(p95, 2)} s" if p95 is not None else "sem turnos recentes",
+                       key="kira_card_ttft")
     with cols[2]:
-        ui.metric_card(title="HackerNews upvotes", content="712", description="Rank No.1 story of the day", key="card3")
+        ui.metric_card(title="Vazão", content=f"{_numero(tokens_seg, 1)} tokens/s" if tokens_seg else "-",
+                       description="nas respostas geradas pelo modelo", key="kira_card_vazao")
+    with cols[3]:
+        ui.metric_card(title="Cache", content=f"{_numero(100 * soma.do_cache / soma.turnos, 1)}%",
+                       description="respostas sem nova geração", key="kira_card_cache")
+    with cols[4]:
+        ui.metric_card(title="Prompt médio", content=f"{_numero(soma.tokens_prompt / soma.turnos)} tokens",
+                       description=f"resposta média: {_numero(soma.tokens_resposta / soma.turnos)} tokens",
+                       key="kira_card_prompt")
+
+    por_hora = totais.groupby("hora").agg(
+        turnos=("turnos", "sum"), ttft_soma=("ttft_soma", "sum"), respondidos=("respondidos", "sum"),
+        ttft_max=("ttft_max", "max"), tokens_gerados=("tokens_gerados", "sum"),
+        geracao_segundos=("geracao_segundos", "sum"),
+    )
+    por_hora.index = pd.to_datetime(por_hora.index, unit="s", utc=True).tz_convert(None)
+    por_hora["1ª parte média (s)"] = por_hora.ttft_soma / por_hora.respondidos.where(por_hora.respondidos > 0)
+    por_hora["1ª parte máxima (s)"] = por_hora.ttft_max
+    por_hora["tokens/s"] = por_hora.tokens_gerados / por_hora.geracao_segundos.where(por_hora.geracao_segundos > 0)
+    cols = st.columns(2)
+    with cols[0]:
+        st.markdown("**Turnos por hora (UTC)**")
+        st.bar_chart(por_hora[["turnos"]])
+    with cols[1]:
+        st.markdown("**Latência por hora (UTC)**")
+        st.line_chart(por_hora[["1ª parte média (s)", "1ª parte máxima (s)", "tokens/s"]])
+
+    st.markdown("**Consumo por usuário**")
+    por_usuario = totais.groupby("usuario").sum(numeric_only=True)
+    st.dataframe(pd.DataFrame({
+        "Turnos": por_usuario.turnos.astype(int),
+        "Tokens de prompt": por_usuario.tokens_prompt.astype(int),
+        "Tokens de resposta": por_usuario.tokens_resposta.astype(int),
+        "Segundos de geração": por_usuario.geracao_segundos.round(1),
+        "Do cache (%)": (100 * por_usuario.do_cache / por_usuario.turnos).round(1),
+        "Erros": por_usuario.erros.astype(int),
+    }).sort_values("Segundos de geração", ascending=False), use_container_width=True)
+
+    st.markdown("**Por nível e modelo**")
+    por_modelo = totais.groupby(["canal", "nivel", "modelo"]).sum(numeric_only=True)
+    st.dataframe(pd.DataFrame({
+        "Turnos": por_modelo.turnos.astype(int),
+        "1ª parte média (s)": (por_modelo.ttft_soma
+                               / por_modelo.respondidos.where(por_modelo.respondidos > 0)).round(2),
+        "Tokens/s": (por_modelo.tokens_gerados
+                     / por_modelo.geracao_segundos.where(por_modelo.geracao_segundos > 0)).round(1),
+        "Prompt médio": (por_modelo.tokens_prompt / por_modelo.turnos).round(),
+        "Espera na fila média (s)": (por_modelo.espera_fila_soma / por_modelo.turnos).round(2),
+    }), use_container_width=True)
+
+    if recentes:
+        st.markdown(f"**Turnos recentes deste servidor** ({len(recentes)})")
+        turnos = pd.DataFrame([medicao.exportar() for medicao in reversed(recentes)])
+        turnos["inicio"] = pd.to_datetime(turnos.inicio, unit="s", utc=True).dt.tz_convert(None)
+        st.dataframe(turnos, use_container_width=True, hide_index=True)
+
+
+async def showDashboard():
+
+    st.title("Sistema Flash Pagamentos")
+
+    abas = st.tabs(["Vendas", "KIRA"])
+
+    with abas[1]:
+        mostrar_metricas_kira()
+
+    with abas[0]:
+        st.header("Dashboard Flash")
+        ui.badges(badge_list=[("Dataframe", "default"), ("to", "secondary"), ("Interactive Data App", "destructive")], class_name="flex gap-2", key="viz_badges1")
+        st.caption("Dashboard interativo para controle de vendas e análise para tomadas de decisão.")
+        ui.badges(badge_list=[("pip install pygwalker", "secondary")], class_name="flex gap-2", key="viz_badges2")
 
-    with ui.element("div", className="flex gap-2", key="buttons_group1"):
-        ui.element("link_button", variant="primary", url="https://github.com/Kanaries/pygwalker", text="Get Started", key="btn1")
-        ui.element("link_button", text="Github", url="https://github.com/Kanaries/pygwalker", variant="outline", key="btn2")
+        cols = st.columns(3)
 
-    # Initialize pygwalker communication
-    init_streamlit_comm()
+        with cols[0]:
+            ui.metric_card(title="Github Stars", content="7,984", description="1k stars in 12 hours.", key="card1")
+        with cols[1]:
+            ui.metric_card(title="Total Install", content="234,300", description="Since launched in 2023/02", key="card2")
+        with cols[2]:
+            ui.metric_card(title="HackerNews upvotes", content="712", description="Rank No.1 story of the day", key="card3")
 
-    # Caching the pygwalker HTML
-    @st.cache_resource
-    def get_pyg_html(df: pd.DataFrame) -> str:
-        html = get_streamlit_html(df, use_kernel_calc=True, debug=False)
-        return html
+        with ui.element("div", className="flex gap-2", key="buttons_group1"):
+            ui.element("link_button", variant="primary", url="https://github.com/Kanaries/pygwalker", text="Get Started", key="btn1")
+            ui.element("link_button", text="Github", url="https://github.com/Kanaries/pygwalker", variant="outline", key="btn2")
 
-    @st.cache_data
-    def get_df() -> pd.DataFrame:
-        return pd.read_csv("https://kanaries-app.s3.ap-northeast-1.amazonaws.com/public-datasets/bike_sharing_dc.csv")
+        # Initialize pygwalker communication
+        init_streamlit_comm()
 
-    df = get_df()
+        # Caching the pygwalker HTML
+        @st.cache_resource
+        def get_pyg_html(df: pd.DataFrame) -> str:
+            html = get_streamlit_html(df, use_kernel_calc=True, debug=False)
+            return html
 
-    components.html(get_pyg_html(df), width=1000, height=1000, scrolling=True)
+        @st.cache_data
+        def get_df() -> pd.DataFrame:
+            return pd.read_csv("https://kanaries-app.s3.ap-northeast-1.amazonaws.com/public-datasets/bike_sharing_dc.csv")
 
+        df = get_df()
 
+        components.html(get_pyg_html(df), width=1000, height=1000, scrolling=True)
@@ -1,10 +1,10 @@
 import streamlit as st
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from httpx import AsyncClient
 import asyncio
 import pandas as pd
-from configuracao import ASAAS_API_KEY, BASE_URL  # Importando as configurações necessárias
+from utils.asaas import get_asaas_client
+from utils.asaas_cache import get_asaas_cache
 from typing import Optional
 from datetime import datetime
 
@@ -30,24 +30,13 @@ class Cobranca(BaseModel):
 
 
 async def criar_cobranca(cobranca: Cobranca):
-    async with AsyncClient() as client:
-        response = await client.post(
-            f'{BASE_URL}/payments',  # Endpoint para criar cobranças
-            headers={'access_token': ASAAS_API_KEY},
-            json=cobranca.dict()
-        )
-        response.raise_for_status()
-        return response.json()
+    response = await get_asaas_client().criar_cobranca(cobranca.dict())
+    get_asaas_cache().registrar_pagamento(response)  # Já aparece na listagem sem esperar a próxima sincronização
+    return response
 
 
 async def fetch_invoices():
-    async with AsyncClient() as client:
-        response = await client.get(
-            f'{BASE_URL}/payments',
-            headers={'access_token': ASAAS_API_KEY}
-        )
-        response.raise_for_status()  # Levanta um erro se a resposta não for bem-sucedida
-        return response.json()["data"]  # Retorna apenas os dados das cobranças
+    return await get_asaas_client().listar_cobrancas()  # Retorna todas as cobranças, de todas as páginas
 
 
 @app.post("/cobrancas/")
@@ -56,20 +45,18 @@ async def create_invoice(cobranca: Cobranca):
     return {"id": response["id"]}
 
 
+async def carregar_cobrancas() -> pd.DataFrame:
+    """Lê as cobranças do espelho local, buscando no Asaas apenas as novidades quando o TTL expira."""
+    cache = get_asaas_cache()
+    await cache.sincronizar()
+    return cache.listar_pagamentos()
+
+
 @app.get("/cobrancas/")
 async def get_invoices():
     try:
-        cobranças = await fetch_invoices()
-        if cobranças:
-            data = []
-            for cobranca in cobranças:
-                data.append({
-                    'ID': cobranca['id'],
-                    'Valor': cobranca['value'],
-                    'Vencimento': cobranca['dueDate'],
-                    'Status': cobranca['status']
-                })
-            df = pd.DataFrame(data)
+        df = await carregar_cobrancas()
+        if not df.empty:
             return df.to_dict("records")
         else:
             return {"message": "Nenhuma cobrança encontrada."}
@@ -92,27 +79,15 @@ async def showFinanceiro():
 
         if submit_button:
             nova_cobranca = Cobranca(value=valor, dueDate=dueDate.strftime("%Y-%m-%d"), customerId=customerId, description=description)
-            import requests
-            response = requests.post(f"{BASE_URL}/payments", headers={'access_token': ASAAS_API_KEY}, json=nova_cobranca.dict())
-            st.success(f"Cobrança criada com sucesso! ID: {response.json()['id']}")
+            response = await criar_cobranca(nova_cobranca)
+            st.success(f"Cobrança criada com sucesso! ID: {response['id']}")
 
     # Seção para listar cobranças
     st.header("Listar Cobranças")
     if st.button("Carregar Cobranças"):
         with st.spinner("Carregando lista de cobranças..."):
-            import requests
-            response = requests.get(f"{BASE_URL}/payments", headers={'access_token': ASAAS_API_KEY})
-            cobranças = response.json()["data"]
-            if cobranças:
-                data = []
-                for cobranca in cobranças:
-                    data.append({
-                        'ID': cobranca['id'],
-                        'Valor': cobranca['value'],
-                        'Vencimento': cobranca['dueDate'],
-                        'Status': cobranca['status']
-                    })
-                df = pd.DataFrame(data)
+            df = await carregar_cobrancas()
+            if not df.empty:
                 st.dataframe(df)  # Exibe a tabela de cobranças no Streamlit
             else:
                 st.warning("Nenhuma cobrança encontrada.")
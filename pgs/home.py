@@ -4,9 +4,6 @@ import requests
 import json
 
 
-st.set_page_config(page_title='ORACULO MODAS', page_icon="👗", layout="wide")
-
-
 async def showHome():
 
     # --- HERO SECTION ---
@@ -1,10 +1,9 @@
 import streamlit as st
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from httpx import AsyncClient
 import asyncio
 import pandas as pd
-from configuracao import ASAAS_API_KEY, BASE_URL  # Importando as configurações necessárias
+from utils.asaas import get_asaas_client
 from typing import Optional
 from datetime import datetime
 
@@ -28,24 +27,11 @@ class LinkPagamento(BaseModel):
 
 
 async def criar_link_pagamento(link: LinkPagamento):
-    async with AsyncClient() as client:
-        response = await client.post(
-            f'{BASE_URL}/paymentLinks',  # Endpoint para criar links de pagamento
-            headers={'access_token': ASAAS_API_KEY},
-            json=link.dict()
-        )
-        response.raise_for_status()
-        return response.json()
+    return await get_asaas_client().criar_link_pagamento(link.dict())
 
 
 async def fetch_payment_links():
-    async with AsyncClient() as client:
-        response = await client.get(
-            f'{BASE_URL}/paymentLinks',
-            headers={'access_token': ASAAS_API_KEY}
-        )
-        response.raise_for_status()  # Levanta um erro se a resposta não for bem-sucedida
-        return response.json()["data"]  # Retorna apenas os dados dos links de pagamento
+    return await get_asaas_client().listar_links_pagamento()  # Retorna todos os links, de todas as páginas
 
 
 @app.post("/links-pagamento/")
@@ -95,17 +81,14 @@ async def showLinks():
 
         if submit_button:
             novo_link = LinkPagamento(name=name,value=valeu, billingType=billingType, chargeType=chargeType, description=description)
-            import requests
-            response = requests.post(f"{BASE_URL}/paymentLinks", headers={'access_token': ASAAS_API_KEY}, json=novo_link.dict())
-            st.success(f"Link de pagamento criado com sucesso! ID: {response.json()['id']}")
+            response = await criar_link_pagamento(novo_link)
+            st.success(f"Link de pagamento criado com sucesso! ID: {response['id']}")
 
     # Seção para listar links de pagamento
     st.header("Listar Links de Pagamento")
     if st.button("Carregar Links de Pagamento"):
         with st.spinner("Carregando lista de links de pagamento..."):
-            import requests
-            response = requests.get(f"{BASE_URL}/paymentLinks", headers={'access_token': ASAAS_API_KEY})
-            links_pagamento = response.json()["data"]
+            links_pagamento = await fetch_payment_links()
             if links_pagamento:
                 data = []
                 for link in links_pagamento:
@@ -1,7 +1,6 @@
 import asyncio
 
 import streamlit as st
-from transformers import AutoTokenizer
 import base64
 import pandas as pd
 import io
@@ -9,40 +8,25 @@ from fastapi import FastAPI
 import stripe
 from util import carregar_arquivos
 import os
-import glob
 from forms.contact import cadastrar_cliente, agendar_reuniao
 
-import replicate
-from langchain.llms import Replicate
 
+from configuracao import KIRA_CONVERSA_JANELA
 from key_config import API_KEY_STRIPE, URL_BASE
-from decouple import config
+from kira.agrupamento import Agrupador
+from kira.atendimento import get_atendimento, montar_system_prompt, papel_do_usuario
+from kira.contexto import JanelaContexto
+from kira.conversas import aparar
+from kira.intencoes import AGENDAMENTO, CADASTRO
+from kira.tokenizer import get_tokenizer, tokens_mensagem
 
 
 app = FastAPI()
 
 
 
-# --- Verifica se o token da API está nos segredos ---
-if 'REPLICATE_API_TOKEN':
-    replicate_api = config('REPLICATE_API_TOKEN')
-else:
-    # Se a chave não está nos segredos, define um valor padrão ou continua sem o token
-    replicate_api = None
-
-# Essa parte será executada se você precisar do token em algum lugar do seu código
-if replicate_api is None:
-    # Se você quiser fazer algo específico quando não há token, você pode gerenciar isso aqui
-    # Por exemplo, configurar uma lógica padrão ou deixar o aplicativo continuar sem mostrar nenhuma mensagem:
-    st.warning('Um token de API é necessário para determinados recursos.', icon='⚠️')
-
-
-# Inicializar o modelo da Replicate
-llm = Replicate(
-    model="meta/meta-llama-3-70b-instruct",
-    api_token=replicate_api
-)
-
+# Tokenizer local carregado uma vez por processo, na importação da página
+get_tokenizer()
 
 
 async def showPedido():
@@ -51,88 +35,11 @@ async def showPedido():
     if "image" not in st.session_state:
         st.session_state.image = None
     
-    def ler_arquivos_txt(pasta):
-        """
-        Lê todos os arquivos .txt na pasta especificada e retorna uma lista com o conteúdo de cada arquivo.
-
-        Args:
-            pasta (str): O caminho da pasta onde os arquivos .txt estão localizados.
-
-        Returns:
-            list: Uma lista contendo o conteúdo de cada arquivo .txt.
-        """
-        conteudos = []  # Lista para armazenar o conteúdo dos arquivos
-
-        # Cria o caminho para buscar arquivos .txt na pasta especificada
-        caminho_arquivos = os.path.join(pasta, '*.txt')
-
-        # Usa glob para encontrar todos os arquivos .txt na pasta
-        arquivos_txt = glob.glob(caminho_arquivos)
-
-        # Lê o conteúdo de cada arquivo .txt encontrado
-        for arquivo in arquivos_txt:
-            with open(arquivo, 'r', encoding='utf-8') as f:
-                conteudo = f.read()  # Lê o conteúdo do arquivo
-                conteudos.append(conteudo)  # Adiciona o conteúdo à lista
-
-        return conteudos  # Retorna a lista de conteúdos
-
-    # Exemplo de uso da função
-    pasta_conhecimento = './conhecimento'  # Caminho da pasta onde os arquivos .txt estão localizados
-    conteudos_txt = ler_arquivos_txt(pasta_conhecimento)
-
     is_in_registration = False
     is_in_scheduling = False
 
 
-    # Função para verificar se a pergunta está relacionada a cadastro
-    def is_health_question(prompt):
-        keywords = ["cadastrar", "inscrição", "quero me cadastrar", "gostaria de me registrar",
-                    "desejo me cadastrar", "quero fazer o cadastro", "quero me registrar", "quero me increver",
-                    "desejo me registrar", "desejo me inscrever","eu quero me cadastrar", "eu desejo me cadastrar",
-                    "eu desejo me registrar", "eu desejo me inscrever", "eu quero me registrar", "eu desejo me registrar",
-                    "eu quero me inscrever"]
-        return any(keyword.lower() in prompt.lower() for keyword in keywords)
-
-    #Função que analisa desejo de agendar uma reunião
-    def is_schedule_meeting_question(prompt):
-        keywords = [
-            "agendar reunião", "quero agendar uma reunião", "gostaria de agendar uma reunião",
-            "desejo agendar uma reunião", "quero marcar uma reunião", "gostaria de marcar uma reunião",
-            "desejo marcar uma reunião", "posso agendar uma reunião", "posso marcar uma reunião",
-            "Eu gostaria de agendar uma reuniao", "eu quero agendar", "eu quero agendar uma reunião,",
-            "quero reunião"
-        ]
-        return any(keyword.lower() in prompt.lower() for keyword in keywords)
-
-    system_prompt = f'''
-    Você é uma atendente virtual chamada "KIRA", que atuará como atendente virtual da plataforma FAM, facilitando a 
-    interação entre fabricantes de moda e lojistas no Brasil. 
-
-    **Cadastro e Agendamento:**
-       - Se o usuário estiver com o status de cadastro {is_in_registration} ou agendamento {is_in_scheduling}, 
-       informe que não enviará mais informações até que finalize o cadastro. Use uma resposta padrão que diga: 
-       "Aguardo a finalização do seu cadastro para continuar."
-
-    **Opção de Cadastro e Agendamento:**
-       - Se o usuário enviar {is_health_question} ou {is_schedule_meeting_question}, responda que está aguardando o preenchimento completo do formulário. 
-       - Mantenha a mesma resposta enquanto ele não finalizar o cadastro.
-       - Se o status do cadastro estiver {is_in_scheduling} ou {is_in_registration} mantenha a mesma resposta enquanto
-       ele não finalizar o cadastro.
-    
-    1. **Definição Clara**: Você deve ser uma assistente que não apenas responde perguntas, mas também oferece conselhos sobre como maximizar as vendas, sugere estratégias de marketing e conecta os fabricantes aos lojistas de forma eficaz. Isso ajudará a IA a entender melhor as expectativas dos usuários.
-    
-    2. **Estrutura da Resposta**: Ao interagir com os usuários, KIRA deve organizar suas respostas em partes lógicas. Por exemplo:
-    - **Saudação**: "Olá! Sou a KIRA, sua assistente virtual."
-    - **Identificação de Necessidades**: "Como posso ajudar você hoje? Está buscando conectar-se a um lojista ou precisa de dicas para aumentar suas vendas?"
-    - **Solução**: Após a identificação, KIRA pode fornecer informações específicas ou direcionar o usuário para as funcionalidades da plataforma.
-    
-    3. **Tom de Comunicação**: O tom de seu deve ser amigável e acessível. Em conversas mais formais, ela pode usar uma linguagem técnica e objetiva, mas em interações cotidianas, ela deve adotar um tom mais descontraído e motivacional. Por exemplo: "Vamos juntos fazer seu negócio brilhar no mercado!".
-    
-    4. **Personalização e Precisão**:Você deve ser capaz de personalizar suas respostas com base nas informações fornecidas pelos usuários. Por exemplo, se o fabricante mencionar que está lançando uma nova linha de produtos, FAMOSA pode oferecer dicas específicas sobre como promovê-los para os lojistas, aumentando assim a relevância da interação.
-    5. Se o cliente quiser fazer uma assinatura para ter acessoa plataforma envie este link: https://buy.stripe.com/test_fZeg2L7MBcCE9heeUY
-    6. Se o cliente desejar conversar com uma consultora envie este link de WhatsApp da Consultora Mari: https://wa.me/+553199302907
-    '''
+    system_prompt = montar_system_prompt(is_in_registration, is_in_scheduling)
     
     # Replicate Credentials
     with st.sidebar:
@@ -219,10 +126,27 @@ async def showPedido():
         st.sidebar.markdown("---")
 
 
-    # Store LLM-generated responses
-    if "messages" not in st.session_state.keys():
-        st.session_state.messages = [{
-            "role": "assistant", "content": '🌟 Bem-vindo ao Alan Coach! Estou aqui para te guiar na jornada de autodescoberta e transformação, rumo à sua melhor versão. Vamos juntos! 💪✨'}]
+    atendimento = get_atendimento()
+    armazem = atendimento.armazem
+
+    # Identificação para a conversa e para a fila de geração (rodízio por usuário e prioridade para admin/parceiro)
+    usuario = st.session_state.get('username') or 'anonimo'
+    papel = papel_do_usuario(usuario)
+
+    # Conversa persistida por usuário: a sessão guarda só o final dela (a partir da posição `base`)
+    # Recarregada também quando outro usuário entra na mesma aba (SAIR não limpa o session_state)
+    if st.session_state.get('conversa_usuario') != usuario:
+        geracao = st.session_state.get('geracao')
+        st.session_state.geracao = None
+        if geracao is not None:
+            atendimento.desistir(geracao)
+        st.session_state.conversa_usuario = usuario
+        st.session_state.conversa = armazem.conversa_atual(
+            usuario, '🌟 Bem-vindo ao Alan Coach! Estou aqui para te guiar na jornada de autodescoberta e transformação, rumo à sua melhor versão. Vamos juntos! 💪✨')
+        st.session_state.contexto = {**JanelaContexto.novo_estado(), **armazem.contexto(st.session_state.conversa)}
+        st.session_state.messages, st.session_state.base = armazem.carregar(
+            st.session_state.conversa, st.session_state.contexto['resumidas'])
+        st.session_state.exibir = KIRA_CONVERSA_JANELA
 
     # Dicionário de ícones
     icons = {
@@ -233,8 +157,18 @@ async def showPedido():
     # Caminho para a imagem padrão
     default_avatar_path = "./src/img/usuario.jpg"
     
-    # Exibição das mensagens
-    for message in st.session_state.messages:
+    def carregar_anteriores():
+        st.session_state.exibir += KIRA_CONVERSA_JANELA
+
+    if st.session_state.base + len(st.session_state.messages) > st.session_state.exibir:
+        st.button("Carregar mensagens anteriores", on_click=carregar_anteriores)
+
+    # Exibição só das últimas mensagens; as anteriores que não estão na sessão vêm do banco, sob demanda
+    exibidas = st.session_state.messages[-st.session_state.exibir:]
+    faltam = st.session_state.exibir - len(exibidas)
+    if faltam > 0 and st.session_state.base > 0:
+        exibidas = armazem.anteriores(st.session_state.conversa, st.session_state.base, faltam) + exibidas
+    for message in exibidas:
         if message["role"] == "user":
             # Verifica se a imagem do usuário existe
             avatar_image = st.session_state.image if "image" in st.session_state and st.session_state.image else default_avatar_path
@@ -244,62 +178,56 @@ async def showPedido():
         with st.chat_message(message["role"], avatar=avatar_image):
             st.write(message["content"])
 
+    def cancelar_geracao():
+        """Desiste da resposta em andamento na sessão; a geração para se nenhuma outra sessão a acompanha."""
+        geracao = st.session_state.get('geracao')
+        st.session_state.geracao = None
+        if geracao is not None:
+            atendimento.desistir(geracao)
+
+    def adicionar_mensagem(mensagem):
+        """Grava a mensagem na conversa e na sessão, que mantém em memória só o final da conversa."""
+        tokens_mensagem(mensagem)
+        armazem.adicionar(st.session_state.conversa, mensagem)
+        st.session_state.messages.append(mensagem)
+        st.session_state.base = aparar(st.session_state.messages, st.session_state.base,
+                                       st.session_state.contexto['resumidas'])
+
     def clear_chat_history():
-        st.session_state.messages = [{"role": "assistant", "content": 'Olá! Sou a KIRA, sua assistente virtual de moda aqui na FAM. Vou te ajudar a conectar com os melhores fabricantes e tornar sua experiência de compra ainda mais incrível.'}]
+        cancelar_geracao()
+        # A conversa anterior continua no banco; a sessão passa para uma nova
+        st.session_state.conversa = armazem.nova_conversa(usuario, 'Olá! Sou a KIRA, sua assistente virtual de moda aqui na FAM. Vou te ajudar a conectar com os melhores fabricantes e tornar sua experiência de compra ainda mais incrível.')
+        st.session_state.messages, st.session_state.base = armazem.carregar(st.session_state.conversa)
+        st.session_state.contexto = JanelaContexto.novo_estado()
+        st.session_state.exibir = KIRA_CONVERSA_JANELA
 
     st.sidebar.button('LIMPAR CONVERSA', on_click=clear_chat_history)
    
     st.sidebar.markdown("Desenvolvido por [WILLIAM EUSTÁQUIO](https://www.instagram.com/flashdigital.tech/)")
 
-    @st.cache_resource(show_spinner=False)
-    def get_tokenizer():
-        """Get a tokenizer to make sure we're not sending too much text
-        text to the Model. Eventually we will replace this with ArcticTokenizer
-        """
-        return AutoTokenizer.from_pretrained("huggyllama/llama-7b")
-
-    def get_num_tokens(prompt):
-        """Get the number of tokens in a given prompt"""
-        tokenizer = get_tokenizer()
-        tokens = tokenizer.tokenize(prompt)
-        return len(tokens)
-
     # Function for generating Snowflake Arctic response
 
-    def generate_arctic_response():
-        prompt = []
-        for dict_message in st.session_state.messages:
-
-            if dict_message["role"] == "user":
-                prompt.append("<|im_start|>user\n" + dict_message["content"] + "<|im_end|>")
-            else:
-                prompt.append("<|im_start|>assistant\n" + dict_message["content"] + "<|im_end|>")
-
-        prompt.append("<|im_start|>assistant")
-        prompt.append("")
-        prompt_str = "\n".join(prompt)
+    agrupador = Agrupador()
 
-        if is_health_question(prompt_str):
+    def iniciar_resposta():
+        """Inicia, em segundo plano, a resposta à última pergunta; cadastro e agendamento abrem o formulário."""
+        resposta = atendimento.responder(st.session_state.messages, st.session_state.contexto,
+                                         st.session_state.base, usuario, papel, system_prompt)
+        if resposta.intencao is not None and resposta.intencao.nome == CADASTRO:
             cadastrar_cliente()
-
-
-        if is_schedule_meeting_question(prompt_str):
+        elif resposta.intencao is not None and resposta.intencao.nome == AGENDAMENTO:
             agendar_reuniao()
-
-        for event in replicate.stream(
-                "meta/meta-llama-3-70b-instruct",
-                input={
-                    "top_k": 0,
-                    "top_p": 1,
-                    "prompt": prompt_str,
-                    "temperature": 0.1,
-                    "system_prompt": system_prompt,
-                    "length_penalty": 1,
-                    "max_new_tokens": 3500,
-
-                },
-        ):
-            yield str(event)
+        return resposta
+
+    def acompanhar_resposta(transmissao):
+        # Com todas as vagas ocupadas, mostra a posição na fila em vez de deixar a resposta parada
+        aviso_fila = st.empty()
+        for posicao, espera in transmissao.acompanhar_fila():
+            aviso_fila.info(f"Muitas conversas agora: você é o {posicao}º da fila "
+                            f"(cerca de {max(1, round(espera))} s de espera).", icon="⏳")
+        aviso_fila.empty()
+        # Partes agrupadas: uma atualização da tela a cada janela, não a cada token
+        yield from agrupador.agrupar(transmissao)
 
     
     def get_avatar_image():
@@ -310,8 +238,18 @@ async def showPedido():
             return default_avatar_path  # Retorna a imagem padrão
     
     # User-provided prompt
-    if prompt := st.chat_input(disabled=not replicate_api):
-        st.session_state.messages.append({"role": "user", "content": prompt})
+    if prompt := st.chat_input():
+        geracao = st.session_state.get('geracao')
+        if geracao is not None:
+            # Nova pergunta antes do fim da resposta anterior: fica o que já chegou e o restante é cancelado
+            parcial = geracao.transmissao.texto.strip()
+            cancelar_geracao()
+            if parcial:
+                adicionar_mensagem({"role": "assistant", "content": parcial})
+                with st.chat_message("assistant", avatar=icons["assistant"]):
+                    st.write(parcial)
+
+        adicionar_mensagem({"role": "user", "content": prompt})
         
         # Chama a função para obter a imagem correta
         avatar_image = get_avatar_image()
@@ -321,11 +259,20 @@ async def showPedido():
     
     # Generate a new response if last message is not from assistant
     if st.session_state.messages[-1]["role"] != "assistant":
+        # A geração roda no loop global e fica guardada na sessão: depois de um rerun (ex.: clique na barra
+        # lateral) o que já chegou é exibido de novo e a resposta continua de onde estava, sem gerar outra vez
+        if st.session_state.get('geracao') is None:
+            st.session_state.geracao = iniciar_resposta()
         with st.chat_message("assistant", avatar="./src/img/perfil-kira2.png"):
-            response = generate_arctic_response()
-            full_response = st.write_stream(response)
+            try:
+                full_response = st.write_stream(acompanhar_resposta(st.session_state.geracao.transmissao))
+            except Exception:
+                st.session_state.geracao = None
+                raise
+        st.session_state.geracao = None
         message = {"role": "assistant", "content": full_response}
-        st.session_state.messages.append(message)
+        adicionar_mensagem(message)
+        atendimento.salvar_contexto(st.session_state.conversa, st.session_state.contexto)
 
 
 
@@ -1,9 +1,7 @@
 import streamlit as st
-import asyncio
 from fastapi import HTTPException, FastAPI
 from pydantic import BaseModel
-import httpx
-from configuracao import BASE_URL, ASAAS_API_KEY  # Importando as constantes
+from utils.asaas import get_asaas_client
 from datetime import date
 
 
@@ -30,14 +28,7 @@ class Subaccount(BaseModel):
 
 
 async def criar_subconta(subconta: Subaccount):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f'{BASE_URL}/accounts',
-            headers={'access_token': ASAAS_API_KEY},
-            json=subconta.dict()
-        )
-        response.raise_for_status()  # Levanta um erro se a resposta não for bem-sucedida
-        return response.json()  # Retorna a resposta da API
+    return await get_asaas_client().criar_subconta(subconta.dict())  # Retorna a resposta da API
 
 
 # Interface do Streamlit
@@ -87,7 +78,7 @@ async def showParceiro():
             )
             try:
                 # Chamando a função criar_subconta para enviar os dados
-                resultado = asyncio.run(criar_subconta(new_subaccount))
+                resultado = await criar_subconta(new_subaccount)
                 st.write(resultado)
             except HTTPException as e:
                 st.error(f"Erro ao criar.py subconta: {e.detail}")
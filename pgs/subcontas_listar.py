@@ -4,23 +4,17 @@ from fastapi import FastAPI, HTTPException
 import httpx
 from fastapi import HTTPException
 import pandas as pd
-from configuracao import ASAAS_API_KEY, BASE_URL
+from utils.asaas import get_asaas_client
 
 
 app = FastAPI()
 
 
 async def fetch_subaccounts():
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f'{BASE_URL}/accounts',
-                headers={'access_token': ASAAS_API_KEY}
-            )
-            response.raise_for_status()  # Levanta um erro se a resposta não for bem-sucedida
-            return response.json()["data"]  # Retorna apenas os dados das subcontas
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
+    try:
+        return await get_asaas_client().listar_subcontas()  # Retorna todas as subcontas, de todas as páginas
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
 
 
 # Interface do Streamlit
@@ -1,11 +1,13 @@
 import streamlit as st
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Header
 from pydantic import BaseModel
 from typing import List, Optional
 import asyncio
+import hmac
 import requests
 import pandas as pd
-from configuracao import ASAAS_API_KEY, BASE_URL
+from configuracao import ASAAS_API_KEY, BASE_URL, ASAAS_WEBHOOK_TOKEN
+from utils.asaas_cache import get_asaas_cache
 
 
 # Inicialização do FastAPI
@@ -54,6 +56,26 @@ async def delete_webhook(webhook_id: int):
     return {"message": "Webhook deleted successfully"}
 
 
+@app.post("/asaas/webhook")
+async def receive_asaas_webhook(request: Request, asaas_access_token: Optional[str] = Header(None)):
+    """Recebe eventos do Asaas e atualiza o espelho local de cobranças, clientes e links de pagamento."""
+    if not ASAAS_WEBHOOK_TOKEN or not asaas_access_token or \
+            not hmac.compare_digest(asaas_access_token.encode(), ASAAS_WEBHOOK_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Token de webhook inválido")
+
+    try:
+        evento = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Payload inválido")
+    if not isinstance(evento, dict) or 'event' not in evento:
+        raise HTTPException(status_code=400, detail="Payload inválido")
+
+    # Reentregas do mesmo evento são confirmadas com 200 para o Asaas não insistir, mas não reaplicadas
+    # Transação SQLite (pode esperar o banco ocupado): fora do loop do servidor
+    aplicado = await asyncio.to_thread(get_asaas_cache().aplicar_evento, evento)
+    return {"received": True, "duplicate": not aplicado}
+
+
 async def shoWebhooks():
     st.title("Gerenciar Webhooks")
 
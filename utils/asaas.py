@@ -0,0 +1,169 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+import pandas as pd
+
+from configuracao import ASAAS_API_KEY, BASE_URL, ASAAS_TIMEOUT
+from utils.event_loop import aguardar, no_loop_global
+
+
+LIMITE_PAGINA = 100  # Máximo aceito pela API do Asaas por página
+CONCORRENCIA_PAGINAS = 8
+
+
+class AsaasClient:
+    """Cliente único da API do Asaas, com pool de conexões keep-alive e HTTP/2.
+
+    O httpx.AsyncClient vive no loop global do processo (utils.event_loop); os métodos podem ser
+    aguardados de qualquer event loop (páginas do Streamlit ou FastAPI) e sempre reaproveitam as
+    conexões TLS já abertas.
+    """
+
+    def __init__(self, base_url: str = BASE_URL, api_key: Optional[str] = ASAAS_API_KEY,
+                 timeout: float = ASAAS_TIMEOUT, max_conexoes: int = 50):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 10.0))
+        self.limites = httpx.Limits(max_connections=max_conexoes, max_keepalive_connections=max_conexoes,
+                                    keepalive_expiry=120)
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def _cliente(self) -> httpx.AsyncClient:
+        # Chamado apenas dentro do loop global, que é single-thread: não precisa de lock
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={'access_token': self.api_key or ''},
+                http2=True,
+                timeout=self.timeout,
+                limits=self.limites,
+            )
+        return self._http
+
+    async def requisicao(self, metodo: str, caminho: str, **kwargs) -> Dict[str, Any]:
+        """Executa uma requisição no loop global e retorna o JSON; erros HTTP levantam httpx.HTTPStatusError."""
+        if not no_loop_global():
+            return await aguardar(self.requisicao(metodo, caminho, **kwargs))
+        response = await self._cliente().request(metodo, caminho, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def fechar(self) -> None:
+        if self._http is not None:
+            await aguardar(self._http.aclose())
+            self._http = None
+
+    # --- Paginação ---
+    async def paginar(self, caminho: str, limite: int = LIMITE_PAGINA, concorrencia: int = CONCORRENCIA_PAGINAS,
+                      **params) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Percorre todas as páginas de um endpoint de listagem, em ordem.
+
+        A primeira página informa o totalCount; as janelas de offset restantes são buscadas em paralelo
+        (no máximo `concorrencia` ao mesmo tempo), então o tempo total fica próximo de
+        (páginas / concorrencia) idas e voltas em vez de uma ida e volta por página. Sem totalCount, ou se
+        a lista cresceu durante a leitura, segue sequencialmente pelo hasMore.
+        """
+        async def buscar(offset: int) -> Dict[str, Any]:
+            return await self.requisicao('GET', caminho, params={**params, 'offset': offset, 'limit': limite})
+
+        pagina = await buscar(0)
+        yield pagina["data"]
+        offset = limite
+
+        total = pagina.get('totalCount')
+        if total is not None and pagina.get('hasMore') and total > offset:
+            semaforo = asyncio.Semaphore(concorrencia)
+
+            async def buscar_limitado(offset_janela: int) -> Dict[str, Any]:
+                async with semaforo:
+                    return await buscar(offset_janela)
+
+            janelas = range(offset, total, limite)
+            tarefas = [asyncio.ensure_future(buscar_limitado(o)) for o in janelas]
+            try:
+                for tarefa in tarefas:
+                    pagina = await tarefa
+                    yield pagina["data"]
+            finally:
+                for tarefa in tarefas:
+                    tarefa.cancel()
+            offset = janelas[-1] + limite
+
+        while pagina.get('hasMore') and pagina["data"]:
+            pagina = await buscar(offset)
+            yield pagina["data"]
+            offset += limite
+
+    async def iterar(self, caminho: str, **params) -> AsyncIterator[Dict[str, Any]]:
+        """Itera registro a registro sobre todas as páginas, ignorando IDs repetidos entre janelas."""
+        vistos = set()
+        async for pagina in self.paginar(caminho, **params):
+            for registro in pagina:
+                chave = registro.get('id')
+                if chave is not None:
+                    if chave in vistos:
+                        continue
+                    vistos.add(chave)
+                yield registro
+
+    async def coletar(self, caminho: str, **params) -> List[Dict[str, Any]]:
+        """Retorna a lista completa de um endpoint paginado."""
+        return [registro async for registro in self.iterar(caminho, **params)]
+
+    async def coletar_dataframe(self, caminho: str, colunas: Optional[Dict[str, str]] = None,
+                                **params) -> pd.DataFrame:
+        """Retorna a lista completa como DataFrame; `colunas` seleciona e renomeia campos (campo -> título)."""
+        df = pd.DataFrame(await self.coletar(caminho, **params))
+        if colunas:
+            df = df.reindex(columns=list(colunas)).rename(columns=colunas)
+        return df
+
+    # --- Cobranças (payments) ---
+    async def listar_cobrancas(self, **params) -> List[Dict[str, Any]]:
+        return await self.coletar('/payments', **params)
+
+    async def criar_cobranca(self, dados: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.requisicao('POST', '/payments', json=dados)
+
+    # --- Links de pagamento (paymentLinks) ---
+    async def listar_links_pagamento(self, **params) -> List[Dict[str, Any]]:
+        return await self.coletar('/paymentLinks', **params)
+
+    async def criar_link_pagamento(self, dados: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.requisicao('POST', '/paymentLinks', json=dados)
+
+    # --- Clientes (customers) ---
+    async def listar_clientes(self, **params) -> List[Dict[str, Any]]:
+        return await self.coletar('/customers', **params)
+
+    async def obter_cliente(self, customer_id: str) -> Dict[str, Any]:
+        return await self.requisicao('GET', f'/customers/{customer_id}')
+
+    async def atualizar_cliente(self, customer_id: str, dados: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.requisicao('PUT', f'/customers/{customer_id}', json=dados)
+
+    async def excluir_cliente(self, customer_id: str) -> Dict[str, Any]:
+        return await self.requisicao('DELETE', f'/customers/{customer_id}')
+
+    # --- Subcontas (accounts) ---
+    async def listar_subcontas(self, **params) -> List[Dict[str, Any]]:
+        return await self.coletar('/accounts', **params)
+
+    async def criar_subconta(self, dados: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.requisicao('POST', '/accounts', json=dados)
+
+
+_cliente: Optional[AsaasClient] = None
+_cliente_lock = threading.Lock()
+
+
+def get_asaas_client() -> AsaasClient:
+    """Retorna o cliente Asaas compartilhado pelo processo."""
+    global _cliente
+    if _cliente is None:
+        with _cliente_lock:
+            if _cliente is None:
+                _cliente = AsaasClient()
+    return _cliente
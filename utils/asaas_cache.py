@@ -0,0 +1,325 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from configuracao import ASAAS_CACHE_PATH, PAGAMENTOS_CACHE_TTL, PAGAMENTOS_RECONCILIACAO
+from utils.asaas import get_asaas_client
+from utils.banco import BancoSQLite
+from utils.event_loop import aguardar, no_loop_global
+
+
+# Filtros de data usados nas sincronizações incrementais. A API do Asaas não oferece filtro por data de
+# atualização; paymentDate cobre as mudanças para RECEIVED/CONFIRMED e a reconciliação completa periódica
+# cobre as demais (ex.: OVERDUE, exclusões).
+FILTROS_DELTA = ('dateCreated[ge]', 'paymentDate[ge]')
+TAMANHO_LOTE = 500
+FUSO_ASAAS = ZoneInfo('America/Sao_Paulo')  # Datas da API (dateCreated, paymentDate) são de Brasília
+RETENCAO_EVENTOS = 30 * 86400  # Segundos; o Asaas reenvia eventos por bem menos tempo que isso
+LIMPAR_EVENTOS_A_CADA = 1000  # Eventos aplicados entre limpezas, além da feita em cada reconciliação
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pagamentos (
+    id TEXT PRIMARY KEY,
+    customer TEXT,
+    value REAL,
+    status TEXT,
+    due_date TEXT,
+    date_created TEXT,
+    payment_date TEXT,
+    payment_link TEXT,
+    dados TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pagamentos_due_date ON pagamentos (due_date);
+CREATE INDEX IF NOT EXISTS idx_pagamentos_status ON pagamentos (status);
+CREATE INDEX IF NOT EXISTS idx_pagamentos_customer ON pagamentos (customer);
+CREATE INDEX IF NOT EXISTS idx_pagamentos_payment_link ON pagamentos (payment_link);
+
+CREATE TABLE IF NOT EXISTS clientes (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    email TEXT,
+    cpf_cnpj TEXT,
+    dados TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS links_pagamento (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    value REAL,
+    active INTEGER,
+    dados TEXT NOT NULL
+);
+
+-- IDs de eventos de webhook já aplicados, para ignorar reentregas do Asaas
+CREATE TABLE IF NOT EXISTS eventos (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    recebido_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_eventos_recebido_em ON eventos (recebido_em);
+
+-- Data (dateCreated) do último evento aplicado a cada cobrança, cliente ou link, para que a reentrega atrasada
+-- de um evento anterior (ex.: PAYMENT_CREATED depois de PAYMENT_RECEIVED) não desfaça o mais novo
+CREATE TABLE IF NOT EXISTS ultimo_evento (
+    objeto TEXT PRIMARY KEY,
+    data_evento TEXT NOT NULL,
+    recebido_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ultimo_evento_recebido_em ON ultimo_evento (recebido_em);
+
+CREATE TABLE IF NOT EXISTS sincronizacao (
+    recurso TEXT PRIMARY KEY,
+    marca_dagua TEXT,
+    sincronizado_em REAL NOT NULL DEFAULT 0,
+    reconciliado_em REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+class AsaasCache(BancoSQLite):
+    """Espelho local das cobranças do Asaas, atualizado de forma incremental e pelos webhooks.
+
+    Leituras (página Financeiro e GET /cobrancas/) consultam apenas o SQLite local; a API só é chamada
+    quando o TTL expira, e mesmo assim apenas para os registros criados ou pagos desde a última marca
+    d'água. Uma reconciliação completa periódica remove cobranças excluídas e corrige status que não
+    têm filtro de data na API.
+    """
+
+    SCHEMA = SCHEMA
+
+    def __init__(self, db_path: str = ASAAS_CACHE_PATH, ttl: float = PAGAMENTOS_CACHE_TTL,
+                 reconciliacao: float = PAGAMENTOS_RECONCILIACAO):
+        super().__init__(db_path)
+        self.ttl = ttl
+        self.reconciliacao = reconciliacao
+        self._lock_sincronizacao: Optional[asyncio.Lock] = None  # Criado no loop global
+        self._eventos_aplicados = 0
+
+    # --- Escrita ---
+    @staticmethod
+    def _linha_pagamento(pagamento: Dict[str, Any]):
+        return (
+            pagamento['id'], pagamento.get('customer'), pagamento.get('value'), pagamento.get('status'),
+            pagamento.get('dueDate'), pagamento.get('dateCreated'), pagamento.get('paymentDate'),
+            pagamento.get('paymentLink'), json.dumps(pagamento, ensure_ascii=False),
+        )
+
+    @staticmethod
+    def _upsert_pagamentos(conn, pagamentos: Iterable[Dict[str, Any]]) -> None:
+        conn.executemany(
+            "INSERT INTO pagamentos (id, customer, value, status, due_date, date_created, payment_date, "
+            "payment_link, dados) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET customer = excluded.customer, value = excluded.value, "
+            "status = excluded.status, due_date = excluded.due_date, date_created = excluded.date_created, "
+            "payment_date = excluded.payment_date, payment_link = excluded.payment_link, "
+            "dados = excluded.dados", (AsaasCache._linha_pagamento(p) for p in pagamentos))
+
+    @staticmethod
+    def _upsert_cliente(conn, cliente: Dict[str, Any]) -> None:
+        conn.execute(
+            "INSERT INTO clientes (id, name, email, cpf_cnpj, dados) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET name = excluded.name, email = excluded.email, "
+            "cpf_cnpj = excluded.cpf_cnpj, dados = excluded.dados",
+            (cliente['id'], cliente.get('name'), cliente.get('email'), cliente.get('cpfCnpj'),
+             json.dumps(cliente, ensure_ascii=False)))
+
+    @staticmethod
+    def _upsert_link(conn, link: Dict[str, Any]) -> None:
+        conn.execute(
+            "INSERT INTO links_pagamento (id, name, value, active, dados) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET name = excluded.name, value = excluded.value, "
+            "active = excluded.active, dados = excluded.dados",
+            (link['id'], link.get('name'), link.get('value'), int(bool(link.get('active', True))),
+             json.dumps(link, ensure_ascii=False)))
+
+    def registrar_pagamentos(self, pagamentos: Iterable[Dict[str, Any]]) -> int:
+        """Insere ou atualiza cobranças pelo ID (custo constante por registro)."""
+        pagamentos = list(pagamentos)
+        with self.transacao() as conn:
+            self._upsert_pagamentos(conn, pagamentos)
+        return len(pagamentos)
+
+    def registrar_pagamento(self, pagamento: Dict[str, Any]) -> None:
+        self.registrar_pagamentos([pagamento])
+
+    def remover_pagamento(self, payment_id: str) -> None:
+        with self.transacao() as conn:
+            conn.execute("DELETE FROM pagamentos WHERE id = ?", (payment_id,))
+
+    # --- Webhooks ---
+    @staticmethod
+    def id_evento(evento: Dict[str, Any]) -> str:
+        """ID do evento do Asaas; payloads antigos sem 'id' usam um hash do conteúdo."""
+        if evento.get('id'):
+            return str(evento['id'])
+        conteudo = json.dumps(evento, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return 'hash_' + hashlib.sha256(conteudo).hexdigest()
+
+    @staticmethod
+    def _mais_recente(conn, objeto: str, data_evento: str, agora: float) -> bool:
+        """Registra `data_evento` para o objeto; False se um evento posterior a ele já foi aplicado."""
+        if not data_evento:
+            return True  # Payload sem data: não há como ordenar
+        anterior = conn.execute("SELECT data_evento FROM ultimo_evento WHERE objeto = ?", (objeto,)).fetchone()
+        if anterior is not None and anterior['data_evento'] > data_evento:
+            return False
+        conn.execute(
+            "INSERT INTO ultimo_evento (objeto, data_evento, recebido_em) VALUES (?, ?, ?) "
+            "ON CONFLICT (objeto) DO UPDATE SET data_evento = excluded.data_evento, recebido_em = excluded.recebido_em",
+            (objeto, data_evento, agora))
+        return True
+
+    def aplicar_evento(self, evento: Dict[str, Any]) -> bool:
+        """Aplica um evento de webhook ao espelho local em tempo constante.
+
+        O registro do ID do evento e a alteração dos dados acontecem na mesma transação: uma reentrega
+        retorna False sem alterar nada, e uma falha no meio não deixa o evento marcado como aplicado. Um
+        evento mais antigo que o último já aplicado ao mesmo objeto (pela data dateCreated) é registrado,
+        mas não altera o objeto.
+        """
+        tipo = str(evento.get('event', ''))
+        data_evento = str(evento.get('dateCreated') or '')
+        agora = time.time()
+        with self.transacao() as conn:
+            inserido = conn.execute("INSERT OR IGNORE INTO eventos (id, tipo, recebido_em) VALUES (?, ?, ?)",
+                                    (self.id_evento(evento), tipo, agora)).rowcount
+            if not inserido:
+                return False
+
+            pagamento = evento.get('payment')
+            if isinstance(pagamento, dict) and pagamento.get('id') and \
+                    self._mais_recente(conn, pagamento['id'], data_evento, agora):
+                if tipo == 'PAYMENT_DELETED':
+                    conn.execute("DELETE FROM pagamentos WHERE id = ?", (pagamento['id'],))
+                else:
+                    self._upsert_pagamentos(conn, [pagamento])
+
+            cliente = evento.get('customer')
+            if isinstance(cliente, dict) and cliente.get('id') and \
+                    self._mais_recente(conn, cliente['id'], data_evento, agora):
+                if tipo == 'CUSTOMER_DELETED':
+                    conn.execute("DELETE FROM clientes WHERE id = ?", (cliente['id'],))
+                else:
+                    self._upsert_cliente(conn, cliente)
+
+            link = evento.get('paymentLink')
+            if isinstance(link, dict) and link.get('id') and self._mais_recente(conn, link['id'], data_evento, agora):
+                if tipo == 'PAYMENT_LINK_DELETED':
+                    conn.execute("DELETE FROM links_pagamento WHERE id = ?", (link['id'],))
+                else:
+                    self._upsert_link(conn, link)
+
+        self._eventos_aplicados += 1
+        if self._eventos_aplicados % LIMPAR_EVENTOS_A_CADA == 0:
+            self.limpar_eventos()
+        return True
+
+    def limpar_eventos(self, retencao: float = RETENCAO_EVENTOS) -> int:
+        """Remove IDs e datas de eventos antigos, que o Asaas não reenvia mais."""
+        limite = time.time() - retencao
+        with self.transacao() as conn:
+            conn.execute("DELETE FROM ultimo_evento WHERE recebido_em < ?", (limite,))
+            return conn.execute("DELETE FROM eventos WHERE recebido_em < ?", (limite,)).rowcount
+
+    # --- Sincronização ---
+    def _estado(self, recurso: str) -> Dict[str, Any]:
+        row = self.conexao().execute(
+            "SELECT marca_dagua, sincronizado_em, reconciliado_em FROM sincronizacao WHERE recurso = ?", (recurso,)
+        ).fetchone()
+        return dict(row) if row else {'marca_dagua': None, 'sincronizado_em': 0.0, 'reconciliado_em': 0.0}
+
+    def _salvar_estado(self, recurso: str, marca_dagua: str, sincronizado_em: float, reconciliado_em: float) -> None:
+        with self.transacao() as conn:
+            conn.execute(
+                "INSERT INTO sincronizacao (recurso, marca_dagua, sincronizado_em, reconciliado_em) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (recurso) DO UPDATE SET marca_dagua = excluded.marca_dagua, "
+                "sincronizado_em = excluded.sincronizado_em, reconciliado_em = excluded.reconciliado_em",
+                (recurso, marca_dagua, sincronizado_em, reconciliado_em))
+
+    def precisa_sincronizar(self) -> bool:
+        return time.time() - self._estado('payments')['sincronizado_em'] >= self.ttl
+
+    async def _baixar(self, **filtros) -> set:
+        """Baixa as cobranças que atendem aos filtros, gravando em lotes; retorna os IDs vistos."""
+        vistos, lote = set(), []
+        async for pagamento in get_asaas_client().iterar('/payments', **filtros):
+            vistos.add(pagamento['id'])
+            lote.append(pagamento)
+            if len(lote) >= TAMANHO_LOTE:
+                await asyncio.to_thread(self.registrar_pagamentos, lote)
+                lote = []
+        if lote:
+            await asyncio.to_thread(self.registrar_pagamentos, lote)
+        return vistos
+
+    async def sincronizar(self, forcar: bool = False) -> int:
+        """Atualiza o espelho se o TTL expirou (ou se `forcar`); retorna quantas cobranças foram baixadas.
+
+        Chamadas simultâneas de várias sessões compartilham uma única sincronização.
+        """
+        if not no_loop_global():
+            return await aguardar(self.sincronizar(forcar))
+
+        if self._lock_sincronizacao is None:
+            self._lock_sincronizacao = asyncio.Lock()
+        async with self._lock_sincronizacao:
+            # Todo acesso ao SQLite sai do loop global: o busy_timeout pode segurar uma consulta por até 30 s
+            if not forcar and not await asyncio.to_thread(self.precisa_sincronizar):
+                return 0
+
+            estado = await asyncio.to_thread(self._estado, 'payments')
+            inicio = time.time()
+            # A marca d'água é a data do início da sincronização no fuso do Asaas (não no do servidor): as
+            # próximas voltam a ler esse dia inteiro, e os upserts pelo ID tornam a sobreposição inofensiva.
+            marca_dagua = datetime.now(FUSO_ASAAS).date().isoformat()
+            reconciliado_em = estado['reconciliado_em']
+
+            if estado['marca_dagua'] is None or inicio - reconciliado_em >= self.reconciliacao:
+                vistos = await self._baixar()
+                await asyncio.to_thread(self._remover_ausentes, vistos)
+                await asyncio.to_thread(self.limpar_eventos)
+                reconciliado_em = inicio
+                baixados = len(vistos)
+            else:
+                baixados = 0
+                for filtro in FILTROS_DELTA:
+                    baixados += len(await self._baixar(**{filtro: estado['marca_dagua']}))
+
+            await asyncio.to_thread(self._salvar_estado, 'payments', marca_dagua, inicio, reconciliado_em)
+            return baixados
+
+    def _remover_ausentes(self, vistos: set) -> None:
+        with self.transacao() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS vistos (id TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM vistos")
+            conn.executemany("INSERT OR IGNORE INTO vistos (id) VALUES (?)", ((i,) for i in vistos))
+            conn.execute("DELETE FROM pagamentos WHERE id NOT IN (SELECT id FROM vistos)")
+            conn.execute("DELETE FROM vistos")
+
+    # --- Leitura ---
+    def listar_pagamentos(self, status: Optional[str] = None) -> pd.DataFrame:
+        """Cobranças do espelho local, já com as colunas exibidas no Financeiro."""
+        sql = ("SELECT id AS ID, value AS Valor, due_date AS Vencimento, status AS Status FROM pagamentos"
+               + (" WHERE status = ?" if status else "") + " ORDER BY due_date DESC")
+        return pd.read_sql_query(sql, self.conexao(), params=(status,) if status else None)
+
+
+_cache: Optional[AsaasCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_asaas_cache() -> AsaasCache:
+    """Retorna o espelho local do Asaas compartilhado pelo processo."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AsaasCache()
+    return _cache
@@ -0,0 +1,333 @@
+"""Servidor local que imita os endpoints do Asaas e do Stripe usados pelo projeto.
+
+Serve para desenvolvimento sem rede, CI e testes de carga. Para usar:
+
+    uvicorn utils.asaas_stub:app --port 8010
+
+e configure no .env:
+
+    ASAAS_BASE_URL=http://localhost:8010/api/v3
+    STRIPE_API_BASE=http://localhost:8010
+
+Latência, taxa de erro e tamanho dos dados vêm das variáveis STUB_* (veja configuracao.py) e podem ser
+alteradas em tempo de execução com POST /_stub/config.
+"""
+import asyncio
+import itertools
+import random
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from configuracao import (STUB_SEED, STUB_PAGAMENTOS, STUB_CLIENTES, STUB_LINKS, STUB_SUBCONTAS,
+                          STUB_LATENCIA_MS, STUB_JITTER_MS, STUB_TAXA_ERRO)
+
+
+NOMES = ['Ana', 'Bruna', 'Carla', 'Daniela', 'Eduarda', 'Fernanda', 'Gabriela', 'Helena', 'Isabela', 'Juliana',
+         'Larissa', 'Mariana', 'Natália', 'Paula', 'Renata', 'Sabrina', 'Tatiane', 'Vanessa', 'João', 'Pedro']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Rodrigues', 'Almeida', 'Ferreira']
+CIDADES = ['Belo Horizonte', 'São Paulo', 'Rio de Janeiro', 'Curitiba', 'Goiânia', 'Fortaleza', 'Recife']
+STATUS_PAGAMENTO = ['PENDING', 'RECEIVED', 'CONFIRMED', 'OVERDUE', 'REFUNDED']
+TIPOS_COBRANCA = ['BOLETO', 'CREDIT_CARD', 'PIX', 'UNDEFINED']
+LIMITE_MAXIMO = 100
+
+
+class Configuracao:
+    """Parâmetros de simulação, alteráveis em tempo de execução."""
+
+    def __init__(self):
+        self.latencia_ms = STUB_LATENCIA_MS
+        self.jitter_ms = STUB_JITTER_MS
+        self.taxa_erro = STUB_TAXA_ERRO
+        self.status_erro = [500, 502, 429]
+
+    def como_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class Dados:
+    """Conjunto de dados determinístico (mesma semente, mesmos registros), gerado sob demanda."""
+
+    def __init__(self, seed: int):
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._colecoes: Dict[str, List[Dict[str, Any]]] = {}
+        self._indices: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._sequencia = itertools.count(1)
+
+    def novo_id(self, prefixo: str) -> str:
+        return f"{prefixo}_{next(self._sequencia):012d}"
+
+    def colecao(self, nome: str) -> List[Dict[str, Any]]:
+        if nome not in self._colecoes:
+            with self._lock:
+                if nome not in self._colecoes:
+                    registros = getattr(self, f"_gerar_{nome}")(random.Random(f"{self.seed}-{nome}"))
+                    self._indices[nome] = {r['id']: r for r in registros}
+                    self._colecoes[nome] = registros
+        return self._colecoes[nome]
+
+    def buscar(self, nome: str, registro_id: str) -> Optional[Dict[str, Any]]:
+        self.colecao(nome)
+        return self._indices[nome].get(registro_id)
+
+    def inserir(self, nome: str, registro: Dict[str, Any]) -> Dict[str, Any]:
+        # As listagens do Asaas trazem os mais recentes primeiro
+        self.colecao(nome).insert(0, registro)
+        self._indices[nome][registro['id']] = registro
+        return registro
+
+    def remover(self, nome: str, registro_id: str) -> Optional[Dict[str, Any]]:
+        registro = self._indices[nome].pop(registro_id, None)
+        if registro is not None:
+            self._colecoes[nome].remove(registro)
+        return registro
+
+    @staticmethod
+    def _pessoa(rng: random.Random, i: int) -> Dict[str, str]:
+        nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}"
+        return {
+            'name': nome,
+            'email': f"{nome.split()[0].lower()}.{i}@exemplo.com.br",
+            'cpfCnpj': ''.join(rng.choice('0123456789') for _ in range(rng.choice([11, 14]))),
+            'mobilePhone': f"319{rng.randint(10000000, 99999999)}",
+            'city': rng.choice(CIDADES),
+        }
+
+    def _gerar_customers(self, rng: random.Random) -> List[Dict[str, Any]]:
+        hoje = date.today()
+        return [{
+            'object': 'customer', 'id': f"cus_{i:012d}",
+            'dateCreated': (hoje - timedelta(days=rng.randint(0, 720))).isoformat(),
+            'phone': None, 'deleted': False, **self._pessoa(rng, i),
+        } for i in range(STUB_CLIENTES)]
+
+    def _gerar_payments(self, rng: random.Random) -> List[Dict[str, Any]]:
+        hoje = date.today()
+        registros = []
+        for i in range(STUB_PAGAMENTOS):
+            criado = hoje - timedelta(days=rng.randint(0, 365))
+            status = rng.choice(STATUS_PAGAMENTO)
+            pago = status in ('RECEIVED', 'CONFIRMED')
+            registros.append({
+                'object': 'payment', 'id': f"pay_{i:012d}",
+                'customer': f"cus_{rng.randrange(max(STUB_CLIENTES, 1)):012d}",
+                'paymentLink': f"lnk_{rng.randrange(STUB_LINKS):012d}" if STUB_LINKS and rng.random() < 0.3 else None,
+                'value': round(rng.uniform(20, 2500), 2),
+                'billingType': rng.choice(TIPOS_COBRANCA),
+                'status': status,
+                'dateCreated': criado.isoformat(),
+                'dueDate': (criado + timedelta(days=rng.randint(1, 30))).isoformat(),
+                'paymentDate': (criado + timedelta(days=rng.randint(0, 20))).isoformat() if pago else None,
+                'description': f"Pedido {i}",
+                'deleted': False,
+            })
+        registros.sort(key=lambda r: r['dateCreated'], reverse=True)
+        return registros
+
+    def _gerar_paymentLinks(self, rng: random.Random) -> List[Dict[str, Any]]:
+        return [{
+            'object': 'paymentLink', 'id': f"lnk_{i:012d}", 'name': f"Coleção {i}",
+            'value': round(rng.uniform(50, 1500), 2), 'active': rng.random() < 0.8,
+            'chargeType': rng.choice(['DETACHED', 'RECURRENT', 'INSTALLMENT']),
+            'billingType': rng.choice(TIPOS_COBRANCA), 'url': f"https://sandbox.asaas.com/c/{i:012d}",
+            'description': None, 'dueDateLimitDays': rng.randint(1, 10), 'deleted': False,
+        } for i in range(STUB_LINKS)]
+
+    def _gerar_accounts(self, rng: random.Random) -> List[Dict[str, Any]]:
+        return [{
+            'object': 'account', 'id': f"acc_{i:012d}", 'walletId': f"wal_{i:012d}",
+            'incomeValue': round(rng.uniform(2000, 50000), 2), **self._pessoa(rng, i),
+        } for i in range(STUB_SUBCONTAS)]
+
+    def _gerar_stripe_customers(self, rng: random.Random) -> List[Dict[str, Any]]:
+        return [{
+            'id': f"cus_stub{i:010d}", 'object': 'customer', 'created': int(time.time()) - rng.randint(0, 10 ** 7),
+            'name': pessoa['name'], 'email': pessoa['email'],
+            'metadata': {'cpf_cnpj': pessoa['cpfCnpj'], 'whatsapp': pessoa['mobilePhone'], 'cidade': pessoa['city'],
+                         'role': 'cliente', 'username': pessoa['email'].split('@')[0]},
+        } for i, pessoa in ((i, self._pessoa(rng, i)) for i in range(STUB_CLIENTES))]
+
+
+configuracao = Configuracao()
+dados = Dados(STUB_SEED)
+app = FastAPI(title="Stand-in Asaas/Stripe")
+asaas = APIRouter(prefix="/api/v3")
+stripe_api = APIRouter(prefix="/v1")
+
+
+@app.middleware("http")
+async def simular_rede(request: Request, call_next):
+    """Aplica latência configurável e injeta erros em uma fração das requisições."""
+    if request.url.path.startswith("/_stub"):
+        return await call_next(request)
+    atraso = configuracao.latencia_ms + random.uniform(-configuracao.jitter_ms, configuracao.jitter_ms)
+    if atraso > 0:
+        await asyncio.sleep(atraso / 1000)
+    if configuracao.taxa_erro and random.random() < configuracao.taxa_erro:
+        status = random.choice(configuracao.status_erro)
+        return JSONResponse({"errors": [{"code": "stub_error", "description": "Erro simulado"}]}, status_code=status)
+    return await call_next(request)
+
+
+def _listar(registros: List[Dict[str, Any]], request: Request, filtros=()) -> Dict[str, Any]:
+    """Pagina como a API do Asaas (offset/limit, totalCount, hasMore), aplicando filtros simples."""
+    params = request.query_params
+    offset = max(int(params.get('offset', 0)), 0)
+    limit = min(max(int(params.get('limit', 10)), 1), LIMITE_MAXIMO)
+
+    for campo in filtros:
+        valor = params.get(campo)
+        if valor:
+            registros = [r for r in registros if r.get(campo) == valor]
+    for campo in ('dateCreated', 'paymentDate', 'dueDate'):
+        inicio, fim = params.get(f"{campo}[ge]"), params.get(f"{campo}[le]")
+        if inicio:
+            registros = [r for r in registros if (r.get(campo) or '') >= inicio]
+        if fim:
+            registros = [r for r in registros if r.get(campo) and r[campo] <= fim]
+
+    pagina = registros[offset:offset + limit]
+    return {'object': 'list', 'hasMore': offset + limit < len(registros), 'totalCount': len(registros),
+            'limit': limit, 'offset': offset, 'data': pagina}
+
+
+# --- Asaas ---
+@asaas.get("/payments")
+async def listar_pagamentos(request: Request):
+    return _listar(dados.colecao('payments'), request, filtros=('customer', 'status', 'billingType'))
+
+
+@asaas.post("/payments")
+async def criar_pagamento(request: Request):
+    corpo = await request.json()
+    if not corpo.get('customer') and not corpo.get('customerId'):
+        raise HTTPException(status_code=400, detail="customer é obrigatório")
+    return dados.inserir('payments', {
+        'object': 'payment', 'id': dados.novo_id('pay'), 'status': 'PENDING', 'deleted': False,
+        'dateCreated': date.today().isoformat(), 'paymentDate': None,
+        'customer': corpo.get('customer') or corpo.get('customerId'), **corpo,
+    })
+
+
+@asaas.get("/paymentLinks")
+async def listar_links(request: Request):
+    return _listar(dados.colecao('paymentLinks'), request)
+
+
+@asaas.post("/paymentLinks")
+async def criar_link(request: Request):
+    corpo = await request.json()
+    link_id = dados.novo_id('lnk')
+    return dados.inserir('paymentLinks', {'object': 'paymentLink', 'id': link_id, 'active': True, 'deleted': False,
+                                          'url': f"https://sandbox.asaas.com/c/{link_id}", **corpo})
+
+
+@asaas.get("/customers")
+async def listar_clientes(request: Request):
+    return _listar(dados.colecao('customers'), request, filtros=('email', 'cpfCnpj', 'name'))
+
+
+@asaas.post("/customers")
+async def criar_cliente(request: Request):
+    corpo = await request.json()
+    return dados.inserir('customers', {'object': 'customer', 'id': dados.novo_id('cus'), 'deleted': False,
+                                       'dateCreated': date.today().isoformat(), **corpo})
+
+
+@asaas.get("/customers/{customer_id}")
+async def obter_cliente(customer_id: str):
+    cliente = dados.buscar('customers', customer_id)
+    if cliente is None:
+        raise HTTPException(status_code=404, detail="Cliente não encontrado")
+    return cliente
+
+
+@asaas.put("/customers/{customer_id}")
+async def atualizar_cliente(customer_id: str, request: Request):
+    cliente = await obter_cliente(customer_id)
+    cliente.update({k: v for k, v in (await request.json()).items() if k != 'id'})
+    return cliente
+
+
+@asaas.delete("/customers/{customer_id}")
+async def excluir_cliente(customer_id: str):
+    await obter_cliente(customer_id)
+    dados.remover('customers', customer_id)
+    return {'deleted': True, 'id': customer_id}
+
+
+@asaas.get("/accounts")
+async def listar_subcontas(request: Request):
+    return _listar(dados.colecao('accounts'), request)
+
+
+@asaas.post("/accounts")
+async def criar_subconta(request: Request):
+    corpo = await request.json()
+    conta_id = dados.novo_id('acc')
+    return dados.inserir('accounts', {'object': 'account', 'id': conta_id, 'walletId': f"wal_{conta_id}", **corpo})
+
+
+# --- Stripe (Customer.create / Customer.list) ---
+def _formulario_stripe(formulario) -> Dict[str, Any]:
+    """Converte o corpo form-encoded do Stripe (metadata[chave]=valor) em dicionário."""
+    corpo: Dict[str, Any] = {'metadata': {}}
+    for chave, valor in formulario.multi_items():
+        if chave.startswith('metadata[') and chave.endswith(']'):
+            corpo['metadata'][chave[9:-1]] = valor
+        else:
+            corpo[chave] = valor
+    return corpo
+
+
+@stripe_api.post("/customers")
+async def stripe_criar_cliente(request: Request):
+    corpo = _formulario_stripe(await request.form())
+    return dados.inserir('stripe_customers', {
+        'id': dados.novo_id('cus_stub'), 'object': 'customer', 'created': int(time.time()),
+        'name': corpo.get('name'), 'email': corpo.get('email'), 'metadata': corpo['metadata'],
+    })
+
+
+@stripe_api.get("/customers")
+async def stripe_listar_clientes(request: Request):
+    registros = dados.colecao('stripe_customers')
+    params = request.query_params
+    limit = min(max(int(params.get('limit', 10)), 1), 100)
+    inicio = 0
+    if params.get('starting_after'):
+        anterior = dados.buscar('stripe_customers', params['starting_after'])
+        if anterior is None:
+            raise HTTPException(status_code=400, detail="starting_after inválido")
+        inicio = registros.index(anterior) + 1
+    pagina = registros[inicio:inicio + limit]
+    return {'object': 'list', 'url': '/v1/customers', 'has_more': inicio + limit < len(registros), 'data': pagina}
+
+
+# --- Controle do stand-in ---
+@app.get("/_stub/config")
+async def obter_configuracao():
+    return configuracao.como_dict()
+
+
+@app.post("/_stub/config")
+async def alterar_configuracao(request: Request):
+    for chave, valor in (await request.json()).items():
+        if hasattr(configuracao, chave):
+            setattr(configuracao, chave, valor)
+    return configuracao.como_dict()
+
+
+app.include_router(asaas)
+app.include_router(stripe_api)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8010)
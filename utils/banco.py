@@ -0,0 +1,42 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class BancoSQLite:
+    """Base para bancos SQLite locais: uma conexão por thread, modo WAL e transações curtas de escrita."""
+
+    SCHEMA = ""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        diretorio = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(diretorio, exist_ok=True)
+        if self.SCHEMA:
+            self.conexao().executescript(self.SCHEMA)
+
+    def conexao(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transacao(self):
+        """Abre uma transação de escrita (BEGIN IMMEDIATE) e faz commit ou rollback ao final."""
+        conn = self.conexao()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
@@ -0,0 +1,109 @@
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Coroutine, Optional, Set
+
+
+logger = logging.getLogger(__name__)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+_tarefas: Set[concurrent.futures.Future] = set()  # Mantém referência às tarefas disparadas em segundo plano
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Retorna o event loop de longa duração do processo, iniciando sua thread na primeira chamada.
+
+    Clientes HTTP com pool de conexões e tarefas em segundo plano devem viver neste loop, que sobrevive
+    a reruns e é compartilhado por todas as sessões do Streamlit.
+    """
+    global _loop, _thread
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                pronto = threading.Event()
+
+                def rodar():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(pronto.set)
+                    loop.run_forever()
+
+                _thread = threading.Thread(target=rodar, name="oraculo-event-loop", daemon=True)
+                _thread.start()
+                pronto.wait()
+                _loop = loop
+    return _loop
+
+
+def no_loop_global() -> bool:
+    """Indica se o código atual está rodando dentro do loop de longa duração."""
+    try:
+        return asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        return False
+
+
+def submeter(coro: Coroutine) -> concurrent.futures.Future:
+    """Agenda a corrotina no loop de longa duração e retorna um Future thread-safe."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def executar(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """Executa a corrotina no loop de longa duração e bloqueia a thread atual até o resultado."""
+    if no_loop_global():
+        raise RuntimeError("executar() não pode ser chamado de dentro do loop global; use await.")
+    return submeter(coro).result(timeout)
+
+
+async def aguardar(coro: Coroutine) -> Any:
+    """Aguarda, a partir de qualquer event loop, uma corrotina executada no loop de longa duração."""
+    if no_loop_global():
+        return await coro
+    return await asyncio.wrap_future(submeter(coro))
+
+
+def _registrar_erro(future: concurrent.futures.Future) -> None:
+    _tarefas.discard(future)
+    if future.cancelled():
+        return
+    erro = future.exception()
+    if erro is not None:
+        logger.error("Erro em tarefa de segundo plano", exc_info=erro)
+
+
+def disparar(coro: Coroutine) -> concurrent.futures.Future:
+    """Dispara a corrotina em segundo plano no loop global, sem aguardar; erros são registrados no log."""
+    future = submeter(coro)
+    _tarefas.add(future)
+    future.add_done_callback(_registrar_erro)
+    return future
+
+
+def executar_na_sessao(coro: Coroutine) -> Any:
+    """Executa uma corrotina na thread atual do script do Streamlit.
+
+    Usado para páginas e handlers que chamam st.* (o contexto do Streamlit é por thread e não existe
+    no loop global). O Streamlit roda cada rerun em uma thread nova, então o loop é criado e fechado a cada
+    chamada; por isso operações de rede dentro da corrotina devem usar `aguardar` para rodar no loop global,
+    onde ficam os pools de conexão.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        coro.close()
+        raise RuntimeError("executar_na_sessao() não pode ser chamado com um event loop ativo; use await.")
+
+    with asyncio.Runner() as runner:
+        return runner.run(coro)
+
+
+@atexit.register
+def _encerrar() -> None:
+    if _loop is not None and _loop.is_running():
+        _loop.call_soon_threadsafe(_loop.stop)
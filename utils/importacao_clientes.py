@@ -0,0 +1,207 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Iterator, Optional, Callable
+
+import pandas as pd
+
+from utils.stripe_api import stripe
+from utils.user_directory import get_user_directory, normalizar_email
+from utils.user_store import get_user_store
+
+
+COLUNAS = ['username', 'name', 'email', 'password', 'role', 'whatsapp', 'endereco', 'cep', 'bairro', 'cidade',
+           'cpf_cnpj']
+PAPEIS_VALIDOS = ['cliente', 'parceiro', 'admin']
+TAMANHO_LOTE = 1000
+
+# Status possíveis de cada linha no relatório
+IMPORTADO = 'importado'
+INVALIDO = 'invalido'
+DUPLICADO = 'duplicado'
+ERRO_STRIPE = 'erro_stripe'
+CONFLITO = 'conflito'
+
+
+def ler_planilha(arquivo, nome_arquivo: str, tamanho_lote: int = TAMANHO_LOTE) -> Iterator[pd.DataFrame]:
+    """Lê um CSV ou XLSX em lotes de linhas, sem carregar a planilha inteira na memória.
+
+    Todas as colunas são lidas como texto para preservar zeros à esquerda (CEP, CPF/CNPJ, WhatsApp).
+    O índice de cada lote corresponde à linha da planilha (a linha 1 é o cabeçalho).
+    """
+    extensao = os.path.splitext(nome_arquivo)[1].lower()
+    if extensao == '.csv':
+        inicio = 2
+        for lote in pd.read_csv(arquivo, dtype=str, keep_default_na=False, chunksize=tamanho_lote,
+                                sep=None, engine='python'):
+            lote.index = range(inicio, inicio + len(lote))
+            inicio += len(lote)
+            yield lote
+    elif extensao in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+
+        planilha = load_workbook(arquivo, read_only=True, data_only=True).active
+        linhas = planilha.iter_rows(values_only=True)
+        cabecalho = [str(c).strip() if c is not None else '' for c in next(linhas, [])]
+        inicio, buffer = 2, []
+        for linha in linhas:
+            buffer.append(['' if v is None else str(v) for v in linha])
+            if len(buffer) == tamanho_lote:
+                yield pd.DataFrame(buffer, columns=cabecalho, index=range(inicio, inicio + len(buffer)))
+                inicio, buffer = inicio + len(buffer), []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=cabecalho, index=range(inicio, inicio + len(buffer)))
+    else:
+        raise ValueError("Formato de arquivo não suportado. Envie um arquivo .csv ou .xlsx.")
+
+
+def validar_lote(lote: pd.DataFrame, emails_existentes, usernames_existentes) -> pd.DataFrame:
+    """Normaliza e valida um lote inteiro com operações vetorizadas do pandas.
+
+    Retorna o lote com as colunas 'status' e 'mensagem'; linhas válidas ficam com status vazio.
+    Os conjuntos de existentes devem conter e-mails normalizados e usernames já ocupados.
+    """
+    lote = lote.rename(columns=lambda c: str(c).strip().lower())
+    lote = lote.reindex(columns=COLUNAS, fill_value='').fillna('').astype(str)
+    lote = lote.apply(lambda coluna: coluna.str.strip())
+    lote['cpf_cnpj'] = lote['cpf_cnpj'].str.replace(r'\D', '', regex=True)
+    lote['role'] = lote['role'].str.lower().replace('', 'cliente')
+    email_normalizado = lote['email'].str.lower()
+
+    mensagem = pd.Series('', index=lote.index)
+    status = pd.Series('', index=lote.index)
+
+    def marcar(mascara, novo_status, texto):
+        # Apenas o primeiro problema de cada linha é reportado
+        livres = mascara & (status == '')
+        status[livres] = novo_status
+        mensagem[livres] = texto
+
+    for coluna in COLUNAS:
+        marcar(lote[coluna] == '', INVALIDO, f"Falta o campo obrigatório: {coluna}")
+    marcar(~lote['email'].str.match(r"[^@\s]+@[^@\s]+\.[^@\s]+$"), INVALIDO, "E-mail inválido.")
+    marcar(~lote['cpf_cnpj'].str.len().isin([11, 14]), INVALIDO, "CPF/CNPJ deve ter 11 ou 14 dígitos.")
+    marcar(~lote['role'].isin(PAPEIS_VALIDOS), INVALIDO, "Tipo de usuário inválido.")
+    marcar(email_normalizado.isin(emails_existentes), DUPLICADO, "Um cliente com este e-mail já existe.")
+    marcar(lote['username'].isin(usernames_existentes), DUPLICADO, "Um cliente com este usuário já existe.")
+    marcar(email_normalizado.duplicated(keep='first'), DUPLICADO, "E-mail repetido na planilha.")
+    marcar(lote['username'].duplicated(keep='first'), DUPLICADO, "Usuário repetido na planilha.")
+
+    lote['status'] = status
+    lote['mensagem'] = mensagem
+    return lote
+
+
+class LimiteTaxa:
+    """Limitador de requisições por segundo (token bucket) para uso dentro de um único event loop."""
+
+    def __init__(self, por_segundo: float):
+        self.intervalo = 1.0 / por_segundo
+        self._proximo = 0.0
+        self._lock = asyncio.Lock()
+
+    async def aguardar(self) -> None:
+        async with self._lock:
+            agora = time.monotonic()
+            espera = self._proximo - agora
+            self._proximo = max(agora, self._proximo) + self.intervalo
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+
+async def criar_cliente_stripe(linha: Dict[str, Any], limite: LimiteTaxa, semaforo: asyncio.Semaphore,
+                               tentativas: int = 4) -> str:
+    """Cria o cliente no Stripe respeitando o limite de taxa; retorna o ID do cliente.
+
+    A chave de idempotência garante que reprocessar a mesma planilha não duplique clientes no Stripe.
+    """
+    async with semaforo:
+        for tentativa in range(tentativas):
+            await limite.aguardar()
+            try:
+                customer = await asyncio.to_thread(
+                    stripe.Customer.create,
+                    name=linha['name'],
+                    email=linha['email'],
+                    metadata={
+                        "cpf_cnpj": linha['cpf_cnpj'],
+                        "whatsapp": linha['whatsapp'],
+                        "endereco": linha['endereco'],
+                        "cep": linha['cep'],
+                        "bairro": linha['bairro'],
+                        "cidade": linha['cidade'],
+                        "role": linha['role'],
+                        "username": linha['username'],
+                    },
+                    idempotency_key=f"importacao-cliente-{normalizar_email(linha['email'])}",
+                )
+                return customer['id']
+            except stripe.error.RateLimitError:
+                if tentativa == tentativas - 1:
+                    raise
+                await asyncio.sleep(2 ** tentativa)
+
+
+async def importar_clientes(arquivo, nome_arquivo: str, concorrencia: int = 8, requisicoes_por_segundo: float = 20,
+                            tamanho_lote: int = TAMANHO_LOTE,
+                            ao_progredir: Optional[Callable[[int, int], None]] = None) -> pd.DataFrame:
+    """Importa clientes de uma planilha: valida, cria no Stripe em paralelo e grava no banco em um único lote.
+
+    Retorna o relatório com uma linha por registro da planilha (linha, username, email, status, mensagem,
+    stripe_id). `ao_progredir(processadas, importadas)` é chamado após cada lote.
+    """
+    diretorio = get_user_directory()
+    # Conjuntos locais: incluem os já cadastrados e os aceitos em lotes anteriores da mesma planilha
+    emails_ocupados = set(diretorio.emails())
+    usernames_ocupados = set(diretorio.usernames())
+
+    limite = LimiteTaxa(requisicoes_por_segundo)
+    semaforo = asyncio.Semaphore(concorrencia)
+    relatorios: List[pd.DataFrame] = []
+    aprovados: List[Dict[str, Any]] = []
+    processadas = 0
+
+    for lote in ler_planilha(arquivo, nome_arquivo, tamanho_lote):
+        lote = validar_lote(lote, emails_ocupados, usernames_ocupados)
+        lote['stripe_id'] = ''
+        validos = lote[lote['status'] == '']
+        emails_ocupados.update(validos['email'].str.lower())
+        usernames_ocupados.update(validos['username'])
+
+        linhas = validos[COLUNAS].to_dict('records')
+        resultados = await asyncio.gather(
+            *(criar_cliente_stripe(linha, limite, semaforo) for linha in linhas), return_exceptions=True
+        )
+        criado_em = datetime.now().isoformat()
+        for indice, linha, resultado in zip(validos.index, linhas, resultados):
+            if isinstance(resultado, Exception):
+                lote.at[indice, 'status'] = ERRO_STRIPE
+                lote.at[indice, 'mensagem'] = str(resultado)
+            else:
+                lote.at[indice, 'stripe_id'] = resultado
+                aprovados.append({'indice': (len(relatorios), indice), **linha, 'created_at': criado_em})
+
+        relatorios.append(lote)
+        processadas += len(lote)
+        if ao_progredir:
+            ao_progredir(processadas, len(aprovados))
+
+    # Grava todos os aprovados em uma única transação; conflitos de última hora (cadastros feitos em
+    # paralelo durante a importação) são marcados linha a linha sem desfazer o restante.
+    erros = get_user_store().adicionar_lote(aprovados)
+    for usuario, erro in zip(aprovados, erros):
+        numero_lote, indice = usuario['indice']
+        relatorio = relatorios[numero_lote]
+        if erro is None:
+            relatorio.at[indice, 'status'] = IMPORTADO
+            relatorio.at[indice, 'mensagem'] = ''
+        else:
+            relatorio.at[indice, 'status'] = CONFLITO
+            relatorio.at[indice, 'mensagem'] = erro
+
+    if not relatorios:
+        return pd.DataFrame(columns=['linha', 'username', 'email', 'status', 'mensagem', 'stripe_id'])
+    relatorio = pd.concat(relatorios)
+    relatorio.index.name = 'linha'
+    return relatorio.reset_index()[['linha', 'username', 'email', 'status', 'mensagem', 'stripe_id']]
@@ -0,0 +1,13 @@
+"""Módulo stripe já configurado para o processo.
+
+Importe `from utils.stripe_api import stripe` em vez de `import stripe`: o endereço da API (ex.: o stand-in
+local de utils/asaas_stub.py) é definido aqui uma única vez, e vale para qualquer módulo que use o Stripe,
+independentemente da ordem em que as páginas são importadas.
+"""
+import stripe
+
+from configuracao import STRIPE_API_BASE
+
+
+if STRIPE_API_BASE:
+    stripe.api_base = STRIPE_API_BASE
@@ -0,0 +1,127 @@
+import threading
+from typing import Dict, Any, Optional
+
+from utils.user_store import UserStore, get_user_store
+
+
+def normalizar_email(email: str) -> str:
+    """Normaliza o e-mail para uso como chave de índice."""
+    return str(email).strip().lower()
+
+
+def normalizar_documento(cpf_cnpj: str) -> str:
+    """Mantém apenas os dígitos do CPF/CNPJ para uso como chave de índice."""
+    return ''.join(c for c in str(cpf_cnpj) if c.isdigit())
+
+
+_NAO_CARREGADO = object()
+
+
+class UserDirectory:
+    """Diretório de usuários compartilhado pelo processo, recarregado apenas quando o banco de usuários muda.
+
+    Mantém índices por username, e-mail e CPF/CNPJ para que login, menu e verificação de duplicados
+    sejam O(1) independentemente do número de lojistas cadastrados.
+    """
+
+    def __init__(self, store: UserStore):
+        self.store = store
+        self._lock = threading.Lock()
+        self._revisao = _NAO_CARREGADO  # revisão do banco refletida nos índices
+        self._cookie: Dict[str, Any] = {}
+        self._por_username: Dict[str, Dict[str, Any]] = {}
+        self._por_email: Dict[str, Dict[str, Any]] = {}
+        self._por_documento: Dict[str, Dict[str, Any]] = {}
+        self._credentials: Dict[str, Any] = {'usernames': {}}
+
+    def _carregar(self, revisao: int) -> None:
+        usuarios = self.store.listar()
+
+        # Reconstrói os índices em novos dicionários e só depois publica, para que leitores concorrentes
+        # nunca vejam um índice pela metade.
+        por_username, por_email, por_documento = {}, {}, {}
+        for user in usuarios:
+            por_username[str(user['username'])] = user
+            por_email[normalizar_email(user['email'])] = user
+            if user.get('cpf_cnpj'):
+                por_documento[normalizar_documento(user['cpf_cnpj'])] = user
+
+        credentials = {
+            'usernames': {username: {
+                'name': user['name'],
+                'password': user['password'],  # Já em hash bcrypt (UserStore)
+                'email': user['email'],
+            } for username, user in por_username.items()}
+        }
+
+        self._cookie = self.store.cookie
+        self._por_username = por_username
+        self._por_email = por_email
+        self._por_documento = por_documento
+        self._credentials = credentials
+        self._revisao = revisao
+
+    def atualizar(self) -> None:
+        """Recarrega os índices se o banco mudou desde a última leitura (custa uma consulta por chave)."""
+        revisao = self.store.revisao()
+        if revisao == self._revisao:
+            return
+        with self._lock:
+            revisao = self.store.revisao()
+            if revisao != self._revisao:
+                self._carregar(revisao)
+
+    def invalidar(self) -> None:
+        """Força a releitura na próxima consulta."""
+        with self._lock:
+            self._revisao = _NAO_CARREGADO
+
+    @property
+    def credentials(self) -> Dict[str, Any]:
+        """Credenciais no formato do streamlit_authenticator, montadas uma vez por revisão do banco."""
+        self.atualizar()
+        return self._credentials
+
+    @property
+    def cookie(self) -> Dict[str, Any]:
+        self.atualizar()
+        return self._cookie
+
+    def buscar_por_username(self, username: str) -> Optional[Dict[str, Any]]:
+        self.atualizar()
+        return self._por_username.get(str(username))
+
+    def buscar_por_email(self, email: str) -> Optional[Dict[str, Any]]:
+        self.atualizar()
+        return self._por_email.get(normalizar_email(email))
+
+    def buscar_por_cpf_cnpj(self, cpf_cnpj: str) -> Optional[Dict[str, Any]]:
+        self.atualizar()
+        return self._por_documento.get(normalizar_documento(cpf_cnpj))
+
+    def emails(self):
+        """E-mails normalizados já cadastrados (visão somente leitura, para deduplicação em lote)."""
+        self.atualizar()
+        return self._por_email.keys()
+
+    def usernames(self):
+        self.atualizar()
+        return self._por_username.keys()
+
+    def __len__(self) -> int:
+        self.atualizar()
+        return len(self._por_username)
+
+
+_diretorio: Optional[UserDirectory] = None
+_diretorio_lock = threading.Lock()
+
+
+def get_user_directory() -> UserDirectory:
+    """Retorna o diretório de usuários compartilhado do processo."""
+    global _diretorio
+    if _diretorio is None:
+        with _diretorio_lock:
+            if _diretorio is None:
+                _diretorio = UserDirectory(get_user_store())
+    return _diretorio
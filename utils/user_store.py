@@ -0,0 +1,218 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import Dict, Any, List, Optional, Iterable
+
+import yaml
+from streamlit_authenticator import Hasher
+
+from configuracao import USER_DB_PATH
+from utils.banco import BancoSQLite
+
+
+CAMPOS_USUARIO = ['username', 'name', 'email', 'password', 'role', 'whatsapp', 'endereco', 'cep', 'bairro',
+                  'cidade', 'cpf_cnpj', 'created_at']
+INDICE_SENHA = CAMPOS_USUARIO.index('password')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    password TEXT NOT NULL DEFAULT '',
+    role TEXT NOT NULL DEFAULT 'cliente',
+    whatsapp TEXT NOT NULL DEFAULT '',
+    endereco TEXT NOT NULL DEFAULT '',
+    cep TEXT NOT NULL DEFAULT '',
+    bairro TEXT NOT NULL DEFAULT '',
+    cidade TEXT NOT NULL DEFAULT '',
+    cpf_cnpj TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_usuarios_cpf_cnpj ON usuarios (cpf_cnpj);
+
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+INSERT OR IGNORE INTO meta (chave, valor) VALUES ('revisao', '0');
+
+-- Toda alteração em usuarios incrementa a revisão, permitindo que caches em qualquer processo
+-- detectem mudanças com uma única leitura de chave primária.
+CREATE TRIGGER IF NOT EXISTS usuarios_revisao_insert AFTER INSERT ON usuarios BEGIN
+    UPDATE meta SET valor = CAST(valor AS INTEGER) + 1 WHERE chave = 'revisao';
+END;
+CREATE TRIGGER IF NOT EXISTS usuarios_revisao_update AFTER UPDATE ON usuarios BEGIN
+    UPDATE meta SET valor = CAST(valor AS INTEGER) + 1 WHERE chave = 'revisao';
+END;
+CREATE TRIGGER IF NOT EXISTS usuarios_revisao_delete AFTER DELETE ON usuarios BEGIN
+    UPDATE meta SET valor = CAST(valor AS INTEGER) + 1 WHERE chave = 'revisao';
+END;
+"""
+
+
+def hash_senha(senha: str) -> str:
+    """Senha em hash bcrypt, no formato do streamlit_authenticator (senhas que já são hash ficam como estão)."""
+    return senha if Hasher.is_hash(senha) else Hasher.hash(senha)
+
+
+class UserStore(BancoSQLite):
+    """Armazenamento transacional de usuários em SQLite (modo WAL, e-mail e username únicos).
+
+    Cada thread (sessão do Streamlit) usa a própria conexão; as gravações são transações curtas,
+    então cadastros simultâneos não perdem a escrita uns dos outros. As senhas são gravadas já em hash
+    bcrypt (calculado antes de abrir a transação), então o login não precisa refazer o hash de ninguém.
+    """
+
+    SCHEMA = SCHEMA
+
+    @staticmethod
+    def _linha(usuario: Dict[str, Any]) -> List[str]:
+        linha = [str(usuario.get(campo) or '') for campo in CAMPOS_USUARIO]
+        linha[INDICE_SENHA] = hash_senha(linha[INDICE_SENHA])
+        return linha
+
+    @staticmethod
+    def _erro_integridade(erro: sqlite3.IntegrityError) -> ValueError:
+        mensagem = str(erro)
+        if 'usuarios.email' in mensagem:
+            return ValueError("Um cliente com este e-mail já existe.")
+        if 'usuarios.username' in mensagem:
+            return ValueError("Um cliente com este usuário já existe.")
+        return ValueError(f"Erro ao salvar o cliente: {mensagem}")
+
+    def adicionar(self, usuario: Dict[str, Any]) -> None:
+        """Insere um usuário; conflitos de e-mail ou username viram ValueError."""
+        self.adicionar_varios([usuario])
+
+    def adicionar_varios(self, usuarios: Iterable[Dict[str, Any]]) -> int:
+        """Insere vários usuários em uma única transação (tudo ou nada)."""
+        sql = (f"INSERT INTO usuarios ({', '.join(CAMPOS_USUARIO)}) "
+               f"VALUES ({', '.join('?' for _ in CAMPOS_USUARIO)})")
+        linhas = [self._linha(usuario) for usuario in usuarios]
+        try:
+            with self.transacao() as conn:
+                conn.executemany(sql, linhas)
+        except sqlite3.IntegrityError as e:
+            raise self._erro_integridade(e)
+        return len(linhas)
+
+    def adicionar_lote(self, usuarios: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Insere vários usuários em uma única transação, registrando o resultado de cada linha.
+
+        Diferente de adicionar_varios, um conflito não desfaz o lote: a linha conflitante é ignorada e
+        a mensagem de erro correspondente é devolvida na mesma posição (None quando inserida).
+        """
+        sql = (f"INSERT INTO usuarios ({', '.join(CAMPOS_USUARIO)}) "
+               f"VALUES ({', '.join('?' for _ in CAMPOS_USUARIO)})")
+        linhas = [self._linha(usuario) for usuario in usuarios]
+        resultados: List[Optional[str]] = []
+        with self.transacao() as conn:
+            for linha in linhas:
+                try:
+                    conn.execute(sql, linha)
+                    resultados.append(None)
+                except sqlite3.IntegrityError as e:
+                    resultados.append(str(self._erro_integridade(e)))
+        return resultados
+
+    def listar(self) -> List[Dict[str, Any]]:
+        cursor = self.conexao().execute(f"SELECT {', '.join(CAMPOS_USUARIO)} FROM usuarios ORDER BY id")
+        return [dict(row) for row in cursor]
+
+    def _buscar(self, coluna: str, valor: str) -> Optional[Dict[str, Any]]:
+        row = self.conexao().execute(
+            f"SELECT {', '.join(CAMPOS_USUARIO)} FROM usuarios WHERE {coluna} = ? LIMIT 1", (str(valor),)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def buscar_por_username(self, username: str) -> Optional[Dict[str, Any]]:
+        return self._buscar('username', username)
+
+    def buscar_por_email(self, email: str) -> Optional[Dict[str, Any]]:
+        return self._buscar('email', str(email).strip())
+
+    def buscar_por_cpf_cnpj(self, cpf_cnpj: str) -> Optional[Dict[str, Any]]:
+        return self._buscar('cpf_cnpj', cpf_cnpj)
+
+    def revisao(self) -> int:
+        """Número que muda a cada alteração da tabela de usuários (em qualquer processo)."""
+        row = self.conexao().execute("SELECT valor FROM meta WHERE chave = 'revisao'").fetchone()
+        return int(row['valor']) if row else 0
+
+    def obter_meta(self, chave: str, default: Any = None) -> Any:
+        row = self.conexao().execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+        return json.loads(row['valor']) if row else default
+
+    def definir_meta(self, chave: str, valor: Any) -> None:
+        with self.transacao() as conn:
+            conn.execute("INSERT INTO meta (chave, valor) VALUES (?, ?) "
+                         "ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor", (chave, json.dumps(valor)))
+
+    @property
+    def cookie(self) -> Dict[str, Any]:
+        return self.obter_meta('cookie', {})
+
+    def importar_yaml(self, file_path: str = 'config.yaml') -> int:
+        """Importa usuários e configuração de cookie de um config.yaml (usuários já existentes são ignorados)."""
+        with open(file_path, 'r', encoding='utf-8') as file:
+            config = yaml.safe_load(file) or {}
+
+        usuarios = (config.get('credentials') or {}).get('users') or []
+        sql = (f"INSERT OR IGNORE INTO usuarios ({', '.join(CAMPOS_USUARIO)}) "
+               f"VALUES ({', '.join('?' for _ in CAMPOS_USUARIO)})")
+        linhas = [self._linha(usuario) for usuario in usuarios]
+        with self.transacao() as conn:
+            importados = conn.executemany(sql, linhas).rowcount
+        if 'cookie' in config:
+            self.definir_meta('cookie', config['cookie'])
+        self.definir_meta('yaml_importado', os.path.abspath(file_path))
+        return importados
+
+    def migrar_senhas(self) -> int:
+        """Converte para hash bcrypt as senhas ainda gravadas em texto puro (bancos anteriores ao hash)."""
+        linhas = self.conexao().execute("SELECT id, password FROM usuarios").fetchall()
+        pendentes = [(hash_senha(linha['password']), linha['id'], linha['password'])
+                     for linha in linhas if not Hasher.is_hash(linha['password'])]
+        with self.transacao() as conn:
+            # Uma senha alterada enquanto os hashes eram calculados não é sobrescrita
+            conn.executemany("UPDATE usuarios SET password = ? WHERE id = ? AND password = ?", pendentes)
+        self.definir_meta('senhas_hash', True)
+        return len(pendentes)
+
+
+_stores: Dict[str, UserStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_user_store(db_path: Optional[str] = None, yaml_path: str = 'config.yaml') -> UserStore:
+    """Retorna o armazenamento de usuários do processo.
+
+    Na primeira abertura de um banco vazio, importa uma única vez os usuários do config.yaml; em um banco
+    com senhas em texto puro, converte-as uma única vez para hash.
+    """
+    db_path = db_path or USER_DB_PATH
+    chave = os.path.abspath(db_path)
+    store = _stores.get(chave)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(chave)
+            if store is None:
+                store = UserStore(db_path)
+                if store.obter_meta('yaml_importado') is None and os.path.exists(yaml_path):
+                    store.importar_yaml(yaml_path)
+                if store.obter_meta('senhas_hash') is None:
+                    store.migrar_senhas()
+                _stores[chave] = store
+    return store
+
+
+if __name__ == "__main__":
+    # Importação avulsa: python -m utils.user_store [config.yaml] [banco.db]
+    origem = sys.argv[1] if len(sys.argv) > 1 else 'config.yaml'
+    destino = sys.argv[2] if len(sys.argv) > 2 else USER_DB_PATH
+    total = UserStore(destino).importar_yaml(origem)
+    print(f"{total} usuário(s) importado(s) de {origem} para {destino}.")